@@ -1,32 +1,49 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .database import AttendanceDB
+from .executor import blocking, hashing
 from .models import UserInDB, TokenData
 
 # Configuration
 SECRET_KEY = "your-secret-key-here"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Resolved users are reused for this long; bounds how stale a change made by another process can be
+USER_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 60))
+USER_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 1024))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 db = AttendanceDB()
 
+# username -> (UserInDB, monotonic expiry)
+_user_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hashing.run(get_password_hash, password)
+
 def get_user(username: str) -> Optional[UserInDB]:
-    conn = db.get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = c.fetchone()
-    conn.close()
-    
+    with db.get_connection() as conn:
+        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
     if user:
         return UserInDB(
             username=user[0],
@@ -38,6 +55,36 @@ def get_user(username: str) -> Optional[UserInDB]:
         )
     return None
 
+def _cached_user(username: str) -> Optional[UserInDB]:
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+        if entry is not None and entry[1] > time.monotonic():
+            _user_cache.move_to_end(username)
+            return entry[0]
+    return None
+
+def get_cached_user(username: str) -> Optional[UserInDB]:
+    """get_user() behind an LRU with a TTL; unknown users are not cached"""
+    user = _cached_user(username)
+    if user is not None:
+        return user
+    user = get_user(username)
+    if user is not None and USER_CACHE_TTL > 0:
+        with _user_cache_lock:
+            _user_cache[username] = (user, time.monotonic() + USER_CACHE_TTL)
+            _user_cache.move_to_end(username)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+def invalidate_user(username: Optional[str] = None):
+    """Forget a cached user after it is updated or deleted (all users if no name is given)"""
+    with _user_cache_lock:
+        if username is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(username, None)
+
 def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
     user = get_user(username)
     if not user:
@@ -46,6 +93,15 @@ def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
         return None
     return user
 
+async def authenticate_user_async(username: str, password: str) -> Optional[UserInDB]:
+    """authenticate_user() with the bcrypt check on the hashing pool"""
+    user = _cached_user(username) or await blocking.run(get_cached_user, username)
+    if not user:
+        return None
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -56,7 +112,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str) -> UserInDB:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -70,13 +126,14 @@ async def get_current_user(token: str) -> UserInDB:
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    
-    user = get_user(username=token_data.username)
+
+    # A cache hit never leaves the event loop; a miss reads SQLite on the blocking pool
+    user = _cached_user(token_data.username) or await blocking.run(get_cached_user, token_data.username)
     if user is None:
         raise credentials_exception
     return user
 
-async def get_current_active_user(current_user: UserInDB) -> UserInDB:
+async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
@@ -1,9 +1,110 @@
 import pandas as pd
-from datetime import datetime, time
+import base64
+from datetime import date, datetime, time, timedelta
+import json
 import os
 from pathlib import Path
-import sqlite3
-from typing import List, Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .db_pool import get_pool
+
+# Bumped whenever migrate_schema() learns a new step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 3
+# Idempotency keys of ingested device events are remembered this long
+EVENT_KEY_RETENTION = timedelta(days=7)
+# Rows read per keyset page, and the largest page a client may ask for
+ATTENDANCE_PAGE_SIZE = 500
+MAX_ATTENDANCE_PAGE_SIZE = 5000
+
+
+def migrate_schema(conn):
+    """Bring an existing database up to SCHEMA_VERSION; runs inside the caller's transaction"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        # Dates are compared as 'YYYY-MM-DD' text ranges from now on
+        conn.execute('''
+            UPDATE attendance SET date = date(date)
+            WHERE date(date) IS NOT NULL AND date <> date(date)
+        ''')
+        # One session per employee per shift per day: fold duplicates into the earliest row
+        conn.execute('''
+            UPDATE attendance SET check_out = (
+                SELECT MAX(a2.check_out) FROM attendance a2
+                WHERE a2.employee_name = attendance.employee_name
+                  AND a2.date = attendance.date AND a2.shift IS attendance.shift
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM attendance
+                GROUP BY employee_name, date, shift HAVING COUNT(*) > 1
+            )
+        ''')
+        conn.execute('''
+            DELETE FROM attendance WHERE id NOT IN (
+                SELECT MIN(id) FROM attendance GROUP BY employee_name, date, shift
+            )
+        ''')
+        # Serves date ranges (today, monthly report) and the per-session lookup
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_date_employee_shift
+            ON attendance (date, employee_name, shift)
+        ''')
+        # Serves per-employee history
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS ix_attendance_employee_date
+            ON attendance (employee_name, date)
+        ''')
+    if version < 2:
+        # Idempotency keys for /events/batch, with the result that was returned the first time
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ingested_events (
+                event_id TEXT PRIMARY KEY,
+                employee_name TEXT,
+                device_id TEXT,
+                event_time TIMESTAMP,
+                confidence REAL,
+                received_at TIMESTAMP,
+                result TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS ix_ingested_events_received_at
+            ON ingested_events (received_at)
+        ''')
+    if version < 3:
+        # (date, rowid) order: keyset pagination of /attendance/all walks this index backwards
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS ix_attendance_date
+            ON attendance (date)
+        ''')
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("ANALYZE")
+
+
+def day_range(day) -> Tuple[str, str]:
+    """[start, end) 'YYYY-MM-DD' bounds of one day, for index-friendly range predicates"""
+    return day.strftime('%Y-%m-%d'), (day + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def month_range(year: int, month: int) -> Tuple[str, str]:
+    """[start, end) 'YYYY-MM-DD' bounds of one calendar month"""
+    end_year, end_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{end_year:04d}-{end_month:02d}-01"
+
+
+def encode_cursor(key: Tuple[str, int]) -> str:
+    """Opaque page cursor for a (date, id) keyset position"""
+    return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, row_id = raw.split("|")
+        date.fromisoformat(day)
+        return day, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
 
 class AttendanceDB:
     def __init__(self):
@@ -11,13 +112,33 @@ class AttendanceDB:
         self.root_dir = Path(__file__).parent.parent
         self.attendance_path = self.root_dir / "Attendance_Entry"
         self.users_path = self.root_dir / "Attendance_data"
-        self.db_path = self.root_dir / "attendance.db"
+        self.db_path = Path(os.environ.get("ATTENDANCE_DB", self.root_dir / "attendance.db"))
+        # Shared per process: WAL, tuned pragmas, pooled readers and a single writer
+        self.pool = get_pool(self.db_path)
+        # Bumped after every commit that changes attendance rows (not devices or
+        # ingest bookkeeping); version token for the attendance endpoints' caches
+        self.attendance_version = 0
+        self._ingest_listeners: List[Callable[[List[dict]], None]] = []
         self.init_db()
+
+    def on_ingest(self, listener: Callable[[List[dict]], None]):
+        """Call `listener(attendance_results)` after ingest_events() committed new events"""
+        self._ingest_listeners.append(listener)
+
+    def get_connection(self, write: bool = False):
+        """
+        Context manager yielding a pooled connection. Read connections are
+        read-only; a write connection runs the block in one transaction.
+        """
+        return self.pool.write() if write else self.pool.read()
         
     def init_db(self):
         """Initialize database with required tables"""
-        conn = sqlite3.connect(str(self.db_path))
-        c = conn.cursor()
+        with self.pool.write() as conn:
+            self._create_tables(conn.cursor())
+            migrate_schema(conn)
+
+    def _create_tables(self, c):
         
         # Create users table
         c.execute('''
@@ -55,9 +176,6 @@ class AttendanceDB:
                 status TEXT
             )
         ''')
-        
-        conn.commit()
-        conn.close()
 
     def _safe_read_csv(self, csv_path):
         """Try reading a CSV robustly. Attempts multiple parsers and separators,
@@ -103,22 +221,26 @@ class AttendanceDB:
         df = df.rename(columns=mapping)
         return df
         
-    def validate_shift_time(self, check_time: time, employee_name: str) -> Tuple[str, str]:
+    def validate_shift_time(self, check_time: time, employee_name: str, conn=None) -> Tuple[str, str]:
         """Validate check time and return shift and status based on employee's registered shift"""
+        # Get employee's registered shift (on the caller's connection when inside a transaction)
+        if conn is None:
+            with self.pool.read() as conn:
+                result = conn.execute('SELECT shift FROM users WHERE username = ?', (employee_name,)).fetchone()
+        else:
+            result = conn.execute('SELECT shift FROM users WHERE username = ?', (employee_name,)).fetchone()
+        
+        registered_shift = result[0] if result else None
+        return self.classify_shift(check_time, registered_shift)
+
+    @staticmethod
+    def classify_shift(check_time: time, registered_shift: Optional[str]) -> Tuple[str, str]:
+        """(shift, status) for a check time, given the employee's registered shift (or None)"""
         morning_start = time(8, 0)
         morning_end = time(16, 0)
         night_start = time(16, 0)
         night_end = time(22, 0)
         
-        # Get employee's registered shift
-        conn = sqlite3.connect(str(self.db_path))
-        c = conn.cursor()
-        c.execute('SELECT shift FROM users WHERE username = ?', (employee_name,))
-        result = c.fetchone()
-        conn.close()
-        
-        registered_shift = result[0] if result else None
-        
         if registered_shift == 'morning':
             if morning_start <= check_time < morning_end:
                 if check_time > time(8, 15):  # 15 minutes tolerance
@@ -151,58 +273,165 @@ class AttendanceDB:
                 shift = "unknown"
                 status = "invalid"
             return shift, status
+
+    def _upsert_attendance(self, conn, employee_name: str, device_id: str, when: datetime,
+                           shift: str, status: str) -> dict:
+        """
+        Check-in or check-out in one statement: the first event of a
+        (date, employee, shift) session inserts the check-in, the second sets
+        check_out, anything after that leaves the row alone and is reported invalid.
+        """
+        day = when.date().isoformat()
+        clock = when.strftime('%H:%M:%S')
+        row = conn.execute('''
+            INSERT INTO attendance (employee_name, date, check_in, shift, status, device_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (date, employee_name, shift) DO UPDATE SET
+                check_out = excluded.check_in
+            WHERE attendance.check_out IS NULL
+            RETURNING check_out
+        ''', (employee_name, day, clock, shift, status, device_id)).fetchone()
         
-    def mark_attendance(self, employee_name: str, device_id: str):
-        """Mark attendance with shift validation"""
-        now = datetime.now()
-        current_time = now.time()
-        
-        shift, status = self.validate_shift_time(current_time)
-        
-        conn = sqlite3.connect(str(self.db_path))
-        c = conn.cursor()
-        
-        # Check if already checked in today
-        c.execute('''
-            SELECT check_in, check_out FROM attendance 
-            WHERE employee_name = ? AND date = ? AND shift = ?
-        ''', (employee_name, now.date(), shift))
-        
-        existing = c.fetchone()
-        
-        if existing:
-            if existing[1] is None:  # No check-out yet
-                # Update check-out time
-                c.execute('''
-                    UPDATE attendance 
-                    SET check_out = ? 
-                    WHERE employee_name = ? AND date = ? AND shift = ?
-                ''', (current_time, employee_name, now.date(), shift))
-            else:
-                status = "invalid"  # Already checked out
+        if row is None:
+            # Session already has a check-out; nothing was written
+            checked_in, checked_out, status = None, None, "invalid"
+        elif row[0] is None:
+            checked_in, checked_out = clock, None
         else:
-            # New check-in
-            c.execute('''
-                INSERT INTO attendance (employee_name, date, check_in, shift, status, device_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (employee_name, now.date(), current_time, shift, status, device_id))
-        
-        conn.commit()
-        
-        # Update device status
-        self.update_device_status(device_id, "active")
-        
-        conn.close()
-        
+            checked_in, checked_out = None, clock
         return {
             "employee_name": employee_name,
-            "date": now.date().isoformat(),
-            "check_in": current_time.isoformat() if not existing else None,
-            "check_out": current_time.isoformat() if existing else None,
+            "date": day,
+            "check_in": checked_in,
+            "check_out": checked_out,
             "shift": shift,
             "status": status,
             "device_id": device_id
         }
+
+    def _touch_device(self, conn, device_id: str, status: str, when: datetime):
+        return conn.execute('''
+            INSERT INTO devices (device_id, status, last_active)
+            VALUES (?, ?, ?)
+            ON CONFLICT(device_id) DO UPDATE SET
+                status = excluded.status,
+                last_active = excluded.last_active
+            RETURNING device_id, name, location, last_active, status
+        ''', (device_id, status, when)).fetchone()
+        
+    def mark_attendance(self, employee_name: str, device_id: str, when: Optional[datetime] = None):
+        """Mark attendance with shift validation; the device heartbeat is written in the same transaction"""
+        now = when or datetime.now()
+        
+        with self.pool.write() as conn:
+            shift, status = self.validate_shift_time(now.time(), employee_name, conn)
+            result = self._upsert_attendance(conn, employee_name, device_id, now, shift, status)
+            self._touch_device(conn, device_id, "active", now)
+        self.attendance_version += 1
+        return result
+
+    def mark_attendance_bulk(self, events: List[dict]) -> List[dict]:
+        """
+        Ingest many recognition events in one transaction. Each event has
+        "employee_name", "device_id" and optionally "timestamp" (datetime,
+        defaults to now). Events are applied in order; results line up with them.
+        """
+        if not events:
+            return []
+        with self.pool.write() as conn:
+            results = self._apply_events(conn, events)
+        self.attendance_version += 1
+        return results
+
+    def _apply_events(self, conn, events: List[dict]) -> List[dict]:
+        now = datetime.now()
+        events = [dict(event, timestamp=event.get("timestamp") or now) for event in events]
+        names = sorted({event["employee_name"] for event in events})
+        
+        # Registered shifts for everyone in the batch in one query per 500 names
+        shifts = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            shifts.update(conn.execute(
+                f'SELECT username, shift FROM users WHERE username IN ({placeholders})', chunk
+            ).fetchall())
+        
+        results = []
+        last_seen = {}
+        for event in events:
+            when = event["timestamp"]
+            shift, status = self.classify_shift(when.time(), shifts.get(event["employee_name"]))
+            results.append(self._upsert_attendance(conn, event["employee_name"], event["device_id"],
+                                                   when, shift, status))
+            last_seen[event["device_id"]] = max(when, last_seen.get(event["device_id"], when))
+        
+        # Device rows are written inline, in the attendance transaction; only heartbeats
+        # go through the fleet registry's timed flush
+        conn.executemany('''
+            INSERT INTO devices (device_id, status, last_active)
+            VALUES (?, 'active', ?)
+            ON CONFLICT(device_id) DO UPDATE SET
+                status = excluded.status,
+                last_active = MAX(COALESCE(devices.last_active, ''), excluded.last_active)
+        ''', list(last_seen.items()))
+        return results
+
+    def ingest_events(self, events: List[dict]) -> List[dict]:
+        """
+        Idempotent bulk ingest for edge devices. Each event has "event_id",
+        "employee_name", "device_id", "timestamp" and optionally "confidence".
+        An event_id seen before (in an earlier request or earlier in this batch)
+        is not applied again; its original result is returned with status 'duplicate'.
+        Everything happens in one transaction.
+        """
+        if not events:
+            return []
+        received_at = datetime.now()
+        with self.pool.write() as conn:
+            ids = sorted({event["event_id"] for event in events})
+            known = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for event_id, result in conn.execute(
+                    f'SELECT event_id, result FROM ingested_events WHERE event_id IN ({placeholders})', chunk
+                ):
+                    known[event_id] = json.loads(result) if result else None
+            
+            fresh, fresh_ids = [], set()
+            for event in events:
+                if event["event_id"] not in known and event["event_id"] not in fresh_ids:
+                    fresh.append(event)
+                    fresh_ids.add(event["event_id"])
+            applied = dict(zip((e["event_id"] for e in fresh), self._apply_events(conn, fresh)))
+            
+            conn.executemany('''
+                INSERT INTO ingested_events
+                    (event_id, employee_name, device_id, event_time, confidence, received_at, result)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(e["event_id"], e["employee_name"], e["device_id"], e["timestamp"],
+                   e.get("confidence"), received_at, json.dumps(applied[e["event_id"]])) for e in fresh])
+            conn.execute('DELETE FROM ingested_events WHERE received_at < ?',
+                         (received_at - EVENT_KEY_RETENTION,))
+        
+        if fresh:
+            self.attendance_version += 1
+            written = [applied[e["event_id"]] for e in fresh]
+            for listener in self._ingest_listeners:
+                listener(written)
+
+        results = []
+        reported = set()
+        for event in events:
+            event_id = event["event_id"]
+            if event_id in applied and event_id not in reported:
+                results.append({"event_id": event_id, "status": "accepted", "attendance": applied[event_id]})
+                reported.add(event_id)
+            else:
+                results.append({"event_id": event_id, "status": "duplicate",
+                                "attendance": known.get(event_id, applied.get(event_id))})
+        return results
         
     def get_attendance_by_date(self, date=None):
         """Get attendance records for a specific date"""
@@ -219,16 +448,14 @@ class AttendanceDB:
                         return []
 
             # First try SQLite database
-            conn = sqlite3.connect(str(self.db_path))
-            c = conn.cursor()
-            
-            c.execute('''
-                SELECT employee_name, date, check_in, check_out, shift, status, device_id 
-                FROM attendance WHERE date(date) = date(?)
-            ''', (date.strftime('%Y-%m-%d'),))
+            with self.pool.read() as conn:
+                rows = conn.execute('''
+                    SELECT employee_name, date, check_in, check_out, shift, status, device_id 
+                    FROM attendance WHERE date >= ? AND date < ?
+                ''', day_range(date)).fetchall()
             
             records = []
-            for row in c.fetchall():
+            for row in rows:
                 records.append({
                     "name": row[0],
                     "date": str(row[1]),
@@ -237,8 +464,6 @@ class AttendanceDB:
                     "status": row[5] if row[5] else "unknown",
                     "device_id": row[6] if row[6] else ""
                 })
-            
-            conn.close()
 
             # If no records in SQLite, try CSV files
             if not records:
@@ -277,8 +502,6 @@ class AttendanceDB:
     
     def get_monthly_report(self, year: int, month: int) -> pd.DataFrame:
         """Get monthly attendance report"""
-        conn = sqlite3.connect(str(self.db_path))
-        
         query = '''
             SELECT 
                 employee_name,
@@ -288,35 +511,17 @@ class AttendanceDB:
                 SUM(CASE WHEN status = 'late' THEN 1 ELSE 0 END) as late,
                 SUM(CASE WHEN status = 'invalid' THEN 1 ELSE 0 END) as invalid
             FROM attendance 
-            WHERE strftime('%Y', date) = ? AND strftime('%m', date) = ?
+            WHERE date >= ? AND date < ?
             GROUP BY employee_name, shift
         '''
         
-        df = pd.read_sql_query(query, conn, params=(str(year), f"{month:02d}"))
-        conn.close()
-        return df
+        with self.pool.read() as conn:
+            return pd.read_sql_query(query, conn, params=month_range(year, month))
     
     def update_device_status(self, device_id: str, status: str):
         """Update device status and last active time"""
-        conn = sqlite3.connect(str(self.db_path))
-        c = conn.cursor()
-        
-        now = datetime.now()
-        
-        c.execute('''
-            INSERT INTO devices (device_id, status, last_active)
-            VALUES (?, ?, ?)
-            ON CONFLICT(device_id) DO UPDATE SET
-                status = ?,
-                last_active = ?
-        ''', (device_id, status, now, status, now))
-        
-        conn.commit()
-        
-        c.execute('SELECT * FROM devices WHERE device_id = ?', (device_id,))
-        device = c.fetchone()
-        
-        conn.close()
+        with self.pool.write() as conn:
+            device = self._touch_device(conn, device_id, status, datetime.now())
         
         return {
             "device_id": device[0],
@@ -326,55 +531,121 @@ class AttendanceDB:
             "status": device[4]
         }
     
+    def iter_attendance(self, start: Optional[date] = None, end: Optional[date] = None,
+                        employee: Optional[str] = None, shift: Optional[str] = None,
+                        status: Optional[str] = None, after: Optional[Tuple[str, int]] = None,
+                        page_size: int = ATTENDANCE_PAGE_SIZE) -> Iterator[Tuple[Tuple[str, int], dict]]:
+        """
+        (key, record) for every attendance row matching the filters, newest
+        first, resuming after the keyset position `after`. Rows are read one
+        page at a time on a short-lived read connection, so memory stays
+        constant and a long export never pins a reader. `start`/`end` are
+        inclusive dates. Falls back to the legacy CSV files while the table is empty.
+        """
+        with self.pool.read() as conn:
+            empty = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM attendance)").fetchone()[0]
+        if empty:
+            yield from self._iter_legacy_attendance(start, end, employee, shift, status, after)
+            return
+
+        conditions, params = [], []
+        if start:
+            conditions.append("date >= ?")
+            params.append(start.isoformat())
+        if end:
+            conditions.append("date < ?")
+            params.append((end + timedelta(days=1)).isoformat())
+        for column, value in (("employee_name", employee), ("shift", shift), ("status", status)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        conditions.append("(date, id) < (?, ?)")
+        query = f'''
+            SELECT id, employee_name, date, check_in, check_out, shift, status, device_id
+            FROM attendance
+            WHERE {" AND ".join(conditions)}
+            ORDER BY date DESC, id DESC
+            LIMIT ?
+        '''
+        # Start past the newest possible key
+        key = after or ("9999-12-31", 2 ** 63 - 1)
+        while True:
+            with self.pool.read() as conn:
+                rows = conn.execute(query, params + [key[0], key[1], page_size]).fetchall()
+            for row in rows:
+                key = (str(row[2]), row[0])
+                yield key, {
+                    "name": row[1],
+                    "date": str(row[2]),
+                    "time": str(row[3]) if row[3] else None,
+                    "check_out": str(row[4]) if row[4] else None,
+                    "shift": row[5] if row[5] else "unknown",
+                    "status": row[6] if row[6] else "unknown",
+                    "device_id": row[7] if row[7] else ""
+                }
+            if len(rows) < page_size:
+                return
+
+    def _iter_legacy_attendance(self, start, end, employee, shift, status, after):
+        """iter_attendance() over the daily Attendance_yy_mm_dd.csv files, one file in memory at a time"""
+        if not self.attendance_path.exists() or status not in (None, "legacy"):
+            return
+        files = []
+        for csv_file in self.attendance_path.glob("Attendance_*.csv"):
+            try:
+                day = datetime.strptime(csv_file.stem, "Attendance_%y_%m_%d").date()
+            except ValueError:
+                continue
+            if (start and day < start) or (end and day > end) or (after and day.isoformat() > after[0]):
+                continue
+            files.append((day, csv_file))
+
+        for day, csv_file in sorted(files, reverse=True):
+            df = self._safe_read_csv(csv_file)
+            if df is None:
+                print(f"Skipping malformed CSV: {csv_file}")
+                continue
+            # Row numbers stand in for ids, so cursors work the same on both sources
+            for index in range(len(df) - 1, -1, -1):
+                key = (day.isoformat(), index)
+                if after and key >= after:
+                    continue
+                name, check_in = str(df["Name"].iat[index]), str(df["Time"].iat[index])
+                row_shift = self.determine_shift(check_in)
+                if (employee and name != employee) or (shift and row_shift != shift):
+                    continue
+                yield key, {
+                    "name": name,
+                    "date": day.isoformat(),
+                    "time": check_in,
+                    "check_out": None,
+                    "shift": row_shift,
+                    "status": "legacy",
+                    "device_id": "legacy_device"
+                }
+
+    def get_attendance_page(self, limit: int = ATTENDANCE_PAGE_SIZE, cursor: Optional[str] = None,
+                            **filters) -> Tuple[List[dict], Optional[str]]:
+        """One page of iter_attendance() plus the cursor of the next page (None on the last one)"""
+        limit = max(1, min(limit, MAX_ATTENDANCE_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        records, last_key = [], None
+        for key, record in self.iter_attendance(after=after, page_size=limit + 1, **filters):
+            if len(records) == limit:
+                return records, encode_cursor(last_key)
+            records.append(record)
+            last_key = key
+        return records, None
+
+    def latest_attendance_id(self) -> int:
+        """Highest attendance rowid: changes whenever any process inserts a row"""
+        with self.pool.read() as conn:
+            return conn.execute("SELECT MAX(id) FROM attendance").fetchone()[0] or 0
+
     def get_all_attendance(self):
         """Get all attendance records"""
         try:
-            records = []
-            
-            # Get from SQLite
-            conn = sqlite3.connect(str(self.db_path))
-            c = conn.cursor()
-            c.execute('''
-                SELECT employee_name, date, check_in, check_out, shift, status, device_id 
-                FROM attendance 
-                ORDER BY date DESC, check_in DESC
-            ''')
-            
-            for row in c.fetchall():
-                records.append({
-                    "name": row[0],
-                    "date": str(row[1]),
-                    "time": str(row[2]) if row[2] else None,
-                    "shift": row[4] if row[4] else "unknown",
-                    "status": row[5] if row[5] else "unknown",
-                    "device_id": row[6] if row[6] else ""
-                })
-            
-            conn.close()
-            
-            # Get from CSV files if needed
-            if not records and self.attendance_path.exists():
-                for csv_file in self.attendance_path.glob("Attendance_*.csv"):
-                    try:
-                        df = self._safe_read_csv(csv_file)
-                        if df is None:
-                            print(f"Skipping malformed CSV: {csv_file}")
-                            continue
-                        for _, row in df.iterrows():
-                            records.append({
-                                "employee_name": row["Name"],
-                                "date": row["Date"],
-                                "check_in": row["Time"],
-                                "check_out": None,
-                                "shift": self.determine_shift(row["Time"]),
-                                "status": "legacy",
-                                "device_id": "legacy_device"
-                            })
-                    except Exception as e:
-                        print(f"Error reading {csv_file}: {e}")
-                        continue
-            
-            return records
+            return [record for _, record in self.iter_attendance()]
         except Exception as e:
             print(f"Error in get_all_attendance: {e}")
             return []
@@ -382,18 +653,34 @@ class AttendanceDB:
     def get_all_devices(self):
         """Get list of all devices and their status"""
         try:
-            # For now, return a default device
+            with self.pool.read() as conn:
+                rows = conn.execute(
+                    'SELECT device_id, name, location, last_active, status FROM devices ORDER BY device_id'
+                ).fetchall()
             return [{
-                "device_id": "default",
-                "name": "Default Camera",
-                "location": "Main Entrance",
-                "last_active": datetime.now().isoformat(),
-                "status": "active"
-            }]
+                "device_id": row[0],
+                "name": row[1] or "",
+                "location": row[2] or "",
+                "last_active": row[3],
+                "status": row[4] or "inactive"
+            } for row in rows]
         except Exception as e:
             print(f"Error in get_all_devices: {e}")
             return []
 
+    def save_devices(self, devices: List[dict]):
+        """Upsert many devices (as kept by the fleet registry) in one transaction"""
+        with self.pool.write() as conn:
+            conn.executemany('''
+                INSERT INTO devices (device_id, name, location, last_active, status)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(device_id) DO UPDATE SET
+                    name = COALESCE(NULLIF(excluded.name, ''), devices.name),
+                    location = COALESCE(NULLIF(excluded.location, ''), devices.location),
+                    last_active = MAX(COALESCE(devices.last_active, ''), excluded.last_active),
+                    status = excluded.status
+            ''', [(d["device_id"], d["name"], d["location"], d["last_active"], d["status"]) for d in devices])
+
     def get_registered_users(self):
         """Get list of registered users"""
         try:
@@ -448,20 +735,55 @@ class AttendanceDB:
     def get_users_from_database(self):
         """Get all users from the database"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
             query = '''
                 SELECT username, full_name, role, shift, is_active 
                 FROM users
             '''
-            df = pd.read_sql_query(query, conn)
+            with self.pool.read() as conn:
+                df = pd.read_sql_query(query, conn)
             return df.to_dict(orient="records")
         except Exception as e:
             print(f"Error getting users from database: {e}")
             return []
-        finally:
-            if 'conn' in locals():
-                conn.close()
                 
+    def create_user(self, user, hashed_password: str) -> dict:
+        """Insert a user; raises ValueError if the username is taken"""
+        with self.pool.write() as conn:
+            row = conn.execute('''
+                INSERT INTO users (username, full_name, hashed_password, role, shift, is_active)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(username) DO NOTHING
+                RETURNING username, full_name, role, shift, is_active
+            ''', (user.username, user.full_name, hashed_password, user.role, user.shift, user.is_active)).fetchone()
+        if row is None:
+            raise ValueError(f"User '{user.username}' already exists")
+        return self._user_record(row)
+
+    def update_user(self, username: str, changes: dict) -> Optional[dict]:
+        """
+        Set the given columns (full_name, hashed_password, role, shift,
+        is_active) of one user. Returns the updated user, or None if there is
+        no such user.
+        """
+        columns = [column for column in ("full_name", "hashed_password", "role", "shift", "is_active")
+                   if column in changes]
+        with self.pool.write() as conn:
+            if columns:
+                row = conn.execute(f'''
+                    UPDATE users SET {", ".join(f"{column} = ?" for column in columns)}
+                    WHERE username = ?
+                    RETURNING username, full_name, role, shift, is_active
+                ''', [changes[column] for column in columns] + [username]).fetchone()
+            else:
+                row = conn.execute(
+                    'SELECT username, full_name, role, shift, is_active FROM users WHERE username = ?', (username,)
+                ).fetchone()
+        return self._user_record(row) if row is not None else None
+
+    @staticmethod
+    def _user_record(row) -> dict:
+        return {"username": row[0], "full_name": row[1], "role": row[2], "shift": row[3], "is_active": bool(row[4])}
+
     def delete_user(self, username: str):
         """
         Delete a user from the system:
@@ -472,21 +794,19 @@ class AttendanceDB:
         """
         try:
             # 1. Delete from database
-            conn = sqlite3.connect(str(self.db_path))
-            c = conn.cursor()
-            
-            # Delete from users table
-            c.execute('DELETE FROM users WHERE username = ?', (username,))
-            
-            # Mark attendance records as inactive
-            c.execute('''
-                UPDATE attendance
-                SET status = 'user_deleted'
-                WHERE employee_name = ?
-            ''', (username,))
-            
-            conn.commit()
-            conn.close()
+            with self.pool.write() as conn:
+                c = conn.cursor()
+                
+                # Delete from users table
+                c.execute('DELETE FROM users WHERE username = ?', (username,))
+                
+                # Mark attendance records as inactive
+                c.execute('''
+                    UPDATE attendance
+                    SET status = 'user_deleted'
+                    WHERE employee_name = ?
+                ''', (username,))
+            self.attendance_version += 1
             
             # 2. Delete user images
             # This is actually handled by the client side function delete_user_completely
@@ -511,6 +831,14 @@ class AttendanceDB:
                 except Exception as e:
                     print(f"API: Error deleting folder {user_folder}: {e}")
             
+            # 3. Drop the user from the persisted ANN index (only present for large galleries)
+            try:
+                from recognition.ann_index import remove_identity_from_index
+                if remove_identity_from_index(username):
+                    print(f"API: Removed {username} from ANN index")
+            except Exception as e:
+                print(f"API: Error updating ANN index for {username}: {e}")
+            
             return {"status": "success", "message": f"User '{username}' deleted successfully"}
         except Exception as e:
             print(f"API: Error in delete_user: {e}")
@@ -0,0 +1,127 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+from recognition import metrics
+
+# Per-connection pragmas. WAL lets readers run while a write is in progress;
+# synchronous=NORMAL is durable across application crashes in WAL mode and
+# avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+READERS = 8  # pooled read-only connections
+STATEMENT_CACHE = 256  # prepared statements kept per connection (sqlite3 LRU)
+ACQUIRE_TIMEOUT = 10.0  # seconds to wait for a free reader
+
+ACQUIRE_TIME = metrics.histogram("sqlite_acquire_seconds", "Waiting for a pooled connection", ["mode"])
+HOLD_TIME = metrics.histogram("sqlite_transaction_seconds", "Queries run on one borrowed connection", ["mode"])
+ERRORS = metrics.counter("sqlite_errors", "Blocks that raised on a pooled connection", ["mode"])
+_read_acquire, _write_acquire = ACQUIRE_TIME.labels("read"), ACQUIRE_TIME.labels("write")
+_read_hold, _write_hold = HOLD_TIME.labels("read"), HOLD_TIME.labels("write")
+_read_errors, _write_errors = ERRORS.labels("read"), ERRORS.labels("write")
+
+
+class ConnectionPool:
+    """
+    Thread-safe SQLite connection pool.
+
+    A single writer connection (serialised by a lock, because SQLite allows
+    one writer at a time anyway) and a fixed set of read-only connections.
+    The database runs in WAL mode, so readers never wait for the writer.
+    Connections live for the life of the pool; sqlite3's per-connection
+    statement cache keeps the prepared form of every query text reused.
+    """
+
+    def __init__(self, db_path, readers: int = READERS):
+        self.db_path = str(db_path)
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        # journal_mode is persistent in the database file; set it once
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(readers):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._readers.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit, transactions are opened explicitly by write()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE, timeout=5.0)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection"""
+        start = time.perf_counter()
+        try:
+            conn = self._readers.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            _read_errors.inc()
+            raise TimeoutError("No free database connection")
+        acquired = time.perf_counter()
+        _read_acquire.observe(acquired - start)
+        try:
+            yield conn
+        except BaseException:
+            _read_errors.inc()
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+            _read_hold.observe(time.perf_counter() - acquired)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in one IMMEDIATE transaction on the writer connection"""
+        start = time.perf_counter()
+        with self._write_lock:
+            acquired = time.perf_counter()
+            _write_acquire.observe(acquired - start)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                _write_errors.inc()
+                raise
+            else:
+                conn.commit()
+            finally:
+                _write_hold.observe(time.perf_counter() - acquired)
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path) -> ConnectionPool:
+    """One pool per database file and process, shared by every AttendanceDB"""
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key)
+        return pool
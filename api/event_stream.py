@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Set, Tuple
+
+HISTORY = 1000  # recent events kept for clients resuming with Last-Event-ID
+SUBSCRIBER_QUEUE = 256  # events buffered per client before it is resynced with a snapshot
+KEEPALIVE_INTERVAL = 15.0  # seconds between comment lines that keep idle proxies from closing the stream
+
+
+def format_event(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    """One connected client: a bounded queue plus a flag set when it fell behind"""
+
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[Tuple[int, str, Any]]" = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+
+class EventBroadcaster:
+    """
+    Fan-out of live events to Server-Sent Events clients.
+
+    publish() is thread-safe: ingest runs on executor threads, so events are
+    numbered and recorded under a lock and handed to the event loop with
+    call_soon_threadsafe. Each client has a bounded queue; a client that
+    cannot keep up is marked lagged instead of growing memory, and its stream
+    sends a fresh snapshot. The last `history` events are kept so a client
+    reconnecting with Last-Event-ID gets exactly what it missed.
+
+    Event numbers restart at 1 with every process, so ids on the wire carry
+    a per-process boot token ("<boot>-<n>"): an id from an earlier run (or
+    one this process never issued) is answered with a snapshot instead of
+    being compared with the new numbering.
+    """
+
+    def __init__(self, history: int = HISTORY, queue_size: int = SUBSCRIBER_QUEUE, boot: Optional[str] = None):
+        self.queue_size = queue_size
+        self.boot = boot or os.urandom(4).hex()
+        self._history: Deque[Tuple[int, str, Any]] = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Deliver to clients on `loop` (call once from the server's startup hook)"""
+        self._loop = loop
+
+    def event_id(self, number: int) -> str:
+        """Wire id of event `number`"""
+        return f"{self.boot}-{number}"
+
+    def parse_id(self, event_id: Optional[str]) -> Optional[int]:
+        """Event number of a Last-Event-ID issued by this process, else None"""
+        boot, _, number = (event_id or "").rpartition("-")
+        if boot != self.boot or not number.isdigit():
+            return None
+        return int(number)
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._history[-1][0] if self._history else 0
+
+    def publish(self, event: str, data: Any):
+        with self._lock:
+            item = (next(self._ids), event, data)
+            self._history.append(item)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._fan_out, item)
+
+    def _fan_out(self, item):
+        for subscriber in self._subscribers:
+            if subscriber.lagged:
+                continue
+            try:
+                subscriber.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscriber, Optional[List]]:
+        """
+        Register a client. Returns it with the events it missed since
+        `last_event_id`, or None when the client needs a snapshot instead:
+        no id was given, the id comes from another process or is newer than
+        anything published, or the missed events are no longer all in the
+        history.
+        """
+        subscriber = Subscriber(self.queue_size)
+        # Registered before the history is read, so nothing published in between is lost
+        self._subscribers.add(subscriber)
+        last_event_id = self.parse_id(last_event_id)
+        if last_event_id is None:
+            return subscriber, None
+        with self._lock:
+            history = list(self._history)
+        newest = history[-1][0] if history else 0
+        if last_event_id > newest:
+            return subscriber, None
+        if last_event_id == newest:
+            return subscriber, []
+        if history[0][0] > last_event_id + 1:
+            return subscriber, None
+        return subscriber, [item for item in history if item[0] > last_event_id]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+def attendance_event(result: dict) -> Optional[dict]:
+    """The attendance record of an ingest result, shaped like /attendance/all rows; None if nothing changed"""
+    if not result or (result.get("check_in") is None and result.get("check_out") is None):
+        return None
+    return {
+        "name": result["employee_name"],
+        "date": result["date"],
+        "time": result["check_in"],
+        "check_out": result["check_out"],
+        "shift": result["shift"],
+        "status": result["status"],
+        "device_id": result["device_id"],
+    }
+
+
+def publish_ingested(broadcaster: EventBroadcaster) -> Callable[[List[dict]], None]:
+    """AttendanceDB.on_ingest listener publishing every written attendance change"""
+    def listener(results: List[dict]):
+        for result in results:
+            record = attendance_event(result)
+            if record is not None:
+                broadcaster.publish("attendance", record)
+    return listener
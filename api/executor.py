@@ -0,0 +1,79 @@
+"""
+Bounded executors for the blocking work behind the async API handlers.
+
+sqlite3, pandas and pathlib calls block the thread they run on. Running them
+on the event loop stalls every request; handing them to Starlette's shared
+threadpool lets one heavy endpoint take all of its threads. Instead the
+handlers use dedicated pools with configurable sizes:
+
+    API_BLOCKING_WORKERS     short DB/filesystem calls of ordinary requests
+    API_EXPORT_WORKERS       long-running streamed exports (NDJSON/CSV)
+    API_HASH_WORKERS         bcrypt password hashing and verification
+    API_RECOGNITION_WORKERS  image decoding and recognition calls of
+                             /recognize, /recognize/batch and /ws/recognize
+
+so a burst of exports or recognition uploads can at worst queue behind each
+other, never in front of /health or a dashboard page.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable, TypeVar
+
+from .db_pool import READERS
+
+T = TypeVar("T")
+
+# One thread per pooled read connection, plus one for the writer
+BLOCKING_WORKERS = int(os.environ.get("API_BLOCKING_WORKERS", READERS + 1))
+EXPORT_WORKERS = int(os.environ.get("API_EXPORT_WORKERS", 2))
+# bcrypt releases the GIL but burns ~0.1-0.3 s of CPU per call; keep logins off the DB threads
+HASH_WORKERS = int(os.environ.get("API_HASH_WORKERS", 2))
+# Image decoding and waiting on the dlib processes; CPU-bound, so a few threads are enough
+RECOGNITION_WORKERS = int(os.environ.get("API_RECOGNITION_WORKERS", 4))
+EXPORT_CHUNK = 200  # items pulled from an export generator per executor hop
+
+
+class BlockingExecutor:
+    """A named, fixed-size thread pool awaited from the event loop"""
+
+    def __init__(self, workers: int, name: str):
+        self.workers = max(1, workers)
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    async def iterate(self, iterable: Iterable[T], chunk: int = EXPORT_CHUNK) -> AsyncIterator[T]:
+        """
+        Drive a blocking iterator on this pool, `chunk` items per hop, and
+        yield them on the event loop (e.g. as a StreamingResponse body).
+        """
+        iterator = iter(iterable)
+
+        def next_chunk():
+            items = []
+            for item in iterator:
+                items.append(item)
+                if len(items) >= chunk:
+                    break
+            return items
+
+        while True:
+            items = await self.run(next_chunk)
+            if not items:
+                return
+            for item in items:
+                yield item
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+blocking = BlockingExecutor(BLOCKING_WORKERS, "api-blocking")
+exports = BlockingExecutor(EXPORT_WORKERS, "api-export")
+hashing = BlockingExecutor(HASH_WORKERS, "api-hash")
+recognizing = BlockingExecutor(RECOGNITION_WORKERS, "api-recognition")
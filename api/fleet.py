@@ -0,0 +1,177 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+FLUSH_INTERVAL = 5.0  # seconds between writes of changed devices to the devices table
+OFFLINE_AFTER = 30.0  # seconds without a heartbeat before a device is reported inactive
+
+
+class FleetRegistry:
+    """
+    Status of every kiosk, kept in memory.
+
+    Heartbeats only update a dict entry and mark the device dirty; a
+    background thread writes all dirty devices to the `devices` table in one
+    transaction every `flush_interval` seconds, and turns devices that
+    stopped heartbeating inactive. Ingested attendance events are different:
+    the ingest transaction upserts their devices' rows itself, and
+    record_ingested() only mirrors that into memory. Online/offline is
+    therefore derived from last-seen times, the counts are maintained as
+    devices change state, and reads never touch the database.
+    """
+
+    def __init__(self, db, flush_interval: float = FLUSH_INTERVAL, offline_after: float = OFFLINE_AFTER):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.offline_after = timedelta(seconds=offline_after)
+        # Bumped on every change; cheap version token for HTTP caching
+        self.version = 0
+        self.flushes = 0
+        self._devices: Dict[str, dict] = {}
+        self._active: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._listing = (-1, [])
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Seed from the devices table; statuses are recomputed from last_active"""
+        now = datetime.now()
+        with self._lock:
+            for device in self.db.get_all_devices():
+                last_active = device["last_active"]
+                if isinstance(last_active, str):
+                    last_active = datetime.fromisoformat(last_active) if last_active else None
+                device["last_active"] = last_active
+                device["status"] = "active" if last_active and now - last_active < self.offline_after else "inactive"
+                self._devices[device["device_id"]] = device
+                if device["status"] == "active":
+                    self._active.add(device["device_id"])
+            self.version += 1
+
+    # ----- updates -----
+
+    def heartbeat(self, device_id: str, name: Optional[str] = None, location: Optional[str] = None,
+                  status: str = "active") -> dict:
+        """Record one sign of life (or an explicit status); O(1), no I/O"""
+        seen = datetime.now()
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                device = self._devices[device_id] = {
+                    "device_id": device_id, "name": "", "location": "", "last_active": None, "status": "inactive",
+                }
+            if name:
+                device["name"] = name
+            if location:
+                device["location"] = location
+            if device["last_active"] is None or seen > device["last_active"]:
+                device["last_active"] = seen
+            self._set_status(device, status)
+            self._dirty.add(device_id)
+            self.version += 1
+            return dict(device)
+
+    def heartbeats(self, beats: Iterable[dict]) -> int:
+        count = 0
+        for beat in beats:
+            self.heartbeat(beat["device_id"], beat.get("name"), beat.get("location"))
+            count += 1
+        return count
+
+    def record_ingested(self, results: List[dict]):
+        """
+        AttendanceDB.on_ingest listener: a device that sends events is alive.
+        The ingest transaction already upserted the device rows, so nothing
+        is marked dirty here.
+        """
+        now = datetime.now()
+        with self._lock:
+            for result in results:
+                device = self._devices.get(result["device_id"])
+                if device is None:
+                    device = self._devices[result["device_id"]] = {
+                        "device_id": result["device_id"], "name": "", "location": "", "status": "inactive",
+                    }
+                device["last_active"] = now
+                self._set_status(device, "active")
+            self.version += 1
+
+    def _set_status(self, device: dict, status: str):
+        device["status"] = status
+        if status == "active":
+            self._active.add(device["device_id"])
+        else:
+            self._active.discard(device["device_id"])
+
+    def expire(self, now: Optional[datetime] = None) -> int:
+        """Turn devices that missed their heartbeats inactive; returns how many changed"""
+        cutoff = (now or datetime.now()) - self.offline_after
+        with self._lock:
+            stale = [device_id for device_id in self._active
+                     if self._devices[device_id]["last_active"] is None
+                     or self._devices[device_id]["last_active"] < cutoff]
+            for device_id in stale:
+                self._set_status(self._devices[device_id], "inactive")
+                self._dirty.add(device_id)
+            if stale:
+                self.version += 1
+        return len(stale)
+
+    # ----- reads -----
+
+    def get(self, device_id: str) -> Optional[dict]:
+        with self._lock:
+            device = self._devices.get(device_id)
+            return dict(device) if device is not None else None
+
+    def summary(self) -> dict:
+        with self._lock:
+            total, active = len(self._devices), len(self._active)
+        return {"total": total, "active": active, "inactive": total - active}
+
+    def devices(self) -> List[dict]:
+        """Every device, sorted by id; the list is rebuilt only after a change"""
+        with self._lock:
+            version, listing = self._listing
+            if version != self.version:
+                listing = [dict(self._devices[device_id]) for device_id in sorted(self._devices)]
+                self._listing = (self.version, listing)
+            return listing
+
+    # ----- persistence -----
+
+    def flush(self) -> int:
+        """Write dirty devices in one transaction; returns how many were written"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            rows = [dict(self._devices[device_id]) for device_id in dirty]
+        try:
+            self.db.save_devices(rows)
+        except Exception:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+        self.flushes += 1
+        return len(rows)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fleet-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.expire()
+                self.flush()
+            except Exception as e:
+                print(f"Fleet flush error: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.flush()
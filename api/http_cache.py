@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+PROBE_TTL = 1.0  # seconds between checks for changes made by other processes
+CACHE_ENTRIES = 256  # cached response bodies (one per URL + query)
+
+
+class VersionToken:
+    """
+    Cheap version of a resource, used as its ETag and Last-Modified.
+
+    Three inputs make up the version: an in-memory counter owned by the
+    writer (e.g. AttendanceDB's attendance write count, read on every
+    request), explicit invalidate() calls, and an optional `probe` for
+    changes made by other processes (max rowid, directory mtime) that runs
+    at most once per `ttl` seconds. Between probes a request is answered
+    without touching the database or the filesystem.
+
+    The probe blocks (a pooled read, a stat), so async callers check
+    stale() and run refresh() on an executor, then read current(refresh=False).
+    """
+
+    def __init__(self, counter: Optional[Callable[[], Any]] = None, probe: Optional[Callable[[], Any]] = None,
+                 ttl: float = PROBE_TTL):
+        self.counter = counter
+        self.probe = probe
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._bumps = 0
+        self._probed = None
+        self._probed_at = float("-inf")
+        self._refreshing = False
+        self._key = None
+        self._modified = time.time()
+
+    def invalidate(self):
+        with self._lock:
+            self._bumps += 1
+
+    def stale(self) -> bool:
+        """The probe is due (and nobody is running it already)"""
+        return (self.probe is not None and not self._refreshing
+                and time.monotonic() - self._probed_at >= self.ttl)
+
+    def refresh(self):
+        """Run the probe; blocking, and the lock is not held while it runs"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            probed = self.probe()
+            with self._lock:
+                self._probed = probed
+                self._probed_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def current(self, refresh: bool = True) -> Tuple[str, float]:
+        """(version string, unix time it last changed as seen by this process)"""
+        if refresh and self.stale():
+            self.refresh()
+        with self._lock:
+            key = (self.counter() if self.counter else 0, self._probed, self._bumps)
+            if key != self._key:
+                if self._key is not None:
+                    self._modified = time.time()
+                self._key = key
+            return "-".join(str(part) for part in key), self._modified
+
+
+class ResponseCache:
+    """
+    Conditional GET handling plus an LRU of serialised JSON bodies.
+
+    A request whose If-None-Match (or, without it, If-Modified-Since) is
+    still current gets an empty 304. Otherwise the body cached for the
+    current version is returned, and only after a change is `build` run
+    again (on the `run` executor) and its result serialised once.
+    """
+
+    def __init__(self, entries: int = CACHE_ENTRIES, run: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.entries = entries
+        # Awaitable runner for the blocking build (default: Starlette's threadpool)
+        self._run = run or run_in_threadpool
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+
+    async def respond(self, request: Request, key: str, version: VersionToken, build: Callable[[], Any]) -> Response:
+        if version.stale():
+            # The probe may wait for a pooled connection; keep it off the event loop
+            await self._run(version.refresh)
+        tag, modified = version.current(refresh=False)
+        etag = f'W/"{zlib.crc32(key.encode()):08x}-{tag}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if _not_modified(request, etag, modified):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is not None and cached[0] == etag:
+                self._bodies.move_to_end(key)
+                self.hits += 1
+                return Response(cached[1], media_type="application/json", headers=headers)
+        self.misses += 1
+        body = await self._run(lambda: json.dumps(build(), default=str).encode())
+        with self._lock:
+            self._bodies[key] = (etag, body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.entries:
+                self._bodies.popitem(last=False)
+        return Response(body, media_type="application/json", headers=headers)
+
+
+def _not_modified(request: Request, etag: str, modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
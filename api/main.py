@@ -1,9 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
-from typing import List
-from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Optional
+from datetime import date, datetime, timedelta
+import asyncio
+import csv
+import io
+import json
+import threading
+import time
+from collections import deque
 import uvicorn
 import logging
 
@@ -14,9 +21,17 @@ import logging
 # In that case catch the error, add the project root to sys.path and import the
 # modules using absolute package names so both invocation styles work.
 try:
-    from .database import AttendanceDB
-    from .models import User, UserInDB, Token, TokenData, AttendanceRecord, DeviceInfo
-    from .auth import authenticate_user, create_access_token, get_current_active_user
+    from .database import ATTENDANCE_PAGE_SIZE, AttendanceDB, decode_cursor
+    from .models import (User, UserInDB, UserCreate, UserUpdate, Token, TokenData, AttendanceRecord, DeviceInfo,
+                         EventBatch, EventBatchResponse, HeartbeatBatch)
+    from .auth import (ACCESS_TOKEN_EXPIRE_MINUTES, authenticate_user_async, create_access_token,
+                       get_current_active_user, get_password_hash_async, invalidate_user)
+    from .event_stream import KEEPALIVE_INTERVAL, EventBroadcaster, format_event, publish_ingested
+    from .executor import blocking, exports, hashing, recognizing
+    from .fleet import FleetRegistry
+    from .http_cache import ResponseCache, VersionToken
+    from .recognition_service import (ImageDecodeError, MAX_BATCH_IMAGES, RECOGNITION_ENABLED, StreamSession,
+                                         decode_image, get_service, iter_zip_images, stream_status_fn)
 except Exception:
     import sys
     import os
@@ -26,9 +41,19 @@ except Exception:
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
-    from api.database import AttendanceDB
-    from api.models import User, UserInDB, Token, TokenData, AttendanceRecord, DeviceInfo
-    from api.auth import authenticate_user, create_access_token, get_current_active_user
+    from api.database import ATTENDANCE_PAGE_SIZE, AttendanceDB, decode_cursor
+    from api.models import (User, UserInDB, UserCreate, UserUpdate, Token, TokenData, AttendanceRecord, DeviceInfo,
+                            EventBatch, EventBatchResponse, HeartbeatBatch)
+    from api.auth import (ACCESS_TOKEN_EXPIRE_MINUTES, authenticate_user_async, create_access_token,
+                          get_current_active_user, get_password_hash_async, invalidate_user)
+    from api.event_stream import KEEPALIVE_INTERVAL, EventBroadcaster, format_event, publish_ingested
+    from api.executor import blocking, exports, hashing, recognizing
+    from api.fleet import FleetRegistry
+    from api.http_cache import ResponseCache, VersionToken
+    from api.recognition_service import (ImageDecodeError, MAX_BATCH_IMAGES, RECOGNITION_ENABLED, StreamSession,
+                                         decode_image, get_service, iter_zip_images, stream_status_fn)
+# Shared with the kiosk pipeline; importable once the project root is on sys.path
+from recognition import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,46 +74,226 @@ app.add_middleware(
 
 db = AttendanceDB()
 
+# Live attendance for /events/stream: every change committed by ingest_events() is pushed to the clients
+attendance_events = EventBroadcaster()
+db.on_ingest(publish_ingested(attendance_events))
+# Device status lives in memory; heartbeats are written to the devices table in batches
+fleet = FleetRegistry(db)
+db.on_ingest(fleet.record_ingested)
+
+# Conditional GETs: ETag/Last-Modified from cheap version tokens, bodies cached until they change.
+# Attendance writes in this process bump db_version at once (device and heartbeat flushes do not);
+# the probes catch other processes' writes.
+response_cache = ResponseCache(run=blocking.run)
+db_version = VersionToken(counter=lambda: db.attendance_version, probe=db.latest_attendance_id)
+fleet_version = VersionToken(counter=lambda: fleet.version)
+users_version = VersionToken(probe=lambda: db.users_path.stat().st_mtime_ns if db.users_path.exists() else 0)
+
+HTTP_REQUEST_TIME = metrics.histogram("http_request_duration_seconds", "Time until response headers, per route",
+                                      ["method", "route", "status"])
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP requests being handled")
+CACHE_REQUESTS = metrics.gauge("api_response_cache_requests", "Conditional GETs by outcome", ["result"])
+CACHE_REQUESTS.labels("hit").set_function(lambda: response_cache.hits)
+CACHE_REQUESTS.labels("not_modified").set_function(lambda: response_cache.not_modified)
+CACHE_REQUESTS.labels("miss").set_function(lambda: response_cache.misses)
+FLEET_DEVICES = metrics.gauge("fleet_devices", "Known devices by heartbeat status", ["status"])
+FLEET_DEVICES.labels("active").set_function(lambda: fleet.summary()["active"])
+FLEET_DEVICES.labels("inactive").set_function(lambda: fleet.summary()["inactive"])
+metrics.gauge("sse_clients", "Connected /events/stream clients").set_function(lambda: attendance_events.subscribers)
+
+# Largest /events/batch request accepted in one go
+MAX_EVENTS_PER_BATCH = 1000
+# Columns of the /attendance/all CSV export
+ATTENDANCE_CSV_FIELDS = ["name", "date", "time", "check_out", "shift", "status", "device_id"]
+# Seconds between per-connection stats messages on /ws/recognize
+STREAM_STATS_INTERVAL = 5.0
+
+recognizer = get_service()
+
+@app.on_event("startup")
+def start_recognizer():
+    if not RECOGNITION_ENABLED:
+        recognizer.error = "Recognition is disabled on this server"
+        return
+    # Models, worker processes and the gallery load in the background; /recognize answers 503 until ready
+    def load():
+        try:
+            recognizer.start()
+            logger.info("Recognition service ready")
+        except Exception as e:
+            logger.error(f"Recognition service failed to start: {e}")
+    threading.Thread(target=load, name="recognizer-start", daemon=True).start()
+
+@app.on_event("startup")
+def start_fleet():
+    fleet.load()
+    fleet.start()
+
+@app.on_event("startup")
+async def bind_event_stream():
+    attendance_events.bind(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+def stop_recognizer():
+    recognizer.stop()
+    blocking.shutdown()
+    exports.shutdown()
+    hashing.shutdown()
+    recognizing.shutdown()
+    fleet.stop()
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # Route templates, not raw paths, so /users/{username} stays one series
+        route = request.scope.get("route")
+        HTTP_REQUEST_TIME.labels(request.method, getattr(route, "path", "unmatched"), status_code).observe(
+            time.perf_counter() - start)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health")
+async def health():
+    # Never blocks: answers even while every executor thread is busy
+    return {"status": "ok", "recognizer": "ready" if recognizer.ready else (recognizer.error or "starting")}
+
 @app.get("/")
 async def root():
     return {
         "message": "Face Recognition Attendance API",
         "endpoints": [
+            {"path": "/health", "description": "Liveness check"},
+            {"path": "/metrics", "description": "Counters, gauges and latency histograms in Prometheus text format"},
+            {"path": "/token", "description": "Exchange username and password for a bearer token (POST)"},
             {"path": "/attendance/today", "description": "Get today's attendance"},
-            {"path": "/attendance/all", "description": "Get all attendance records"},
+            {"path": "/attendance/all", "description": "Attendance records: filtered, paginated, or streamed as NDJSON/CSV"},
             {"path": "/users/", "description": "Get registered users"},
-            {"path": "/devices/", "description": "Get connected devices"}
+            {"path": "/users/me", "description": "The user behind the bearer token"},
+            {"path": "/devices/", "description": "Get connected devices"},
+            {"path": "/devices/heartbeat", "description": "Batched device heartbeats (POST)"},
+            {"path": "/events/batch", "description": "Bulk ingest of recognition events (POST)"},
+            {"path": "/events/stream", "description": "Server-Sent Events: today's attendance, then live changes"},
+            {"path": "/recognize", "description": "Identify faces in an uploaded image or raw frame (POST)"},
+            {"path": "/recognize/batch", "description": "Identify faces in many images or a zip, streamed as NDJSON (POST)"},
+            {"path": "/ws/recognize", "description": "WebSocket: push JPEG frames, receive tracked faces (WS)"}
         ]
     }
 
+@app.post("/token", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # bcrypt runs on the hashing pool, so a burst of logins can't stall other requests
+    user = await authenticate_user_async(form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
 @app.get("/attendance/today")
-async def get_today_attendance():
+async def get_today_attendance(request: Request):
     try:
-        logger.info("Fetching today's attendance")
-        data = db.get_attendance_by_date(datetime.now())
-        return {"data": data}
+        today = datetime.now()
+        return await response_cache.respond(request, f"/attendance/today?{today.date()}", db_version,
+                                            lambda: {"data": db.get_attendance_by_date(today)})
     except Exception as e:
         logger.error(f"Error getting today's attendance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/attendance/all")
-async def get_all_attendance():
+async def get_all_attendance(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    employee: Optional[str] = None,
+    shift: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = ATTENDANCE_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    format: str = "json"
+):
+    """
+    Attendance records, newest first, filtered by inclusive date range,
+    employee, shift and status. format=json returns one keyset page and the
+    `next_cursor` to pass back for the following one; format=ndjson or csv
+    streams every matching row (from `cursor` on) in constant memory.
+    """
+    filters = {"start": start, "end": end, "employee": employee, "shift": shift, "status": status}
+    if format in ("ndjson", "csv"):
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        records = (record for _, record in db.iter_attendance(after=after, **filters))
+        # Pages are read on the export pool, so exports only ever compete with each other
+        if format == "ndjson":
+            return StreamingResponse(exports.iterate(ndjson_chunks(records), chunk=1),
+                                     media_type="application/x-ndjson")
+        return StreamingResponse(exports.iterate(csv_chunks(records, ATTENDANCE_CSV_FIELDS), chunk=1),
+                                 media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="attendance.csv"'})
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json, ndjson or csv")
     try:
-        logger.info("Fetching all attendance records")
-        data = db.get_all_attendance()
-        return {"data": data}
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def page():
+        data, next_cursor = db.get_attendance_page(limit=limit, cursor=cursor, **filters)
+        return {"data": data, "next_cursor": next_cursor}
+    try:
+        return await response_cache.respond(request, f"{request.url.path}?{request.url.query}", db_version, page)
     except Exception as e:
         logger.error(f"Error getting all attendance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def ndjson_chunks(records):
+    """NDJSON text for an iterable of dicts, one chunk per ATTENDANCE_PAGE_SIZE rows"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record) + "\n")
+        if len(lines) == ATTENDANCE_PAGE_SIZE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+def csv_chunks(records, fields):
+    """CSV text for an iterable of dicts, the header and then one chunk per ATTENDANCE_PAGE_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for count, record in enumerate(records, 1):
+        writer.writerow(record)
+        if count % ATTENDANCE_PAGE_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
 @app.get("/users")
-async def get_users():
+async def get_users(request: Request):
     """Get all registered users from images directory"""
     try:
-        logger.info("Fetching registered users from images")
-        data = db.get_registered_users()
-        logger.info(f"Found {len(data)} registered users")
-        return {"data": data}
+        # The directory is only walked again after its mtime changed
+        return await response_cache.respond(request, "/users", users_version,
+                                            lambda: {"data": db.get_registered_users()})
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         import traceback
@@ -100,7 +305,7 @@ async def get_database_users():
     """Get all users from database"""
     try:
         logger.info("Fetching users from database")
-        data = db.get_users_from_database()
+        data = await blocking.run(db.get_users_from_database)
         logger.info(f"Found {len(data)} database users")
         return {"data": data}
     except Exception as e:
@@ -110,47 +315,297 @@ async def get_database_users():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/devices/")
-async def get_devices():
+async def get_devices(request: Request):
     try:
-        logger.info("Fetching devices")
-        data = db.get_all_devices()
-        return {"data": data}
+        # Served from the fleet registry: no database read, the list is rebuilt only after a change
+        return await response_cache.respond(request, "/devices/", fleet_version,
+                                            lambda: {"data": fleet.devices(), "summary": fleet.summary()})
     except Exception as e:
         logger.error(f"Error getting devices: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/attendance/today")
-async def get_today_attendance():
+@app.post("/devices/heartbeat")
+async def device_heartbeat(batch: HeartbeatBatch):
+    """
+    Heartbeats from one or many devices. They only update the in-memory
+    fleet registry; changed devices reach the database on its next flush.
+    """
+    accepted = fleet.heartbeats({"device_id": beat.device_id, "name": beat.name, "location": beat.location}
+                                for beat in batch.heartbeats)
+    return {"accepted": accepted, **fleet.summary()}
+
+@app.post("/events/batch", response_model=EventBatchResponse)
+async def ingest_events(batch: EventBatch):
+    """
+    Bulk ingest of recognition events from edge devices. Events carry an
+    idempotency key, so a device can safely re-send a batch after a timeout.
+    """
+    if len(batch.events) > MAX_EVENTS_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_EVENTS_PER_BATCH} events per batch")
+    events = []
+    for event in batch.events:
+        timestamp = event.timestamp
+        if timestamp.tzinfo is not None:
+            # Shift windows are defined in the server's local time
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        events.append({
+            "event_id": event.event_id,
+            "employee_name": event.employee,
+            "device_id": event.device_id,
+            "timestamp": timestamp,
+            "confidence": event.confidence,
+        })
     try:
-        logger.info("Fetching today's attendance")
-        today = datetime.now().strftime("%y_%m_%d")
-        df = db.get_attendance_by_date(today)
-        result = df.to_dict(orient="records")
-        logger.info(f"Found {len(result)} attendance records for today")
-        return result
+        results = await blocking.run(db.ingest_events, events)
     except Exception as e:
-        logger.error(f"Error getting today's attendance: {e}")
+        logger.error(f"Error ingesting events: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    accepted = sum(1 for r in results if r["status"] == "accepted")
+    logger.info(f"Ingested {accepted} events ({len(results) - accepted} duplicates)")
+    return {"accepted": accepted, "duplicates": len(results) - accepted, "results": results}
 
-@app.get("/attendance/all")
-async def get_all_attendance():
+@app.get("/events/stream")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events feed of attendance changes as they are ingested. A new
+    client first gets a "snapshot" event with today's records, then one
+    "attendance" event per check-in or check-out. A client reconnecting with
+    Last-Event-ID gets only what it missed, or a new snapshot if that is no
+    longer buffered (also sent to a client that fell too far behind).
+    """
+    last_event_id = request.headers.get("last-event-id")
+    subscriber, missed = attendance_events.subscribe(last_event_id)
+
+    async def snapshot():
+        # Ids up to here are covered by the snapshot; later ones arrive on the queue
+        event_id = attendance_events.last_id
+        today = date.today()
+        records = await blocking.run(lambda: [record for _, record in db.iter_attendance(start=today, end=today)])
+        message = format_event("snapshot", {"date": today.isoformat(), "records": records},
+                               attendance_events.event_id(event_id))
+        return event_id, message
+
+    async def stream():
+        try:
+            if missed is None:
+                last_sent, message = await snapshot()
+                yield message
+            else:
+                last_sent = attendance_events.parse_id(last_event_id)
+                for event_id, event, data in missed:
+                    yield format_event(event, data, attendance_events.event_id(event_id))
+                    last_sent = event_id
+            while True:
+                if subscriber.lagged:
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.lagged = False
+                    last_sent, message = await snapshot()
+                    yield message
+                try:
+                    event_id, event, data = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event_id > last_sent:
+                    yield format_event(event, data, attendance_events.event_id(event_id))
+                    last_sent = event_id
+        finally:
+            attendance_events.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/recognize")
+async def recognize(request: Request, width: Optional[int] = None, height: Optional[int] = None, top_k: int = 1):
+    """
+    Identify faces in one image, sent either as a multipart `file` upload or as
+    the raw request body (JPEG/PNG, or BGR24 frame bytes with `width` and `height`).
+    """
+    if not recognizer.ready:
+        detail = recognizer.error or "Recognition service is starting"
+        raise HTTPException(status_code=503, detail=detail)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected an image in the 'file' field")
+        data = await upload.read()
+    else:
+        data = await request.body()
     try:
-        logger.info("Fetching all attendance records")
-        df = db.get_all_attendance()
-        result = df.to_dict(orient="records")
-        logger.info(f"Found {len(result)} total attendance records")
-        return result
+        image = decode_image(data, width, height)
+        # Detection and encoding block on the worker processes; keep the event loop and the DB threads free
+        return await recognizing.run(recognizer.recognize, image, max(1, min(top_k, 5)))
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting all attendance: {e}")
+        logger.error(f"Error recognizing image: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/recognize/batch")
+async def recognize_batch(request: Request, top_k: int = 1):
+    """
+    Identify faces in many images: a multipart upload with any number of image
+    (or zip) files, or a zip archive as the raw body. One JSON line is streamed
+    back per image as soon as it is done, in completion order with its `index`.
+    """
+    if not recognizer.ready:
+        detail = recognizer.error or "Recognition service is starting"
+        raise HTTPException(status_code=503, detail=detail)
+    content_type = request.headers.get("content-type", "")
+    uploads = []
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form(max_files=MAX_BATCH_IMAGES)
+        for _, upload in form.multi_items():
+            if not isinstance(upload, str):
+                uploads.append((upload.filename or "", await upload.read()))
+    else:
+        uploads.append(("upload.zip", await request.body()))
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    # Zips are expanded lazily, so only the compressed archive is held in memory
+    images = []
+    try:
+        for filename, data in uploads:
+            if filename.lower().endswith(".zip") or data[:4] == b"PK\x03\x04":
+                images.append(iter_zip_images(data))
+            else:
+                images.append([(filename, data)])
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def all_images():
+        count = 0
+        for group in images:
+            for item in group:
+                count += 1
+                if count > MAX_BATCH_IMAGES:
+                    return
+                yield item
+
+    def lines():
+        try:
+            for result in recognizer.recognize_batch(all_images(), max(1, min(top_k, 5))):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"Error in batch recognition: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    # Driven on the recognition pool, one line per hop, so results still stream as they complete
+    return StreamingResponse(recognizing.iterate(lines(), chunk=1), media_type="application/x-ndjson")
+
+@app.websocket("/ws/recognize")
+async def recognize_stream(websocket: WebSocket, device_id: str = "stream"):
+    """
+    Frame streaming for thin camera clients. The client sends JPEG/PNG frames
+    as binary messages; each processed frame is answered with a "result"
+    message (tracked faces, names, shift status, latency). Frames that arrive
+    while one is being processed replace each other, so a slow server drops
+    stale frames instead of queueing them. A "stats" message with frame rate,
+    drops and latency percentiles follows every STREAM_STATS_INTERVAL seconds.
+    """
+    await websocket.accept()
+    if not recognizer.ready:
+        await websocket.send_json({"type": "error", "detail": recognizer.error or "Recognition service is starting"})
+        await websocket.close(code=1013)
+        return
+    session = StreamSession(recognizer, stream_status_fn(db, device_id))
+    # A streaming camera is a live device; refreshed with every stats message
+    fleet.heartbeat(device_id)
+    latest = None  # (seq, bytes, received_at) of the newest unprocessed frame
+    frame_ready = asyncio.Event()
+    received = dropped = processed = 0
+    latencies = deque(maxlen=200)
+    logger.info(f"Frame stream opened for {device_id}")
+
+    async def receive_frames():
+        nonlocal latest, received, dropped
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is None:
+                continue
+            received += 1
+            if latest is not None:
+                dropped += 1
+            latest = (received, message["bytes"], time.perf_counter())
+            frame_ready.set()
+
+    def process_frame(data):
+        return session.process(decode_image(data))
+
+    receiver = asyncio.create_task(receive_frames())
+    started = last_stats = time.monotonic()
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not waiter.done():
+                waiter.cancel()
+                break
+            frame_ready.clear()
+            seq, data, received_at = latest
+            latest = None
+            try:
+                process_start = time.perf_counter()
+                faces = await recognizing.run(process_frame, data)
+            except ImageDecodeError as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+                continue
+            now = time.perf_counter()
+            latency_ms = (now - received_at) * 1000
+            latencies.append(latency_ms)
+            processed += 1
+            await websocket.send_json({
+                "type": "result",
+                "seq": seq,
+                "faces": faces,
+                "process_ms": round((now - process_start) * 1000, 1),
+                "latency_ms": round(latency_ms, 1),
+                "dropped": dropped,
+            })
+            if time.monotonic() - last_stats >= STREAM_STATS_INTERVAL:
+                last_stats = time.monotonic()
+                fleet.heartbeat(device_id)
+                ordered = sorted(latencies)
+                await websocket.send_json({
+                    "type": "stats",
+                    "received": received,
+                    "processed": processed,
+                    "dropped": dropped,
+                    "fps": round(processed / (last_stats - started), 1),
+                    "latency_ms": {"p50": round(ordered[len(ordered) // 2], 1),
+                                   "p95": round(ordered[int(len(ordered) * 0.95)], 1)},
+                    "tracker": session.tracker.summary(),
+                })
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in frame stream for {device_id}: {e}")
+    finally:
+        receiver.cancel()
+        logger.info(f"Frame stream closed for {device_id}: {received} frames, {processed} processed, "
+                    f"{dropped} dropped")
+
+@app.get("/users/me", response_model=User)
+async def read_current_user(current_user: User = Depends(get_current_active_user)):
+    return current_user
+
 # User management endpoints (admin only)
 @app.post("/users/add", response_model=User)
-async def create_user(user: User, current_user: User = Depends(get_current_active_user)):
+async def create_user(user: UserCreate, current_user: User = Depends(get_current_active_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     try:
-        return db.create_user(user)
+        hashed_password = await get_password_hash_async(user.password)
+        result = await blocking.run(db.create_user, user, hashed_password)
+        invalidate_user(user.username)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -158,16 +613,24 @@ async def create_user(user: User, current_user: User = Depends(get_current_activ
 @app.put("/users/{username}", response_model=User)
 async def update_user(
     username: str,
-    user_update: User,
+    user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
+    changes = user_update.model_dump(exclude_none=True, exclude={"password"})
     try:
-        return db.update_user(username, user_update)
+        if user_update.password is not None:
+            changes["hashed_password"] = await get_password_hash_async(user_update.password)
+        result = await blocking.run(db.update_user, username, changes)
+        # Role, activation and password changes must apply to the next request, not after the cache TTL
+        invalidate_user(username)
     except Exception as e:
         logger.error(f"Error updating user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"User '{username}' not found")
+    return result
 
 @app.delete("/users/{username}")
 async def delete_user(
@@ -177,7 +640,11 @@ async def delete_user(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     try:
-        return db.delete_user(username)
+        result = await blocking.run(db.delete_user, username)
+        invalidate_user(username)
+        # Image folders are removed too; don't wait for the directory probe
+        users_version.invalidate()
+        return result
     except Exception as e:
         logger.error(f"Error deleting user: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -190,20 +657,11 @@ async def update_device_status(
     current_user: User = Depends(get_current_active_user)
 ):
     try:
-        return db.update_device_status(device_id, status)
+        return fleet.heartbeat(device_id, status=status)
     except Exception as e:
         logger.error(f"Error updating device status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/devices/", response_model=List[DeviceInfo])
-async def get_devices(current_user: User = Depends(get_current_active_user)):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    try:
-        return db.get_all_devices()
-    except Exception as e:
-        logger.error(f"Error getting devices: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # /events/stream connections never end on their own; don't let them hold up a restart
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_graceful_shutdown=5)
\ No newline at end of file
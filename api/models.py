@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -12,6 +12,17 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
+class UserCreate(User):
+    password: str = Field(..., min_length=1)
+
+class UserUpdate(BaseModel):
+    # Only the fields that are sent are changed
+    full_name: Optional[str] = None
+    role: Optional[str] = None
+    shift: Optional[str] = None
+    is_active: Optional[bool] = None
+    password: Optional[str] = Field(None, min_length=1)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -33,4 +44,32 @@ class DeviceInfo(BaseModel):
     name: str
     location: str
     last_active: datetime
-    status: str  # 'active' or 'inactive'
\ No newline at end of file
+    status: str  # 'active' or 'inactive'
+
+class RecognitionEvent(BaseModel):
+    event_id: str = Field(..., min_length=1, max_length=64)  # idempotency key chosen by the device
+    employee: str = Field(..., min_length=1, max_length=128)
+    timestamp: datetime
+    device_id: str = Field(..., min_length=1, max_length=64)
+    confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+class EventBatch(BaseModel):
+    events: List[RecognitionEvent]
+
+class EventResult(BaseModel):
+    event_id: str
+    status: str  # 'accepted' or 'duplicate'
+    attendance: Optional[dict] = None
+
+class EventBatchResponse(BaseModel):
+    accepted: int
+    duplicates: int
+    results: List[EventResult]
+
+class Heartbeat(BaseModel):
+    device_id: str = Field(..., min_length=1, max_length=64)
+    name: Optional[str] = Field(None, max_length=128)
+    location: Optional[str] = Field(None, max_length=128)
+
+class HeartbeatBatch(BaseModel):
+    heartbeats: List[Heartbeat]
@@ -0,0 +1,386 @@
+"""
+Warm, in-process face recognition for the API.
+
+The gallery, the dlib models and the worker processes are loaded once when the
+API starts, so a /recognize call only pays for detection, encoding and one
+matrix match instead of an interpreter start, model load and gallery encode.
+"""
+import io
+import os
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# The shared recognition package lives in the project root
+ROOT_DIR = Path(__file__).parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from recognition import workers
+from attendance_tracker import AttendanceTracker
+from recognition.chips import ChipExtractor
+from recognition.detection import DetectionScheduler, detection_scale, scale_box
+from recognition.encoding_cache import DATA_DIR, LANDMARK_MODEL, EncodingCache
+from recognition.gallery import LiveGallery
+from recognition.matcher import MATCH_THRESHOLD
+from recognition.motion_gate import MotionGate
+from recognition.pipeline import FaceEngine
+from recognition.tracker import FaceTracker
+
+# Set RECOGNITION_ENABLED=0 to run the API without loading models (e.g. a data-only replica)
+RECOGNITION_ENABLED = os.environ.get("RECOGNITION_ENABLED", "1") != "0"
+# dlib worker processes; the descriptor network holds the GIL, so threads would serialise
+RECOGNITION_PROCESSES = int(os.environ.get("RECOGNITION_PROCESSES", max(1, (os.cpu_count() or 2) // 2)))
+MAX_FACES = 8  # faces encoded per image, largest first
+MAX_IMAGE_BYTES = 16 * 1024 * 1024
+MAX_BATCH_IMAGES = 1000  # images per /recognize/batch request
+BATCH_ENCODE_CHIPS = 32  # chips from several images encoded in one descriptor call
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Frame streams (/ws/recognize), same policy as the kiosk recognizer
+STREAM_REVERIFY_FRAMES = 15
+STREAM_FORCED_DETECT_INTERVAL = 2.0
+STREAM_MAX_FACES = 10
+STREAM_MAX_ENCODES = 4
+STATUS_COOLDOWN = 30.0  # seconds an identity's shift status is reused per stream
+# Per-device attendance trackers kept for reconnecting streams. After TRACKER_IDLE
+# seconds unused (the tracker's own cooldown) a tracker holds nothing worth keeping.
+MAX_STREAM_TRACKERS = 256
+TRACKER_IDLE = 3600.0
+
+
+class ImageDecodeError(ValueError):
+    pass
+
+
+def decode_image(data: bytes, width: Optional[int] = None, height: Optional[int] = None) -> np.ndarray:
+    """
+    BGR image from an encoded JPEG/PNG, or from raw frame bytes when `width`
+    and `height` are given (BGR24, or 8-bit grayscale).
+    """
+    if not data:
+        raise ImageDecodeError("Empty image")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ImageDecodeError(f"Image larger than {MAX_IMAGE_BYTES} bytes")
+    if width and height:
+        pixels = np.frombuffer(data, dtype=np.uint8)
+        if pixels.size == width * height * 3:
+            return pixels.reshape(height, width, 3)
+        if pixels.size == width * height:
+            return cv2.cvtColor(pixels.reshape(height, width), cv2.COLOR_GRAY2BGR)
+        raise ImageDecodeError(f"Expected {width}x{height} BGR24 or gray frame, got {pixels.size} bytes")
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ImageDecodeError("Could not decode image (expected JPEG or PNG)")
+    return image
+
+
+def iter_zip_images(data: bytes) -> Iterator[Tuple[str, bytes]]:
+    """
+    (filename, bytes) for every JPEG/PNG in a zip archive, decompressed one at
+    a time. The archive is validated up front, before the first image is read.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ImageDecodeError("Not a valid zip archive")
+    names = [info.filename for info in archive.infolist()
+             if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+             and not os.path.basename(info.filename).startswith(".")]
+    if len(names) > MAX_BATCH_IMAGES:
+        archive.close()
+        raise ImageDecodeError(f"At most {MAX_BATCH_IMAGES} images per batch")
+
+    def read():
+        with archive:
+            for name in names:
+                yield name, archive.read(name)
+    return read()
+
+
+class RecognitionService:
+    """Detection and encoding on a FaceEngine process pool, matching against a live gallery"""
+
+    def __init__(self, data_dir=DATA_DIR, processes: int = RECOGNITION_PROCESSES):
+        self.data_dir = data_dir
+        self.processes = processes
+        self.engine = None
+        self.gallery = None
+        self.error: Optional[str] = None
+        self._ready = threading.Event()
+        self._local = threading.local()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """Load models and gallery; safe to run on a background thread"""
+        try:
+            self.engine = FaceEngine(processes=self.processes)
+            self.gallery = LiveGallery(self.data_dir, EncodingCache())
+            self.gallery.load()
+            self.gallery.start()
+            self._ready.set()
+        except Exception as e:
+            self.error = str(e)
+            raise
+
+    def stop(self):
+        if self.gallery is not None:
+            self.gallery.stop()
+        if self.engine is not None:
+            self.engine.shutdown()
+
+    def _extractor(self) -> ChipExtractor:
+        # Chip buffers are reused per request thread
+        extractor = getattr(self._local, "extractor", None)
+        if extractor is None:
+            extractor = self._local.extractor = ChipExtractor(capacity=MAX_FACES)
+        return extractor
+
+    def recognize(self, image: np.ndarray, top_k: int = 1, threshold: float = MATCH_THRESHOLD) -> dict:
+        """Faces in a BGR image with their best identities; blocking, call from a worker thread"""
+        start = time.perf_counter()
+        scale = detection_scale(image.shape)
+        small = cv2.resize(image, (0, 0), fx=scale, fy=scale) if scale != 1.0 else image
+        rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        boxes = [scale_box(box, scale) for box in self.engine.detect(rgb_small, "hog")]
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+        boxes = boxes[:MAX_FACES]
+
+        encodings = []
+        if boxes:
+            chips, chip_box = self._extractor().extract(image, boxes)
+            encodings = self.engine.encode_chips(chips, chip_box, LANDMARK_MODEL)
+        return {
+            "faces": self._faces(boxes, encodings, top_k, threshold),
+            "width": int(image.shape[1]),
+            "height": int(image.shape[0]),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def recognize_batch(self, images: Iterable[Tuple[str, bytes]], top_k: int = 1,
+                        threshold: float = MATCH_THRESHOLD) -> Iterator[dict]:
+        """
+        Results for many encoded images, in completion order. Decode, detection
+        and chip extraction run in parallel on the engine's processes; chips of
+        every image that finished together are encoded in one batched call.
+        Blocking generator: iterate it from a worker thread.
+        """
+        in_flight = {}
+        window = max(2, 2 * self.processes)  # bounds the undecoded images held in memory
+        images = iter(enumerate(images))
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < window:
+                try:
+                    index, (filename, data) = next(images)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if len(data) > MAX_IMAGE_BYTES:
+                    yield {"index": index, "filename": filename, "error": f"Image larger than {MAX_IMAGE_BYTES} bytes"}
+                    continue
+                future = self.engine.submit(workers.prepare_image, data, MAX_FACES)
+                in_flight[future] = (index, filename, time.perf_counter())
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            prepared = []
+            for future in done:
+                index, filename, started = in_flight.pop(future)
+                try:
+                    prepared.append((index, filename, started, future.result()))
+                except Exception as e:
+                    yield {"index": index, "filename": filename, "error": str(e)}
+            yield from self._finish_batch(prepared, top_k, threshold)
+
+    def _finish_batch(self, prepared, top_k, threshold):
+        """Encode the chips of several prepared images together, then match"""
+        chips = [item[3][2] for item in prepared if len(item[3][1])]
+        encodings = []
+        if chips:
+            stacked = np.concatenate(chips)
+            chip_box = next(item[3][3] for item in prepared if len(item[3][1]))
+            for start in range(0, len(stacked), BATCH_ENCODE_CHIPS):
+                encodings.extend(self.engine.encode_chips(stacked[start:start + BATCH_ENCODE_CHIPS],
+                                                          chip_box, LANDMARK_MODEL))
+        offset = 0
+        for index, filename, started, (shape, boxes, _, _) in prepared:
+            faces = self._faces(boxes, encodings[offset:offset + len(boxes)], top_k, threshold)
+            offset += len(boxes)
+            yield {
+                "index": index,
+                "filename": filename,
+                "faces": faces,
+                "width": int(shape[1]),
+                "height": int(shape[0]),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+    def _faces(self, boxes, encodings, top_k, threshold):
+        if not boxes:
+            return []
+        matcher = self.gallery.matcher
+        candidates = matcher.match_batch(np.asarray(encodings), k=max(1, top_k)) if len(matcher) else \
+            [[] for _ in boxes]
+        faces = []
+        for (top, right, bottom, left), matches in zip(boxes, candidates):
+            best = matches[0] if matches and matches[0].distance < threshold else None
+            faces.append({
+                "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+                "name": best.name if best else None,
+                "distance": float(best.distance) if best else None,
+                "confidence": max(0.0, 1.0 - float(best.distance)) if best else None,
+                "candidates": [{"name": m.name, "distance": float(m.distance)} for m in matches[:top_k]],
+            })
+        return faces
+
+
+class StreamSession:
+    """
+    Tracking and recognition for one frame stream (one camera connection).
+    Mirrors the kiosk's FrameRecognizer: faces are tracked across frames and
+    only new, stale or moved tracks are encoded, in one batch per frame.
+    `status_fn(name, confidence)` marks attendance and returns the status line.
+    Not thread-safe: feed frames from one thread at a time.
+    """
+
+    def __init__(self, service: RecognitionService, status_fn: Optional[Callable[[str, float], str]] = None):
+        self.service = service
+        self.status_fn = status_fn
+        self.tracker = FaceTracker(reverify_every=STREAM_REVERIFY_FRAMES)
+        self.motion_gate = MotionGate(force_every=STREAM_FORCED_DETECT_INTERVAL)
+        self.scheduler = DetectionScheduler()
+        self.chips = ChipExtractor(capacity=STREAM_MAX_ENCODES)
+        self._matcher = None
+        self._recent_status: Dict[str, Tuple[str, float]] = {}
+
+    def _status(self, name: str, confidence: float) -> Optional[str]:
+        if self.status_fn is None:
+            return None
+        now = time.monotonic()
+        cached = self._recent_status.get(name)
+        if cached is not None and now - cached[1] < STATUS_COOLDOWN:
+            return cached[0]
+        status = self.status_fn(name, confidence)
+        self._recent_status[name] = (status, now)
+        return status
+
+    def process(self, image: np.ndarray) -> list:
+        """Tracked faces in a BGR frame: [{track_id, box, name, distance, status}]"""
+        engine = self.service.engine
+        matcher = self.service.gallery.matcher
+        if matcher is not self._matcher:
+            # Gallery reloaded: re-check every track against the new matcher
+            for track in self.tracker.tracks:
+                track.verified_at = None
+            self._matcher = matcher
+
+        if not self.motion_gate.should_detect(image, self.tracker.active):
+            return []
+        boxes = self.scheduler.detect(image, [t.box for t in self.tracker.tracks],
+                                      lambda rgb: engine.detect(rgb, "hog"))
+        tracks = self.tracker.update(boxes)
+        tracks = sorted(tracks, key=lambda t: t.size, reverse=True)[:STREAM_MAX_FACES]
+        pending = [t for t in tracks if self.tracker.needs_recognition(t)]
+        pending.sort(key=lambda t: t.verified_at is not None)
+        pending = pending[:STREAM_MAX_ENCODES]
+        self.tracker.cached += len(tracks) - len(pending)
+
+        if pending:
+            self.tracker.encodes += len(pending)
+            chips, chip_box = self.chips.extract(image, [t.box for t in pending])
+            encodings = engine.encode_chips(chips, chip_box, LANDMARK_MODEL)
+            matches = matcher.identify_batch(np.asarray(encodings)) if len(matcher) else [None] * len(pending)
+            for track, match in zip(pending, matches):
+                if match is not None:
+                    confidence = max(0.0, 1.0 - float(match.distance))
+                    self.tracker.mark_verified(track, match.name, float(match.distance),
+                                               self._status(match.name, confidence))
+                else:
+                    self.tracker.mark_verified(track, None)
+
+        return [{
+            "track_id": t.id,
+            "box": {"top": t.box[0], "right": t.box[1], "bottom": t.box[2], "left": t.box[3]},
+            "name": t.name,
+            "distance": t.distance,
+            "status": t.status,
+        } for t in tracks]
+
+
+class DirectSink:
+    """AttendanceTracker sink for frames recognised by the API itself: events go straight to the database"""
+
+    def __init__(self, db, device_id: str):
+        self.db = db
+        self.device_id = device_id
+
+    def submit(self, name, time_str, date_str, confidence=None) -> bool:
+        self.db.ingest_events([{
+            "event_id": uuid.uuid4().hex,
+            "employee_name": name,
+            "device_id": self.device_id,
+            "timestamp": datetime.fromisoformat(f"{date_str}T{time_str}"),
+            "confidence": confidence,
+        }])
+        return True
+
+
+# device_id -> [tracker, lock, monotonic time of last use], least recently used first
+_trackers: "OrderedDict[str, list]" = OrderedDict()
+_trackers_lock = threading.Lock()
+
+
+def stream_status_fn(db, device_id: str) -> Callable[[str, float], str]:
+    """
+    Shift status callback for a stream from `device_id`. Cooldowns live in one
+    AttendanceTracker per device, so they survive client reconnects, exactly as
+    if the device ran its own kiosk. device_id is chosen by the client, so the
+    trackers are an LRU of at most MAX_STREAM_TRACKERS, and trackers idle for
+    TRACKER_IDLE seconds are dropped.
+    """
+    now = time.monotonic()
+    with _trackers_lock:
+        while _trackers:
+            oldest = next(iter(_trackers.values()))
+            if now - oldest[2] < TRACKER_IDLE and len(_trackers) < MAX_STREAM_TRACKERS:
+                break
+            _trackers.popitem(last=False)
+        entry = _trackers.get(device_id)
+        if entry is None:
+            entry = _trackers[device_id] = [AttendanceTracker(sink=DirectSink(db, device_id)), threading.Lock(), now]
+        entry[2] = now
+        _trackers.move_to_end(device_id)
+    tracker, lock = entry[0], entry[1]
+
+    def status(name, confidence):
+        with lock:
+            # A long-lived session keeps its tracker from expiring
+            entry[2] = time.monotonic()
+            return tracker.shift_status(name, confidence)
+    return status
+
+
+_service: Optional[RecognitionService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> RecognitionService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RecognitionService()
+        return _service
@@ -0,0 +1,12 @@
+import pytest
+
+from api.database import AttendanceDB
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """AttendanceDB on an empty database file of its own"""
+    monkeypatch.setenv("ATTENDANCE_DB", str(tmp_path / "attendance.db"))
+    database = AttendanceDB()
+    yield database
+    database.pool.close()
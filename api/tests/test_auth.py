@@ -0,0 +1,60 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.models import User
+
+EMPLOYEE = "auth_test_employee"
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """api.main on a database of its own, with one admin and one employee"""
+    # api.auth and api.main open the database at import time: import them only once it is redirected
+    patch = pytest.MonkeyPatch()
+    patch.setenv("ATTENDANCE_DB", str(tmp_path_factory.mktemp("api") / "attendance.db"))
+    patch.setenv("RECOGNITION_ENABLED", "0")
+    # RECOGNITION_ENABLED is read at import time too
+    importlib.reload(importlib.import_module("api.recognition_service"))
+    auth = importlib.reload(importlib.import_module("api.auth"))
+    main = importlib.reload(importlib.import_module("api.main"))
+    for username, role in (("auth_test_admin", "admin"), (EMPLOYEE, "user")):
+        # Never logged in with a password here; the hash only has to be present
+        main.db.create_user(User(username=username, full_name=username, role=role, shift="morning"), "!")
+    with TestClient(main.app) as client:
+        yield client, auth
+    patch.undo()
+
+
+def bearer(username):
+    from api.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def test_updated_user_is_not_served_from_cache(api):
+    client, auth = api
+    me = client.get("/users/me", headers=bearer(EMPLOYEE))
+    assert me.json()["role"] == "user"
+    assert EMPLOYEE in auth._user_cache
+
+    updated = client.put(f"/users/{EMPLOYEE}", json={"role": "admin"}, headers=bearer("auth_test_admin"))
+    assert updated.status_code == 200
+    assert updated.json()["role"] == "admin"
+    assert client.get("/users/me", headers=bearer(EMPLOYEE)).json()["role"] == "admin"
+
+    client.put(f"/users/{EMPLOYEE}", json={"is_active": False}, headers=bearer("auth_test_admin"))
+    assert client.get("/users/me", headers=bearer(EMPLOYEE)).status_code == 400
+
+
+def test_update_unknown_user(api):
+    client, _ = api
+    response = client.put("/users/nobody", json={"role": "admin"}, headers=bearer("auth_test_admin"))
+    assert response.status_code == 404
+
+
+def test_update_requires_admin(api):
+    client, _ = api
+    client.put(f"/users/{EMPLOYEE}", json={"role": "user", "is_active": True}, headers=bearer("auth_test_admin"))
+    response = client.put("/users/auth_test_admin", json={"is_active": False}, headers=bearer(EMPLOYEE))
+    assert response.status_code == 403
@@ -0,0 +1,135 @@
+from datetime import date, datetime
+
+import pytest
+
+
+def at(hour, minute=0, day=6):
+    return datetime(2024, 5, day, hour, minute)
+
+
+def test_mark_attendance_checks_in_then_out(db):
+    check_in = db.mark_attendance("alice", "kiosk_1", at(8, 5))
+    assert (check_in["check_in"], check_in["check_out"], check_in["status"]) == ("08:05:00", None, "on_time")
+
+    check_out = db.mark_attendance("alice", "kiosk_1", at(15, 30))
+    assert (check_out["check_in"], check_out["check_out"]) == (None, "15:30:00")
+
+    # The session is closed; a third event writes nothing
+    assert db.mark_attendance("alice", "kiosk_1", at(15, 45))["status"] == "invalid"
+
+    with db.pool.read() as conn:
+        rows = conn.execute("SELECT check_in, check_out, status FROM attendance").fetchall()
+    assert rows == [("08:05:00", "15:30:00", "on_time")]
+
+
+def test_sessions_are_per_shift_and_day(db):
+    db.mark_attendance("alice", "kiosk_1", at(8, 0))
+    db.mark_attendance("alice", "kiosk_1", at(16, 5))
+    db.mark_attendance("alice", "kiosk_1", at(8, 0, day=7))
+    with db.pool.read() as conn:
+        rows = conn.execute("SELECT date, shift FROM attendance ORDER BY id").fetchall()
+    assert rows == [("2024-05-06", "morning"), ("2024-05-06", "night"), ("2024-05-07", "morning")]
+
+
+def test_bulk_marks_line_up_with_events(db):
+    results = db.mark_attendance_bulk([
+        {"employee_name": "alice", "device_id": "kiosk_1", "timestamp": at(8, 0)},
+        {"employee_name": "bob", "device_id": "kiosk_2", "timestamp": at(8, 30)},
+        {"employee_name": "alice", "device_id": "kiosk_1", "timestamp": at(12, 0)},
+    ])
+    assert [(r["employee_name"], r["check_in"], r["check_out"]) for r in results] == [
+        ("alice", "08:00:00", None), ("bob", "08:30:00", None), ("alice", None, "12:00:00"),
+    ]
+    assert results[1]["status"] == "late"
+
+
+def event(event_id, name="alice", hour=8, device="kiosk_1"):
+    return {"event_id": event_id, "employee_name": name, "device_id": device, "timestamp": at(hour)}
+
+
+def test_ingest_is_idempotent_across_requests(db):
+    first = db.ingest_events([event("e1"), event("e2", "bob")])
+    assert [r["status"] for r in first] == ["accepted", "accepted"]
+
+    # The device retries the whole batch after a lost response, plus one new event
+    retry = db.ingest_events([event("e1"), event("e2", "bob"), event("e3", hour=12)])
+    assert [r["status"] for r in retry] == ["duplicate", "duplicate", "accepted"]
+    assert retry[0]["attendance"] == first[0]["attendance"]
+    assert retry[2]["attendance"]["check_out"] == "12:00:00"
+
+    with db.pool.read() as conn:
+        rows = conn.execute("SELECT employee_name, check_in, check_out FROM attendance ORDER BY id").fetchall()
+    assert rows == [("alice", "08:00:00", "12:00:00"), ("bob", "08:00:00", None)]
+
+
+def test_ingest_applies_repeated_id_in_one_batch_once(db):
+    results = db.ingest_events([event("e1"), event("e1", hour=12)])
+    assert [r["status"] for r in results] == ["accepted", "duplicate"]
+    assert results[1]["attendance"] == results[0]["attendance"]
+    with db.pool.read() as conn:
+        assert conn.execute("SELECT check_out FROM attendance").fetchall() == [(None,)]
+
+
+def test_ingest_notifies_listeners_of_fresh_events_only(db):
+    written = []
+    db.on_ingest(written.append)
+    db.ingest_events([event("e1")])
+    db.ingest_events([event("e1")])
+    assert [[r["employee_name"] for r in batch] for batch in written] == [["alice"]]
+
+
+def seed_days(db, people=5, days=5):
+    db.mark_attendance_bulk([
+        {"employee_name": f"p{person}", "device_id": "kiosk_1", "timestamp": at(8, person, day=1 + day)}
+        for day in range(days) for person in range(people)
+    ])
+
+
+def all_pages(db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        records, cursor = db.get_attendance_page(limit=limit, cursor=cursor, **filters)
+        pages.append(records)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_row_once_newest_first(db):
+    seed_days(db)
+    pages = all_pages(db, limit=7)
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    records = [record for page in pages for record in page]
+    assert records == [record for _, record in db.iter_attendance()]
+    assert [r["date"] for r in records] == sorted((r["date"] for r in records), reverse=True)
+    assert len({(r["name"], r["date"]) for r in records}) == 25
+
+
+def test_exact_multiple_has_no_empty_last_page(db):
+    seed_days(db)
+    assert [len(page) for page in all_pages(db, limit=5)] == [5, 5, 5, 5, 5]
+
+
+def test_cursor_is_stable_when_rows_are_added(db):
+    seed_days(db)
+    first, cursor = db.get_attendance_page(limit=10)
+    # New check-ins sort before the cursor and must not shift the next page
+    db.mark_attendance("late_arrival", "kiosk_1", at(9, day=5))
+    second, _ = db.get_attendance_page(limit=10, cursor=cursor)
+    expected = [record for _, record in db.iter_attendance()]
+    expected.remove(next(r for r in expected if r["name"] == "late_arrival"))
+    assert first + second == expected[:20]
+
+
+def test_filters_apply_across_pages(db):
+    seed_days(db)
+    pages = all_pages(db, limit=2, employee="p3", start=date(2024, 5, 2), end=date(2024, 5, 4))
+    records = [record for page in pages for record in page]
+    assert [(r["name"], r["date"]) for r in records] == [
+        ("p3", "2024-05-04"), ("p3", "2024-05-03"), ("p3", "2024-05-02"),
+    ]
+
+
+def test_invalid_cursor(db):
+    seed_days(db)
+    with pytest.raises(ValueError):
+        db.get_attendance_page(cursor="not-a-cursor")
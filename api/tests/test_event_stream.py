@@ -0,0 +1,53 @@
+from api.event_stream import EventBroadcaster
+
+
+def publish(broadcaster, count):
+    for n in range(count):
+        broadcaster.publish("attendance", {"n": n})
+
+
+def test_resume_returns_only_missed_events():
+    broadcaster = EventBroadcaster()
+    publish(broadcaster, 5)
+    _, missed = broadcaster.subscribe(broadcaster.event_id(3))
+    assert [event_id for event_id, _, _ in missed] == [4, 5]
+
+
+def test_resume_at_newest_event_misses_nothing():
+    broadcaster = EventBroadcaster()
+    publish(broadcaster, 5)
+    assert broadcaster.subscribe(broadcaster.event_id(5))[1] == []
+
+
+def test_new_client_gets_snapshot():
+    broadcaster = EventBroadcaster()
+    publish(broadcaster, 5)
+    assert broadcaster.subscribe(None)[1] is None
+    assert broadcaster.subscribe("not-an-id")[1] is None
+
+
+def test_id_from_previous_process_gets_snapshot():
+    before = EventBroadcaster()
+    publish(before, 500)
+    last_seen = before.event_id(500)
+
+    # Restarted API: numbering starts again at 1
+    after = EventBroadcaster()
+    publish(after, 3)
+    assert after.subscribe(last_seen)[1] is None
+    # Even once the new numbering passes the old one
+    publish(after, 600)
+    assert after.subscribe(last_seen)[1] is None
+
+
+def test_id_newer_than_anything_published_gets_snapshot():
+    broadcaster = EventBroadcaster()
+    publish(broadcaster, 3)
+    assert broadcaster.subscribe(broadcaster.event_id(500))[1] is None
+
+
+def test_resume_past_history_gets_snapshot():
+    broadcaster = EventBroadcaster(history=10)
+    publish(broadcaster, 50)
+    assert broadcaster.subscribe(broadcaster.event_id(20))[1] is None
+    assert len(broadcaster.subscribe(broadcaster.event_id(40))[1]) == 10
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from api.fleet import FleetRegistry
+
+
+def test_heartbeats_are_counted_and_flushed_in_one_write(db):
+    fleet = FleetRegistry(db)
+    fleet.heartbeats([{"device_id": "kiosk_1", "name": "Lobby", "location": "Ground floor"},
+                      {"device_id": "kiosk_2"}])
+    assert fleet.summary() == {"total": 2, "active": 2, "inactive": 0}
+    assert fleet.flush() == 2
+    assert fleet.flush() == 0  # nothing changed since
+    assert [(d["device_id"], d["name"], d["status"]) for d in db.get_all_devices()] == [
+        ("kiosk_1", "Lobby", "active"), ("kiosk_2", "", "active"),
+    ]
+
+
+def test_silent_devices_expire(db):
+    fleet = FleetRegistry(db, offline_after=30)
+    fleet.heartbeat("kiosk_1")
+    assert fleet.expire(datetime.now() + timedelta(seconds=10)) == 0
+    assert fleet.expire(datetime.now() + timedelta(seconds=60)) == 1
+    assert fleet.summary() == {"total": 1, "active": 0, "inactive": 1}
+    fleet.heartbeat("kiosk_1")
+    assert fleet.get("kiosk_1")["status"] == "active"
+
+
+def test_ingested_events_mark_devices_alive_and_reload(db):
+    fleet = FleetRegistry(db)
+    db.on_ingest(fleet.record_ingested)
+    db.ingest_events([{"event_id": "e1", "employee_name": "alice", "device_id": "gate",
+                       "timestamp": datetime.now()}])
+    assert fleet.get("gate")["status"] == "active"
+
+    # A restarted API seeds from the table and recomputes status from last_active
+    restarted = FleetRegistry(db)
+    restarted.load()
+    assert restarted.get("gate")["status"] == "active"
+
+
+def test_device_listing_is_rebuilt_only_after_a_change(db):
+    fleet = FleetRegistry(db)
+    fleet.heartbeat("kiosk_1")
+    listing = fleet.devices()
+    assert fleet.devices() is listing
+    fleet.heartbeat("kiosk_2")
+    assert [d["device_id"] for d in fleet.devices()] == ["kiosk_1", "kiosk_2"]
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from starlette.requests import Request
+
+from api.executor import BlockingExecutor
+from api.fleet import FleetRegistry
+from api.http_cache import ResponseCache, VersionToken
+
+
+def attendance_version(db):
+    return VersionToken(counter=lambda: db.attendance_version, probe=db.latest_attendance_id, ttl=0)
+
+
+def test_version_is_stable_across_device_writes(db):
+    version = attendance_version(db)
+    db.mark_attendance("alice", "kiosk_1", datetime(2024, 5, 6, 8, 0))
+    tag = version.current()[0]
+
+    fleet = FleetRegistry(db)
+    fleet.heartbeat("kiosk_1", "Lobby kiosk")
+    fleet.heartbeat("kiosk_2")
+    assert fleet.flush() == 2
+    db.update_device_status("kiosk_3", "active")
+
+    assert version.current()[0] == tag
+
+
+def test_version_changes_with_attendance(db):
+    version = attendance_version(db)
+    tag = version.current()[0]
+    db.mark_attendance("alice", "kiosk_1", datetime(2024, 5, 6, 8, 0))
+    checked_in = version.current()[0]
+    assert checked_in != tag
+    # A check-out updates the row in place; the rowid probe alone would miss it
+    db.mark_attendance("alice", "kiosk_1", datetime(2024, 5, 6, 12, 0))
+    assert version.current()[0] != checked_in
+
+
+def test_duplicate_ingest_keeps_version(db):
+    version = attendance_version(db)
+    event = {"event_id": "e1", "employee_name": "alice", "device_id": "kiosk_1",
+             "timestamp": datetime(2024, 5, 6, 8, 0)}
+    db.ingest_events([event])
+    tag = version.current()[0]
+    db.ingest_events([event])
+    assert version.current()[0] == tag
+
+
+def test_probe_runs_off_the_event_loop():
+    probe_threads = []
+
+    def probe():
+        probe_threads.append(threading.current_thread())
+        return 1
+
+    pool = BlockingExecutor(1, "test-probe")
+    cache = ResponseCache(run=pool.run)
+    version = VersionToken(probe=probe, ttl=0)
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+    async def respond():
+        response = await cache.respond(request, "/", version, lambda: {"ok": True})
+        return response, threading.current_thread()
+
+    try:
+        response, loop_thread = asyncio.run(respond())
+    finally:
+        pool.shutdown()
+    assert response.status_code == 200
+    assert probe_threads and loop_thread not in probe_threads
@@ -0,0 +1,24 @@
+import time
+
+from api import recognition_service
+
+
+def test_stream_trackers_are_bounded(monkeypatch):
+    monkeypatch.setattr(recognition_service, "_trackers", type(recognition_service._trackers)())
+    monkeypatch.setattr(recognition_service, "MAX_STREAM_TRACKERS", 3)
+    for i in range(10):
+        recognition_service.stream_status_fn(None, f"camera_{i}")
+    assert list(recognition_service._trackers) == ["camera_7", "camera_8", "camera_9"]
+
+
+def test_reconnect_keeps_tracker_and_idle_trackers_expire(monkeypatch):
+    trackers = type(recognition_service._trackers)()
+    monkeypatch.setattr(recognition_service, "_trackers", trackers)
+    recognition_service.stream_status_fn(None, "lobby")
+    tracker = trackers["lobby"][0]
+    recognition_service.stream_status_fn(None, "lobby")
+    assert trackers["lobby"][0] is tracker
+
+    trackers["lobby"][2] = time.monotonic() - recognition_service.TRACKER_IDLE - 1
+    recognition_service.stream_status_fn(None, "gate")
+    assert list(trackers) == ["gate"]
@@ -0,0 +1,306 @@
+import atexit
+import csv
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from recognition import metrics
+
+API_URL = os.environ.get("ATTENDANCE_API_URL", "http://localhost:8000")
+DEVICE_ID = os.environ.get("ATTENDANCE_DEVICE_ID", socket.gethostname())
+ENTRY_DIR = Path("Attendance_Entry")
+OUTBOX_NAME = ".outbox.jsonl"
+
+QUEUE_SIZE = 1000  # events buffered in memory before spilling straight to the outbox
+BATCH_SIZE = 50  # events written/posted per writer pass
+FLUSH_INTERVAL = 0.5  # seconds the writer waits to fill a batch
+REQUEST_TIMEOUT = (2.0, 5.0)  # (connect, read) seconds
+API_BACKOFF = 30.0  # seconds to stop posting after the API was unreachable
+HEARTBEAT_INTERVAL = 10.0  # seconds between /devices/heartbeat posts (the API marks a device inactive after 30 s)
+
+CSV_APPEND_TIME = metrics.histogram("attendance_csv_append_seconds", "Appending one batch to the daily CSV files")
+API_POST_TIME = metrics.histogram("attendance_api_post_seconds", "One /events/batch POST, retries included")
+SINK_EVENTS = metrics.counter("attendance_sink_events", "Attendance events by where they ended up", ["outcome"])
+SINK_QUEUE = metrics.gauge("attendance_sink_queue_depth", "Events waiting for the sink's writer thread")
+
+
+class AttendanceSink:
+    """
+    Asynchronous sink for attendance events.
+
+    submit() only enqueues, so the recognition loop never waits on disk or
+    network. A background writer drains the bounded queue in batches, appends
+    them to the daily CSV in one open/write, and posts them to the API over a
+    pooled session with retries, backoff and timeouts, as one /events/batch
+    request per batch. Every event carries an idempotency key, so re-sending a
+    batch after a timeout never double-counts. Events the API could not
+    take are spilled to an outbox file in the entry directory and replayed when
+    the API is back (and on the next start).
+
+    The same thread posts a heartbeat to /devices/heartbeat every
+    HEARTBEAT_INTERVAL seconds, so the API knows the kiosk is online.
+
+    The writer thread is only started by start() or the first submit(), so
+    importing this module (e.g. in spawned worker processes) starts nothing.
+    """
+
+    def __init__(self, api_url=API_URL, entry_dir=ENTRY_DIR, queue_size=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, device_id=DEVICE_ID):
+        self.api_url = api_url.rstrip("/")
+        self.device_id = device_id
+        self.entry_dir = Path(entry_dir)
+        self.outbox_path = self.entry_dir / OUTBOX_NAME
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._outbox_lock = threading.Lock()
+        self._csv_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._session = None
+        self._api_down_until = 0.0
+        self._next_heartbeat = 0.0
+        self.written = 0
+        self.posted = 0
+        self.spilled = 0
+        self._written_events = SINK_EVENTS.labels("written")
+        self._posted_events = SINK_EVENTS.labels("posted")
+        self._spilled_events = SINK_EVENTS.labels("spilled")
+        SINK_QUEUE.set_function(self._queue.qsize)
+
+    # ----- producer side -----
+
+    def submit(self, name, time_str, date_str, confidence=None) -> bool:
+        """Queue one attendance event; never blocks. Returns False if it had to go to the outbox directly"""
+        self._ensure_started()
+        event = {
+            "event_id": uuid.uuid4().hex,
+            "employee": name,
+            "timestamp": f"{date_str}T{time_str}",
+            "device_id": self.device_id,
+            "confidence": confidence,
+        }
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            # Writer is far behind: keep the event, but skip the CSV/API fast path
+            print(f"Attendance queue full, spilling {name} to outbox")
+            self._write_csv([event])
+            self._spill([event])
+            return False
+
+    def start(self):
+        """Start the writer (and its heartbeats) before the first event"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="attendance-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self, timeout=5.0):
+        """Flush queued events and stop the writer"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join(timeout=timeout)
+
+    # ----- writer side -----
+
+    def _run(self):
+        self._replay_outbox()
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write_csv(batch)
+                self._deliver(batch)
+            elif self._stopped.is_set():
+                break
+            elif self.outbox_path.exists() and time.monotonic() >= self._api_down_until:
+                self._replay_outbox()
+            if time.monotonic() >= self._next_heartbeat and not self._stopped.is_set():
+                self._heartbeat()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_csv(self, events):
+        """Append events to their daily CSV files, one open per file"""
+        by_file = {}
+        for event in events:
+            when = datetime.fromisoformat(event["timestamp"])
+            row = [event["employee"], when.strftime("%H:%M:%S"), when.strftime("%Y-%m-%d")]
+            by_file.setdefault(self.entry_dir / f"Attendance_{when:%y_%m_%d}.csv", []).append(row)
+        with self._csv_lock, CSV_APPEND_TIME.time():
+            os.makedirs(self.entry_dir, exist_ok=True)
+            for path, rows in by_file.items():
+                try:
+                    new_file = not path.exists()
+                    with open(path, "a", newline="") as f:
+                        writer = csv.writer(f)
+                        if new_file:
+                            writer.writerow(["Name", "Time", "Date"])
+                        writer.writerows(rows)
+                    self.written += len(rows)
+                    self._written_events.inc(len(rows))
+                except OSError as e:
+                    print(f"Error writing attendance CSV {path}: {e}")
+
+    def _get_session(self):
+        if self._session is None:
+            retry = Retry(total=3, connect=3, read=2, backoff_factor=0.5,
+                          status_forcelist=(502, 503, 504), allowed_methods=frozenset({"POST"}))
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2))
+            session.mount("https://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2))
+            self._session = session
+        return self._session
+
+    def _post(self, events):
+        """
+        Send a batch to /events/batch. Returns True when the API accepted or
+        definitively rejected it (4xx), False when it should be retried later.
+        """
+        try:
+            with API_POST_TIME.time():
+                response = self._get_session().post(f"{self.api_url}/events/batch", json={"events": events},
+                                                    timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            return False
+        if response.status_code >= 500:
+            return False
+        if response.status_code >= 400:
+            print(f"API rejected {len(events)} attendance events: HTTP {response.status_code}")
+            return True
+        try:
+            body = response.json()
+            accepted = body.get("accepted", len(events))
+        except ValueError:
+            accepted = len(events)
+        for event in events:
+            print(f"Attendance marked for {event['employee']} at {event['timestamp']}")
+        self.posted += accepted
+        self._posted_events.inc(accepted)
+        return True
+
+    def _heartbeat(self):
+        """Tell the API this device is alive; a missed heartbeat is simply not retried"""
+        self._next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        if time.monotonic() < self._api_down_until:
+            return
+        try:
+            self._get_session().post(f"{self.api_url}/devices/heartbeat",
+                                     json={"heartbeats": [{"device_id": self.device_id}]}, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            self._api_down_until = time.monotonic() + API_BACKOFF
+
+    def _deliver(self, events):
+        """Post events in batches, in order; everything from the first failed batch on goes to the outbox"""
+        if time.monotonic() < self._api_down_until:
+            self._spill(events)
+            return
+        for start in range(0, len(events), self.batch_size):
+            if not self._post(events[start:start + self.batch_size]):
+                self._api_down_until = time.monotonic() + API_BACKOFF
+                self._spill(events[start:])
+                return
+
+    # ----- outbox -----
+
+    def _spill(self, events):
+        with self._outbox_lock:
+            try:
+                os.makedirs(self.entry_dir, exist_ok=True)
+                with open(self.outbox_path, "a", encoding="utf-8") as f:
+                    for event in events:
+                        f.write(json.dumps(event) + "\n")
+                self.spilled += len(events)
+                self._spilled_events.inc(len(events))
+            except OSError as e:
+                print(f"Error writing attendance outbox: {e}")
+
+    def _replay_outbox(self):
+        """Re-post spilled events; whatever still fails is written back"""
+        replaying = self.outbox_path.with_suffix(".replaying")
+        with self._outbox_lock:
+            if self.outbox_path.exists():
+                if replaying.exists():
+                    # Left over from an interrupted replay: merge before taking the outbox
+                    with open(replaying, "a", encoding="utf-8") as dst, \
+                            open(self.outbox_path, encoding="utf-8") as src:
+                        dst.write(src.read())
+                    os.remove(self.outbox_path)
+                else:
+                    os.replace(self.outbox_path, replaying)
+        if not replaying.exists():
+            return
+
+        events = []
+        with open(replaying, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        events.append(_upgrade_event(json.loads(line), self.device_id))
+                    except (json.JSONDecodeError, KeyError):
+                        print(f"Skipping corrupt outbox line: {line[:80]}")
+        if events:
+            print(f"Replaying {len(events)} attendance events from outbox")
+        self._deliver(events)
+        os.remove(replaying)
+
+
+def _upgrade_event(event, device_id):
+    """Outbox lines written before events had ids used {name, time, date}"""
+    if "event_id" in event:
+        return event
+    return {
+        "event_id": uuid.uuid4().hex,
+        "employee": event["name"],
+        "timestamp": f"{event['date']}T{event['time']}",
+        "device_id": device_id,
+        "confidence": None,
+    }
+
+
+_default_sink = None
+_default_lock = threading.Lock()
+
+
+def get_default_sink() -> AttendanceSink:
+    """Process-wide sink, created on first use"""
+    global _default_sink
+    if _default_sink is None:
+        with _default_lock:
+            if _default_sink is None:
+                _default_sink = AttendanceSink()
+    return _default_sink
@@ -1,12 +1,17 @@
 import time
 from datetime import datetime
-import requests
-import csv
-import os
 from pathlib import Path
 
+from attendance_sink import get_default_sink
+from recognition import metrics
+
+MARKS = metrics.counter("attendance_marks", "Attendance mark attempts by outcome", ["result"])
+_marked = MARKS.labels("marked")
+_rejected = MARKS.labels("rejected")
+
 class AttendanceTracker:
-    def __init__(self):
+    def __init__(self, sink=None):
+        self._sink = sink  # AttendanceSink; the shared one is created on first mark
         self.last_attendance = {}  # Store last attendance time for each person
         self.marked_shifts = {}  # Track which shifts have been marked for each person today
         self.cooldown = 3600  # 1 hour in seconds
@@ -23,6 +28,12 @@ class AttendanceTracker:
             'end': '22:00'
         }
     
+    @property
+    def sink(self):
+        if self._sink is None:
+            self._sink = get_default_sink()
+        return self._sink
+
     def _get_current_shift(self):
         """Determine which shift the current time falls into"""
         current_time = datetime.now().strftime('%H:%M')
@@ -135,9 +146,10 @@ class AttendanceTracker:
         
         return True
         
-    def mark_attendance(self, name):
+    def mark_attendance(self, name, confidence=None):
         """Mark attendance and notify API if within shift hours and not already marked"""
         if not self.can_mark_attendance(name):
+            _rejected.inc()
             return False
             
         current_time = time.time()
@@ -152,44 +164,21 @@ class AttendanceTracker:
         now = datetime.now()
         time_str = now.strftime('%H:%M:%S')
         date_str = now.strftime('%Y-%m-%d')
-        
-        # Ensure the directory exists
-        os.makedirs("Attendance_Entry", exist_ok=True)
-        
-        # Create the CSV file for today
-        current_date = now.strftime("%y_%m_%d")
-        attendance_file = f'Attendance_Entry/Attendance_{current_date}.csv'
-        
-        try:
-            # Create file with headers if it doesn't exist
-            if not os.path.exists(attendance_file):
-                with open(attendance_file, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Name", "Time", "Date"])
-            
-            # Record the attendance
-            with open(attendance_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([name, time_str, date_str])
-            
-            # Notify the API
-            try:
-                response = requests.post(
-                    "http://localhost:8000/attendance",
-                    json={
-                        "name": name,
-                        "time": time_str,
-                        "date": date_str
-                    }
-                )
-                if response.status_code == 200:
-                    print(f"Attendance marked for {name} at {time_str}")
-            except requests.RequestException:
-                # Silently continue if API is not available
-                pass
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error marking attendance: {e}")
-            return False
\ No newline at end of file
+
+        # CSV append and API notification happen on the sink's writer thread
+        self.sink.submit(name, time_str, date_str, confidence)
+        _marked.inc()
+        return True
+
+    def shift_status(self, name, confidence=None):
+        """Mark attendance if allowed and return the shift status line shown next to the face"""
+        current_shift = self._get_current_shift()
+        if not current_shift:
+            return "Outside shift hours"
+        if self.can_mark_attendance(name):
+            if self.mark_attendance(name, confidence):
+                return f"✓ {current_shift.upper()} Shift"
+            return f"{current_shift.upper()} Shift - Already Marked"
+        if name in self.marked_shifts and current_shift in self.marked_shifts[name]:
+            return f"{current_shift.upper()} Shift - Already Marked"
+        return f"{current_shift.upper()} Shift"
@@ -0,0 +1,75 @@
+"""
+Recall vs. latency of the IVF index against exact GalleryMatcher search.
+
+Uses a synthetic gallery shaped like ours (several pose encodings per person,
+128-d, typical dlib distances) so it runs without any real images:
+
+    python benchmarks/ann_benchmark.py --people 50000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from recognition.ann_index import build_index
+from recognition.matcher import GalleryMatcher
+
+
+def synthetic_gallery(people, poses, seed=0):
+    """Identity centres ~0.8 apart, poses and probes ~0.3 from their centre"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=0.8 / np.sqrt(2 * 128), size=(people, 128)).astype(np.float32)
+    pose_noise = rng.normal(scale=0.3 / np.sqrt(128), size=(people * poses, 128)).astype(np.float32)
+    encodings = np.repeat(centres, poses, axis=0) + pose_noise
+    names = [f"person_{i}" for i in range(people) for _ in range(poses)]
+    return centres, encodings, names
+
+
+def time_batch(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=50000)
+    parser.add_argument("--poses", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"Gallery: {args.people} people x {args.poses} poses")
+    centres, encodings, names = synthetic_gallery(args.people, args.poses)
+
+    rng = np.random.default_rng(1)
+    probe_ids = rng.choice(args.people, size=args.queries, replace=False)
+    queries = centres[probe_ids] + rng.normal(scale=0.3 / np.sqrt(128),
+                                              size=(args.queries, 128)).astype(np.float32)
+
+    exact = GalleryMatcher(encodings, names)
+    exact_results, exact_ms = time_batch(lambda q: exact.match(q)[0].name, queries)
+
+    start = time.perf_counter()
+    index = build_index(encodings, names)
+    build_s = time.perf_counter() - start
+    print(f"IVF build: {build_s:.1f}s, {index.nlist} lists")
+    print()
+    print(f"{'method':<16}{'recall@1':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<16}{1.0:>10.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+
+    for nprobe in args.nprobe:
+        approx, ms = time_batch(lambda q: index.search_batch(q, k=1, nprobe=nprobe)[0], queries)
+        recall = np.mean([bool(a) and a[0].name == e for a, e in zip(approx, exact_results)])
+        print(f"{'ivf nprobe=' + str(nprobe):<16}{recall:>10.3f}{ms:>12.3f}{exact_ms / ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
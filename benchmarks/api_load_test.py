@@ -0,0 +1,168 @@
+"""
+Latency of cheap API endpoints while heavy attendance exports stream in parallel.
+
+Measures /health and /attendance/today p50/p95/p99 first on an idle server and
+then with --exporters clients looping over /attendance/all?format=ndjson. With
+blocking work on the bounded executors the percentiles should barely move.
+Either point it at a running server or let it spawn one on a seeded temporary
+database (recognition disabled):
+
+    python benchmarks/api_load_test.py --spawn --rows 200000 --exporters 4
+    python benchmarks/api_load_test.py --url http://localhost:8000
+"""
+import argparse
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+CHEAP_ENDPOINTS = ("/health", "/attendance/today")
+
+
+def seed_database(path, rows, employees, seed=0):
+    """`rows` attendance rows ending today, one per (day, employee, shift)"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_name TEXT, date DATE, check_in TIME, check_out TIME,
+            shift TEXT, status TEXT, device_id TEXT
+        )
+    ''')
+    rng = random.Random(seed)
+    per_day = employees * 2
+    start = date.today() - timedelta(days=(rows - 1) // per_day)
+
+    def generate():
+        for i in range(rows):
+            day = start + timedelta(days=i // per_day)
+            shift = "morning" if i % 2 == 0 else "night"
+            hour = 8 if shift == "morning" else 16
+            yield (f"employee_{(i % per_day) // 2}", day.isoformat(), f"{hour:02d}:{rng.randrange(60):02d}:00",
+                   None, shift, rng.choice(("on_time", "late")), "kiosk-1")
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO attendance (employee_name, date, check_in, check_out, shift, status, device_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', generate())
+    conn.close()
+
+
+def spawn_server(db_path, port, **env):
+    env = dict(os.environ, ATTENDANCE_DB=db_path, RECOGNITION_ENABLED="0", **env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=project_root, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(url + "/health", timeout=1).ok:
+                return server, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def export_loop(url, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        with session.get(url + "/attendance/all", params={"format": "ndjson"}, stream=True, timeout=300) as response:
+            for line in response.iter_lines():
+                counts[0] += 1
+                if stop.is_set():
+                    break
+
+
+def sample_latencies(url, duration):
+    """Sequential requests for `duration` seconds; milliseconds per endpoint"""
+    session = requests.Session()
+    latencies = {endpoint: [] for endpoint in CHEAP_ENDPOINTS}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for endpoint in CHEAP_ENDPOINTS:
+            start = time.perf_counter()
+            session.get(url + endpoint, timeout=30).raise_for_status()
+            latencies[endpoint].append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def report(label, latencies):
+    for endpoint, values in latencies.items():
+        print(f"{label:>10} {endpoint:<20} n={len(values):<6} p50={percentile(values, 50):7.2f} ms  "
+              f"p95={percentile(values, 95):7.2f} ms  p99={percentile(values, 99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running API server")
+    parser.add_argument("--spawn", action="store_true", help="start a server on a seeded temporary database")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--exporters", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    if not args.url and not args.spawn:
+        parser.error("pass --url or --spawn")
+
+    server = None
+    tmpdir = tempfile.TemporaryDirectory()
+    try:
+        url = args.url
+        if args.spawn:
+            db_path = os.path.join(tmpdir.name, "attendance.db")
+            seed_database(db_path, args.rows, args.employees)
+            server, url = spawn_server(db_path, free_port())
+        url = url.rstrip("/")
+
+        report("idle", sample_latencies(url, args.duration))
+
+        stop = threading.Event()
+        counts = [0]
+        exporters = [threading.Thread(target=export_loop, args=(url, stop, counts), daemon=True)
+                     for _ in range(args.exporters)]
+        for thread in exporters:
+            thread.start()
+        time.sleep(1.0)
+        exported = counts[0]
+        report("exporting", sample_latencies(url, args.duration))
+        rate = (counts[0] - exported) / args.duration
+        stop.set()
+        for thread in exporters:
+            thread.join(timeout=30)
+        print(f"{args.exporters} concurrent exports streamed {rate:,.0f} rows/s")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Query plans and latencies of the attendance queries before and after the schema migration.
+
+Builds a synthetic attendance table in a temporary database (old schema, no
+indexes), times the original predicates, runs migrate_schema() and times the
+range-predicate versions the API uses now:
+
+    python benchmarks/attendance_db_benchmark.py --rows 5000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.database import day_range, migrate_schema, month_range
+
+OLD_QUERIES = {
+    "attendance by date": (
+        "SELECT employee_name, check_in, shift, status FROM attendance WHERE date(date) = date(?)",
+        lambda day, name: (day.isoformat(),),
+    ),
+    "monthly report": (
+        "SELECT employee_name, shift, COUNT(*) FROM attendance "
+        "WHERE strftime('%Y', date) = ? AND strftime('%m', date) = ? GROUP BY employee_name, shift",
+        lambda day, name: (str(day.year), f"{day.month:02d}"),
+    ),
+    "session lookup": (
+        "SELECT check_in, check_out FROM attendance WHERE employee_name = ? AND date = ? AND shift = ?",
+        lambda day, name: (name, day.isoformat(), "morning"),
+    ),
+}
+
+NEW_QUERIES = {
+    "attendance by date": (
+        "SELECT employee_name, check_in, shift, status FROM attendance WHERE date >= ? AND date < ?",
+        lambda day, name: day_range(day),
+    ),
+    "monthly report": (
+        "SELECT employee_name, shift, COUNT(*) FROM attendance "
+        "WHERE date >= ? AND date < ? GROUP BY employee_name, shift",
+        lambda day, name: month_range(day.year, day.month),
+    ),
+    "session lookup": OLD_QUERIES["session lookup"],
+}
+
+
+def build_table(conn, rows, employees, seed=0):
+    """One row per (day, employee, shift), like production after the UNIQUE key"""
+    conn.execute('''
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_name TEXT, date DATE, check_in TIME, check_out TIME,
+            shift TEXT, status TEXT, device_id TEXT
+        )
+    ''')
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    per_day = employees * 2
+
+    def generate():
+        for i in range(rows):
+            day = start + timedelta(days=i // per_day)
+            employee = (i % per_day) // 2
+            shift = "morning" if i % 2 == 0 else "night"
+            hour = 8 if shift == "morning" else 16
+            yield (f"employee_{employee}", day.isoformat(), f"{hour:02d}:{rng.randrange(60):02d}:00",
+                   None, shift, rng.choice(("on_time", "late")), "kiosk-1")
+
+    conn.execute("BEGIN")
+    conn.executemany('''
+        INSERT INTO attendance (employee_name, date, check_in, check_out, shift, status, device_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', generate())
+    conn.execute("COMMIT")
+    last_day = start + timedelta(days=(rows - 1) // per_day)
+    return start, last_day
+
+
+def run(conn, queries, probes, repeat):
+    for label, (sql, params) in queries.items():
+        day, name = probes[0]
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params(day, name)).fetchall()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for day, name in probes:
+                conn.execute(sql, params(day, name)).fetchall()
+        ms = (time.perf_counter() - start) * 1000 / (repeat * len(probes))
+        print(f"  {label:<20} {ms:10.2f} ms   plan: {' | '.join(row[-1] for row in plan)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"), isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        start = time.perf_counter()
+        first_day, last_day = build_table(conn, args.rows, args.employees)
+        print(f"Built {args.rows:,} rows ({first_day} .. {last_day}) in {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(1)
+        span = (last_day - first_day).days
+        probes = [(first_day + timedelta(days=rng.randrange(span + 1)),
+                   f"employee_{rng.randrange(args.employees)}") for _ in range(args.probes)]
+
+        print("\nBefore (no indexes, function predicates):")
+        run(conn, OLD_QUERIES, probes, args.repeat)
+
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        migrate_schema(conn)
+        conn.execute("COMMIT")
+        print(f"\nMigration (indexes + ANALYZE) took {time.perf_counter() - start:.1f} s")
+
+        print("\nAfter (indexes, range predicates):")
+        run(conn, NEW_QUERIES, probes, args.repeat)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
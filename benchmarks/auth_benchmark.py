@@ -0,0 +1,98 @@
+"""
+Authenticated requests per second with and without the resolved-user cache.
+
+Spawns the API twice on a temporary database holding --users accounts, once
+with AUTH_CACHE_TTL=0 (every request decodes the JWT and reads the user from
+SQLite, as before the cache) and once with the cache on, and drives
+GET /users/me from --clients threads with bearer tokens spread over the users:
+
+    python benchmarks/auth_benchmark.py --users 100 --clients 8 --duration 10
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.api_load_test import free_port, percentile, spawn_server
+
+
+def seed_users(path, users):
+    """Active accounts with an unusable password: the benchmark never logs in"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE users (
+            username TEXT PRIMARY KEY, full_name TEXT, hashed_password TEXT,
+            role TEXT, shift TEXT, is_active BOOLEAN
+        )
+    ''')
+    with conn:
+        conn.executemany("INSERT INTO users VALUES (?, ?, '!', 'user', 'morning', 1)",
+                         ((f"user_{i}", f"User {i}") for i in range(users)))
+    conn.close()
+
+
+def drive(url, tokens, clients, duration):
+    """(requests per second, per-request latencies in ms) over `duration` seconds"""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local = []
+        i = offset
+        while time.perf_counter() < deadline:
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            start = time.perf_counter()
+            session.get(url + "/users/me", headers=headers, timeout=30).raise_for_status()
+            local.append((time.perf_counter() - start) * 1000)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / duration, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "attendance.db")
+        seed_users(db_path, args.users)
+        # api.auth opens the database at import time: point it at the temporary one
+        os.environ["ATTENDANCE_DB"] = db_path
+        from api.auth import create_access_token
+        tokens = [create_access_token({"sub": f"user_{i}"}) for i in range(args.users)]
+
+        for label, ttl in (("no cache", 0), ("cached", 60)):
+            server, url = spawn_server(db_path, free_port(), AUTH_CACHE_TTL=str(ttl))
+            try:
+                drive(url, tokens, args.clients, 1.0)  # warm up connections (and the cache)
+                rate, latencies = drive(url, tokens, args.clients, args.duration)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            print(f"{label:>9}: {rate:8.0f} req/s  p50={percentile(latencies, 50):6.2f} ms  "
+                  f"p99={percentile(latencies, 99):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
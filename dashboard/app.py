@@ -5,50 +5,28 @@ import requests
 from datetime import datetime, timedelta
 import time
 from pathlib import Path
-import os
 import sys
 import subprocess
 import shutil
 import json
 from utils import sound
-import cv2
 import numpy as np
-import face_recognition
 from attendance_tracker import AttendanceTracker
 from typing import Tuple
 
+# Make the project root importable for the shared recognition package
+ROOT_DIR = Path(__file__).parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from recognition.encoding_cache import EncodingCache, load_known_faces
+
 # Initialize face recognition system
 def initialize_face_recognition():
     if 'face_recognition_initialized' not in st.session_state:
-        path = Path(__file__).parent.parent / 'Attendance_data'
-        images = []
-        classNames = []
-        
-        # Get list of person folders
-        myList = [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
-        
-        # Process each person's folder
-        for person_folder in myList:
-            person_path = os.path.join(path, person_folder)
-            # Look for all pose images (center, left, right)
-            for pose in ['center.png', 'left.png', 'right.png']:
-                pose_path = os.path.join(person_path, pose)
-                if os.path.exists(pose_path):
-                    curImg = cv2.imread(pose_path)
-                    if curImg is not None:
-                        images.append(curImg)
-                        classNames.append(person_folder)
-        
-        # Encode faces
-        encodeListKnown = []
-        for img, name in zip(images, classNames):
-            img = cv2.cvtColor(cv2.resize(img, (0,0), fx=0.25, fy=0.25), cv2.COLOR_BGR2RGB)
-            encodings = face_recognition.face_encodings(img)
-            if len(encodings) > 0:
-                encodeListKnown.append(encodings[0])
-            else:
-                classNames.remove(name)
-                continue
+        path = ROOT_DIR / 'Attendance_data'
+        # Shares the on-disk encoding cache with main.py, so only new images are encoded
+        encodeListKnown, classNames = load_known_faces(path, EncodingCache())
         
         st.session_state.classNames = classNames
         st.session_state.encodeListKnown = encodeListKnown
@@ -63,6 +41,8 @@ from pathlib import Path
 import json
 from utils.user_data import delete_user_completely
 from utils.image_management import delete_user_image, get_user_images
+from utils.api_client import conditional_get
+from utils.live_attendance import get_live_feed
 
 # Menghapus duplikat fungsi delete_user_completely karena sudah diimpor dari utils.user_data
 
@@ -79,20 +59,25 @@ from pages.attendance import show_attendance
 # API endpoints
 API_URL = "http://localhost:8000"
 TOKEN_KEY = "access_token"
+LIVE_REFRESH_SECONDS = 1  # how often the live overview redraws from the in-memory table
+ATTENDANCE_COLUMNS = ['employee_name', 'check_in', 'check_out', 'assigned_shift', 'actual_shift', 'status']
 
 def api_call(endpoint: str, method="get", **kwargs):
     try:
         url = f"{API_URL}{endpoint}"
         if method.lower() == "get":
-            response = requests.get(url, **kwargs)
+            # Conditional GET: unchanged data comes back as a 304 and is served from the local copy
+            status_code, body = conditional_get(url, **kwargs)
         else:
             response = requests.post(url, **kwargs)
+            status_code = response.status_code
+            body = response.json() if status_code == 200 else response.text
             
-        if response.status_code != 200:
-            st.error(f"API Error: {response.status_code} - {response.text}")
+        if status_code != 200:
+            st.error(f"API Error: {status_code} - {body}")
             return None
             
-        return response.json()
+        return body
     except requests.exceptions.ConnectionError:
         st.error("Tidak dapat terhubung ke server. Pastikan server API sedang berjalan.")
         return None
@@ -151,19 +136,42 @@ def determine_actual_shift(check_in_time):
     hour = check_in_time.hour
     return 'morning' if 8 <= hour < 17 else 'night'
 
+def load_user_shifts():
+    """Assigned shift per user from user_data.json"""
+    user_data_file = Path(__file__).parent.parent / "user_data.json"
+    user_shifts = {}
+    if user_data_file.exists():
+        try:
+            with open(user_data_file, 'r') as f:
+                data = json.load(f)
+            user_shifts = {name: info['shift'] for name, info in data.items()}
+        except:
+            st.warning("⚠️ Could not load user shift data")
+    return user_shifts
+
+def live_attendance_frame(records):
+    """Records from the /events/stream feed as the DataFrame get_today_attendance() returns"""
+    user_shifts = load_user_shifts()
+    rows = []
+    for record in records:
+        if not record.get('time'):
+            continue  # check-out whose check-in predates the feed's snapshot
+        check_in = pd.to_datetime(f"{record['date']} {record['time']}")
+        check_out = pd.to_datetime(f"{record['date']} {record['check_out']}") if record.get('check_out') else None
+        rows.append({
+            'employee_name': record['name'],
+            'check_in': check_in,
+            'check_out': check_out,
+            'assigned_shift': user_shifts.get(record['name'], 'morning'),
+            'actual_shift': determine_actual_shift(check_in.time()),
+            'status': record['status']
+        })
+    return pd.DataFrame(rows, columns=ATTENDANCE_COLUMNS)
+
 def get_today_attendance():
     try:
         # Load user data for shift information
-        user_data_file = Path(__file__).parent.parent / "user_data.json"
-        user_shifts = {}
-        if user_data_file.exists():
-            import json
-            try:
-                with open(user_data_file, 'r') as f:
-                    data = json.load(f)
-                user_shifts = {name: info['shift'] for name, info in data.items()}
-            except:
-                st.warning("⚠️ Could not load user shift data")
+        user_shifts = load_user_shifts()
         
         # Get attendance data
         attendance_dir = Path(__file__).parent.parent / "Attendance_Entry"
@@ -265,18 +273,28 @@ def get_today_attendance():
                 st.warning(f"Error reading attendance file: {str(e)}")
                 
         # Return empty DataFrame if no data or errors
-        return pd.DataFrame(columns=['employee_name', 'check_in', 'check_out', 'assigned_shift', 'actual_shift', 'status'])
+        return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
     
     except Exception as e:
         st.error(f"Gagal mengambil data absensi hari ini: {str(e)}")
-        return pd.DataFrame(columns=['employee_name', 'check_in', 'check_out', 'assigned_shift', 'actual_shift', 'status'])
+        return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
 
-def get_all_attendance():
+def get_all_attendance(**filters):
     try:
-        response = api_call("/attendance/all")
-        if response and 'data' in response:
-            return pd.DataFrame(response['data'])
-        return pd.DataFrame()
+        # Follow the keyset cursor with large pages instead of one unbounded payload
+        records, cursor = [], None
+        while True:
+            params = dict(filters, limit=5000)
+            if cursor:
+                params["cursor"] = cursor
+            response = api_call("/attendance/all", params=params)
+            if not response or 'data' not in response:
+                break
+            records.extend(response['data'])
+            cursor = response.get('next_cursor')
+            if not cursor:
+                break
+        return pd.DataFrame(records)
     except Exception as e:
         st.error(f"Failed to fetch attendance data: {str(e)}")
         return pd.DataFrame()
@@ -348,10 +366,27 @@ def main():
 def show_overview():
     st.header("Overview Hari Ini")
     
-    # Get today's data and device status
-    df = get_today_attendance()
+    # Device status is fetched once per page run; only the attendance part refreshes itself
     response = api_call("/devices")
+    devices = response.get('data', []) if response else []
+    # Counts kept by the API's fleet registry, no need to scan the list
+    device_summary = response.get('summary', {}) if response else {}
     
+    feed = get_live_feed(f"{API_URL}/events/stream")
+    if feed.ready:
+        show_live_overview(feed, devices, device_summary)
+    else:
+        # Live feed not connected yet (API down or starting): read today's CSV
+        show_overview_details(get_today_attendance(), devices, device_summary)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_live_overview(feed, devices, device_summary):
+    # Reruns every second without reparsing anything: the table is kept up to date by the SSE feed
+    if not feed.connected:
+        st.caption("⏳ Live feed reconnecting, showing the last known data")
+    show_overview_details(feed.frame(live_attendance_frame), devices, device_summary)
+
+def show_overview_details(df, devices, device_summary):
     # Display metrics
     col1, col2, col3, col4 = st.columns(4)
     
@@ -377,10 +412,7 @@ def show_overview():
         st.metric("Hadir di Shift Malam", night_count)
     
     # Get device status
-    devices = response.get('data', []) if response else []
-    active_devices = 0
-    if devices:
-        active_devices = sum(1 for device in devices if isinstance(device, dict) and device.get('status') == 'active')
+    active_devices = device_summary.get('active', 0)
     
     with col4:
         st.metric("Perangkat Aktif", active_devices)
@@ -6,6 +6,7 @@ from pathlib import Path
 import requests
 import time
 from utils import delete_user_completely, delete_user_image, get_user_images, get_user_data
+from utils.api_client import conditional_get
 
 API_URL = "http://localhost:8000"
 
@@ -14,7 +15,12 @@ def api_call(endpoint: str, method="get", **kwargs):
     url = f"{API_URL}{endpoint}"
     try:
         if method == "get":
-            r = requests.get(url, **kwargs)
+            # Revalidated with ETag/Last-Modified; a 304 reuses the last copy
+            status_code, body = conditional_get(url, **kwargs)
+            if status_code != 200:
+                st.error(f"API Error {status_code}: {body}")
+                return None
+            return body
         elif method == "delete":
             r = requests.delete(url, **kwargs)
         elif method == "post":
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple
+
+import requests
+
+__all__ = ['conditional_get']
+
+# Streamlit re-runs the page script on every interaction, but this module is
+# imported once per server process, so validators and bodies survive reruns.
+_session = requests.Session()
+_cache: "OrderedDict[Tuple, Tuple[str, str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+MAX_ENTRIES = 128
+
+
+def conditional_get(url: str, params=None, timeout: float = 10.0, **kwargs) -> Tuple[int, Any]:
+    """
+    GET a JSON endpoint, revalidating the last copy with If-None-Match /
+    If-Modified-Since. Returns (status_code, parsed JSON); a 304 is served
+    from the local copy as a 200. Non-200 responses return the body text.
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    with _lock:
+        cached = _cache.get(key)
+    headers = dict(kwargs.pop('headers', None) or {})
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    response = _session.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    if response.status_code == 304 and cached is not None:
+        return 200, cached[2]
+    if response.status_code != 200:
+        return response.status_code, response.text
+
+    body = response.json()
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        with _lock:
+            _cache[key] = (etag, last_modified, body)
+            _cache.move_to_end(key)
+            while len(_cache) > MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return 200, body
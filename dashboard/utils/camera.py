@@ -1,12 +1,22 @@
 import streamlit as st
 import cv2
-import numpy as np
 import face_recognition
 import time
 from pathlib import Path
 import os
+import sys
 from typing import Tuple
 
+# The shared recognition package lives in the project root
+ROOT_DIR = Path(__file__).parent.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from recognition.encoding_cache import EncodingCache, LANDMARK_MODEL, load_known_faces
+from recognition.matcher import GalleryMatcher, MATCH_THRESHOLD
+from recognition.detection import detection_scale, scale_box
+from recognition.chips import ChipExtractor
+
 def get_camera_feed():
     """
     Creates a Streamlit camera component that can be used in the dashboard.
@@ -17,7 +27,7 @@ def get_camera_feed():
     
     return camera_image
 
-def analyze_face_image(image, known_face_encodings=None, known_face_names=None):
+def analyze_face_image(image, known_face_encodings=None, known_face_names=None, matcher=None, top_k=3):
     """
     Analyzes a face in an image and compares it with known faces.
     
@@ -25,6 +35,8 @@ def analyze_face_image(image, known_face_encodings=None, known_face_names=None):
         image: The image captured from the camera
         known_face_encodings: List of known face encodings
         known_face_names: List of names corresponding to the encodings
+        matcher: Prebuilt GalleryMatcher; built from the two lists above if omitted
+        top_k: Number of candidate identities to report
     
     Returns:
         Dict with detection results including face locations, names, etc.
@@ -32,11 +44,15 @@ def analyze_face_image(image, known_face_encodings=None, known_face_names=None):
     if image is None:
         return None
     
+    if matcher is None and known_face_encodings is not None and known_face_names is not None:
+        matcher = GalleryMatcher(known_face_encodings, known_face_names)
+    
     # Convert the image from BGR to RGB format
     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     
-    # Resize for faster face recognition processing
-    small_frame = cv2.resize(image_rgb, (0, 0), fx=0.25, fy=0.25)
+    # Resize for faster face recognition processing; the scale follows the image resolution
+    scale = detection_scale(image_rgb.shape)
+    small_frame = cv2.resize(image_rgb, (0, 0), fx=scale, fy=scale)
     
     # Find all faces in the current frame
     face_locations = face_recognition.face_locations(small_frame)
@@ -44,29 +60,33 @@ def analyze_face_image(image, known_face_encodings=None, known_face_names=None):
     result = {
         "face_detected": len(face_locations) > 0,
         "multiple_faces": len(face_locations) > 1,
-        "face_locations": face_locations,
+        # Reported in original image coordinates
+        "face_locations": [scale_box(loc, scale) for loc in face_locations],
         "recognized_name": None,
         "match_confidence": None,
-        "face_encoding": None
+        "face_encoding": None,
+        "top_matches": []
     }
     
     # If faces are found and we have reference encodings, try to identify them
-    if face_locations and known_face_encodings is not None and known_face_names is not None:
-        face_encodings = face_recognition.face_encodings(small_frame, face_locations)
+    if face_locations and matcher is not None:
+        # Encode from a full-resolution chip, the same way the gallery was encoded
+        chips, chip_box = ChipExtractor(capacity=1).extract(image, result["face_locations"][:1])
+        face_encodings = face_recognition.face_encodings(chips[0], [chip_box], model=LANDMARK_MODEL)
         
         if face_encodings:
             result["face_encoding"] = face_encodings[0]
             
-            # Compare the detected face with our known faces
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encodings[0])
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                match_confidence = 1 - face_distances[best_match_index]
-                
-                # If the face is a close match
-                if match_confidence > 0.6:  # Threshold for recognition
-                    result["recognized_name"] = known_face_names[best_match_index]
-                    result["match_confidence"] = match_confidence
+            # Compare the detected face with our known identities
+            matches = matcher.match(face_encodings[0], k=top_k)
+            result["top_matches"] = [
+                {"name": m.name, "distance": m.distance, "margin": m.margin} for m in matches
+            ]
+            
+            # If the face is a close match
+            if matches and matches[0].distance < MATCH_THRESHOLD:
+                result["recognized_name"] = matches[0].name
+                result["match_confidence"] = 1 - matches[0].distance
     
     return result
 
@@ -122,43 +142,22 @@ def capture_and_save_face(image, output_path, pose="center"):
 
 def load_face_encodings():
     """
-    Loads all face encodings from the Attendance_data directory
+    Loads all face encodings from the Attendance_data directory.
+    Uses the shared on-disk encoding cache, so only new or changed images are encoded.
     
     Returns:
         Tuple: (encodings, names)
     """
-    root_dir = Path(__file__).parent.parent.parent
-    attendance_dir = root_dir / "Attendance_data"
+    attendance_dir = ROOT_DIR / "Attendance_data"
     
     if not attendance_dir.exists():
         return [], []
     
-    # Get list of person folders
-    person_folders = [f for f in os.listdir(attendance_dir) if os.path.isdir(os.path.join(attendance_dir, f))]
-    
-    encodings = []
-    names = []
-    
-    for person in person_folders:
-        person_dir = attendance_dir / person
-        
-        # Check for center.png (primary image)
-        center_img_path = person_dir / "center.png"
-        if center_img_path.exists():
-            try:
-                # Load the image
-                img = cv2.imread(str(center_img_path))
-                rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                
-                # Get encodings
-                face_encodings = face_recognition.face_encodings(rgb_img)
-                if face_encodings:
-                    encodings.append(face_encodings[0])
-                    names.append(person)
-            except Exception as e:
-                st.warning(f"Could not load encoding for {person}: {str(e)}")
-    
-    return encodings, names
+    try:
+        return load_known_faces(attendance_dir, EncodingCache())
+    except Exception as e:
+        st.warning(f"Could not load face encodings: {str(e)}")
+        return [], []
 
 def get_orientation_instructions(progress_step):
     """
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+__all__ = ['LiveAttendance', 'get_live_feed']
+
+RECONNECT_DELAY = (1.0, 10.0)  # seconds; first retry, then doubling up to the maximum
+READ_TIMEOUT = 45.0  # seconds without a byte (the API sends a keepalive every 15 s)
+
+
+class LiveAttendance:
+    """
+    Today's attendance kept in memory from the API's /events/stream feed.
+
+    A daemon thread holds the Server-Sent Events connection: the "snapshot"
+    event replaces the table, each "attendance" event updates one
+    (name, date, shift) row in place. Reconnects resume with Last-Event-ID.
+    Page reruns only read the table; frame() rebuilds its DataFrame only
+    after something changed.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ready = False  # a snapshot has been applied
+        self.connected = False
+        self.version = 0
+        self._rows: Dict[Tuple[str, str, str], dict] = {}
+        self._last_event_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self._frame: Tuple[int, Any] = (-1, None)
+        self._thread = threading.Thread(target=self._run, name="live-attendance", daemon=True)
+        self._thread.start()
+
+    def records(self) -> Tuple[int, List[dict]]:
+        """(version, today's records)"""
+        today = date.today().isoformat()
+        with self._lock:
+            return self.version, [dict(r) for r in self._rows.values() if r['date'] == today]
+
+    def frame(self, build: Callable[[List[dict]], Any]):
+        """build(records), cached until the next change (or the next day)"""
+        version, records = self.records()
+        key = (version, date.today())
+        cached_key, cached = self._frame
+        if cached_key != key:
+            cached = build(records)
+            self._frame = (key, cached)
+        return cached
+
+    # ----- feed -----
+
+    def _run(self):
+        delay = RECONNECT_DELAY[0]
+        session = requests.Session()
+        while True:
+            headers = {'Accept': 'text/event-stream'}
+            if self._last_event_id is not None:
+                headers['Last-Event-ID'] = self._last_event_id
+            try:
+                with session.get(self.url, headers=headers, stream=True, timeout=(3.0, READ_TIMEOUT)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    delay = RECONNECT_DELAY[0]
+                    self._consume(response.iter_lines(decode_unicode=True))
+            except (requests.RequestException, ValueError):
+                pass
+            self.connected = False
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY[1])
+
+    def _consume(self, lines):
+        event_id, event, data = None, 'message', []
+        for line in lines:
+            if line:
+                if line.startswith(':'):
+                    continue  # keepalive
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'id':
+                    event_id = value
+                elif field == 'event':
+                    event = value
+                elif field == 'data':
+                    data.append(value)
+                continue
+            # Blank line: dispatch
+            if data:
+                self._apply(event, json.loads('\n'.join(data)))
+            if event_id is not None:
+                self._last_event_id = event_id
+            event_id, event, data = None, 'message', []
+
+    def _apply(self, event: str, data):
+        with self._lock:
+            if event == 'snapshot':
+                self._rows = {}
+                for record in data['records']:
+                    self._upsert(record)
+                self.ready = True
+            elif event == 'attendance':
+                self._upsert(data)
+            else:
+                return
+            self.version += 1
+
+    def _upsert(self, record: dict):
+        key = (record['name'], record['date'], record['shift'])
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = dict(record)
+            return
+        if record.get('time') is None:
+            # A check-out event carries only the check-out time; keep the check-in's status
+            row['check_out'] = record['check_out']
+        else:
+            row.update(record)
+
+
+_feeds: Dict[str, LiveAttendance] = {}
+_feeds_lock = threading.Lock()
+
+
+def get_live_feed(url: str) -> LiveAttendance:
+    """One feed per URL and server process; Streamlit reruns and sessions share it"""
+    with _feeds_lock:
+        feed = _feeds.get(url)
+        if feed is None:
+            feed = _feeds[url] = LiveAttendance(url)
+        return feed
@@ -9,6 +9,8 @@ warnings.filterwarnings('ignore', message='pkg_resources is deprecated as an API
 
 import face_recognition
 
+from recognition.detection import detection_scale
+
 def calculate_eye_aspect_ratio(eye_landmarks):
     """
     Calculate the eye aspect ratio to detect blinks
@@ -144,7 +146,7 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
     
     # Variables to store the locked face position
     locked_face = None
-    face_lock_threshold = 50  # pixels
+    face_lock_threshold = 200  # full-frame pixels (50 at the old fixed 0.25 downscale)
     face_landmarks = []
     
     while True:
@@ -153,7 +155,9 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
             print("Failed to grab frame")
             break
             
-        small_frame = cv2.resize(image, (0,0), fx=0.25, fy=0.25)
+        # Detection scale follows the camera resolution (0.25 at 1080p, larger on low-res cameras)
+        scale = detection_scale(image.shape)
+        small_frame = cv2.resize(image, (0,0), fx=scale, fy=scale)
         rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
         face_locations = face_recognition.face_locations(rgb_small, model="hog")
         
@@ -186,8 +190,8 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
                         min_distance = distance
                         closest_face_idx = idx
                 
-                # Only use the closest face if it's within the threshold
-                if min_distance < face_lock_threshold:
+                # Only use the closest face if it's within the threshold (distances are in detection-frame pixels)
+                if min_distance < face_lock_threshold * scale:
                     # Get landmarks only for the locked face
                     face_locations = [face_locations[closest_face_idx]]
                     face_landmarks = face_recognition.face_landmarks(rgb_small, [face_locations[0]])
@@ -205,7 +209,7 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
             # Draw rectangle around other faces in red to show they're ignored
             if locked_face is not None:
                 for face_loc in face_locations[1:] if len(face_locations) > 1 else []:
-                    top, right, bottom, left = [coord * 4 for coord in face_loc]
+                    top, right, bottom, left = [int(coord / scale) for coord in face_loc]
                     cv2.rectangle(display_image, (left, top), (right, bottom), (0, 0, 255), 2)
                     cv2.putText(display_image, "Ignored", (left, top - 10),
                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
@@ -221,13 +225,13 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
             for feature, points in landmarks.items():
                 scaled_points = []
                 for point in points:
-                    scaled_points.append([point[0] * 4, point[1] * 4])
+                    scaled_points.append([int(point[0] / scale), int(point[1] / scale)])
                 scaled_landmarks[feature] = scaled_points
             
             # Draw landmarks and face box for the locked face
             if len(face_locations) > 0:
                 face_loc = face_locations[0]
-                top, right, bottom, left = [coord * 4 for coord in face_loc]
+                top, right, bottom, left = [int(coord / scale) for coord in face_loc]
                 
                 # Draw green box for the locked face
                 cv2.rectangle(display_image, (left, top), (right, bottom), (0, 255, 0), 2)
@@ -423,6 +427,16 @@ def Intial_data_capture(name=None, camera_id=None, run_main=True):
             print(f"Warning: Could not remove incomplete data: {e}")
             return False
     else:
+        try:
+            # Warm the encoding cache and update the ANN index (if one is in use) for the new identity
+            from recognition.encoding_cache import encode_identity
+            from recognition.ann_index import add_identity_to_index
+            encodings = encode_identity(name, base_path)
+            if add_identity_to_index(name, encodings):
+                print(f"Added {name} to the ANN index")
+        except Exception as e:
+            print(f"Warning: could not update face index for {name}: {e}")
+
         try:
             # Optionally run main.py after successful capture
             if run_main:
@@ -2,17 +2,18 @@ import cv2
 import numpy as np
 import os
 import time
+import threading
 import warnings
 
 # Suppress pkg_resources deprecation warning
 warnings.filterwarnings('ignore', category=UserWarning, module='pkg_resources')
 warnings.filterwarnings('ignore', message='pkg_resources is deprecated as an API')
 
-import face_recognition
 from datetime import datetime
 from datetime import date
 import pytz
 import csv
+import platform
 
 # Hardware acceleration configuration
 HARDWARE_CODEC = {
@@ -22,339 +23,409 @@ HARDWARE_CODEC = {
     'extra_options': {}
 }
 
-
-def identifyEncodings(images, classNames):
-    '''
-    Encoding is Recognition and comparing particular face in database or stored folder
-    with GPU acceleration when available
-
-    args:
-    images: list of images
-    classNames: list of image names
-    '''
-    
-    encodeList = []
-    use_gpu = cv2.cuda.getCudaEnabledDeviceCount() > 0
-    
-    for img, name in zip(images, classNames):
-        if use_gpu:
-            # Upload to GPU
-            gpu_img = cv2.cuda_GpuMat()
-            gpu_img.upload(img)
-            
-            # Resize on GPU
-            gpu_small = cv2.cuda.resize(gpu_img, (0,0), fx=0.25, fy=0.25)
-            
-            # Color convert on GPU
-            gpu_rgb = cv2.cuda.cvtColor(gpu_small, cv2.COLOR_BGR2RGB)
-            
-            # Download for face_recognition
-            img = gpu_rgb.download()
-        else:
-            small_frame = cv2.resize(img, (0,0), fx=0.25, fy=0.25)
-            img = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-        
-        # Use CNN model when GPU is available, HOG for CPU
-        encodings = face_recognition.face_encodings(img, model="cnn" if use_gpu else "hog")
-        
-        if len(encodings) > 0:
-            encode = encodings[0]
-            encodeList.append(encode)
-        else:
-            print(f"Warning: No face detected in image for {name}")
-            # Remove the corresponding name from classNames
-            classNames.remove(name)
-            continue
-    return encodeList
+# Pipeline configuration
+RECOGNITION_WORKERS = 1  # recognition threads pulling the newest frame
+ENGINE_PROCESSES = 1  # dlib worker processes (0 = run dlib on the recognition thread)
+STATS_INTERVAL = 10.0  # seconds between pipeline throughput reports
+REVERIFY_FRAMES = 15  # re-encode a recognised track every N detection frames
+FORCED_DETECT_INTERVAL = 2.0  # seconds; run detection at least this often even without motion
+MAX_FACES_PER_FRAME = 10  # tracked faces shown per frame, largest (closest) first
+MAX_ENCODES_PER_FRAME = 4  # faces encoded per frame; the rest wait for the next frame
+IDENTITY_COOLDOWN = 30.0  # seconds an identity's shift status is reused before asking the tracker again
+METRICS_PORT = int(os.environ.get("KIOSK_METRICS_PORT", 0))  # local /metrics exporter; 0 = off
 
 from attendance_tracker import AttendanceTracker
+from recognition.encoding_cache import EncodingCache, LANDMARK_MODEL
+from recognition.gallery import LiveGallery
+from recognition.pipeline import STAGE_SECONDS, FaceEngine, FrameGrabber, RecognitionWorkers, StageStats
+from recognition import metrics
+from recognition.tracker import FaceTracker
+from recognition.motion_gate import MotionGate
+from recognition.detection import DetectionScheduler
+from recognition.chips import ChipExtractor
 
 # Initialize the attendance tracker
 attendance_tracker = AttendanceTracker()
-
-def markAttendance(name):
+# Recognition workers may mark attendance concurrently
+attendance_lock = threading.Lock()
+
+# Per-stage timers; children are resolved once so each observation is a bisect and a lock
+detect_time = STAGE_SECONDS.labels("detect")
+encode_time = STAGE_SECONDS.labels("encode")
+match_time = STAGE_SECONDS.labels("match")
+render_time = STAGE_SECONDS.labels("render")
+faces_encoded = metrics.counter("pipeline_faces_encoded", "Faces sent to the dlib descriptor network")
+faces_cached = metrics.counter("pipeline_faces_cached", "Tracked faces whose identity was reused without encoding")
+
+def markAttendance(name, confidence=None):
     '''
     This function handles attendance marking using the AttendanceTracker
-    
+
     args:
     name: str
+    confidence: float or None - match confidence sent along with the event
     returns: bool - True if attendance was marked, False if within cooldown period
     '''
-    return attendance_tracker.mark_attendance(name)
-
-# Ensure Attendance_Entry directory exists
-os.makedirs("Attendance_Entry", exist_ok=True)
-
-# Create today's attendance file
-current_date = datetime.now().strftime("%y_%m_%d")
-attendance_file = f"Attendance_Entry/Attendance_{current_date}.csv"
-
-# Create file with headers if it doesn't exist
-if not os.path.exists(attendance_file):
-    with open(attendance_file, "w", newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Name", "Time", "Date"])
-    print(f"Created new attendance file for today: {attendance_file}")
-else:
-    print(f"Using today's attendance file: {attendance_file}")
-
-#Preprocessing the data 
-
-path = 'Attendance_data'
-images = []
-classNames = []
-# Get list of person folders
-myList = [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
-print("Found persons:", myList)
-
-# Process each person's folder
-for person_folder in myList:
-    person_path = os.path.join(path, person_folder)
-    # Look for all pose images (center, left, right)
-    for pose in ['center.png', 'left.png', 'right.png']:
-        pose_path = os.path.join(person_path, pose)
-        if os.path.exists(pose_path):
-            curImg = cv2.imread(pose_path)
-            if curImg is not None:
-                images.append(curImg)
-                classNames.append(person_folder)  # Use folder name as class name
-print("Loaded persons:", classNames)
-print(f"Total images loaded: {len(images)} (including all poses)")
-
-# Encoding of input image data
-encodeListKnown = identifyEncodings(images, classNames)
-print('Encoding Complete')
-print(f'Successfully encoded {len(encodeListKnown)} faces')
-
-
-# Set CUDA device and configurations if available
-if cv2.cuda.getCudaEnabledDeviceCount() > 0:
-    cv2.cuda.setDevice(0)
-    print("Using GPU acceleration")
-    # Enable OpenCL
-    cv2.ocl.setUseOpenCL(True)
-    # Configure CUDA stream
-    stream = cv2.cuda_Stream()
-    # Create CUDA-enabled face detector
-    face_detector = cv2.cuda.FaceDetectorYN_create(
-        model="face_detection_yunet_2023mar.onnx",
-        config="",
-        size=(640, 480),
-        score_threshold=0.9,
-        nms_threshold=0.3,
-        top_k=5000,
-    )
-else:
+    return attendance_tracker.mark_attendance(name, confidence)
+
+def prepare_attendance_file():
+    # Ensure Attendance_Entry directory exists
+    os.makedirs("Attendance_Entry", exist_ok=True)
+
+    # Create today's attendance file
+    current_date = datetime.now().strftime("%y_%m_%d")
+    attendance_file = f"Attendance_Entry/Attendance_{current_date}.csv"
+
+    # Create file with headers if it doesn't exist
+    if not os.path.exists(attendance_file):
+        with open(attendance_file, "w", newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Name", "Time", "Date"])
+        print(f"Created new attendance file for today: {attendance_file}")
+    else:
+        print(f"Using today's attendance file: {attendance_file}")
+
+def load_gallery(path='Attendance_data'):
+    # Encodings are reused from the on-disk cache; only new or changed pose images hit dlib.
+    # The live gallery then follows the folder, so registrations/deletions apply without a restart.
+    gallery = LiveGallery(path, EncodingCache())
+    matcher = gallery.load()
+    print("Loaded persons:", matcher.identities)
+    print('Encoding Complete')
+    print(f'Successfully encoded {matcher.size} faces (including all poses)')
+    return gallery
+
+def create_gpu_detector():
+    # Set CUDA device and configurations if available
+    if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+        cv2.cuda.setDevice(0)
+        print("Using GPU acceleration")
+        # Enable OpenCL
+        cv2.ocl.setUseOpenCL(True)
+        # Create CUDA-enabled face detector
+        return cv2.cuda.FaceDetectorYN_create(
+            model="face_detection_yunet_2023mar.onnx",
+            config="",
+            size=(640, 480),
+            score_threshold=0.9,
+            nms_threshold=0.3,
+            top_k=5000,
+        )
     print("Using CPU processing")
-    stream = None
-    face_detector = None
+    return None
+
+# name -> (status line, monotonic time it was computed)
+_recent_status = {}
+
+def attendance_status(name, confidence=None):
+    '''
+    Mark attendance if allowed and return the shift status line for the overlay.
+    Within IDENTITY_COOLDOWN of the last check the cached line is returned, so a
+    crowd of re-verified faces does not hammer the tracker and CSV.
+    '''
+    now = time.monotonic()
+    with attendance_lock:
+        cached = _recent_status.get(name)
+        if cached is not None and now - cached[1] < IDENTITY_COOLDOWN:
+            return cached[0]
+        status = attendance_tracker.shift_status(name, confidence)
+        _recent_status[name] = (status, now)
+        return status
+
+class FrameRecognizer:
+    '''
+    Detection + recognition for one frame; runs on the recognition worker threads.
+    Faces are tracked across frames and a track's identity is cached, so the
+    dlib encoder only runs for new tracks, every REVERIFY_FRAMES, or after a big move.
+    Every face in the frame is recognised; pending faces are encoded in one batch.
+    Returns a dict with the status message and recognised faces in full-frame coordinates.
+    '''
+
+    def __init__(self, matcher, engine, face_detector=None):
+        self.matcher = matcher
+        self.engine = engine
+        self.face_detector = face_detector
+        self.tracker = FaceTracker(reverify_every=REVERIFY_FRAMES)
+        self.motion_gate = MotionGate(force_every=FORCED_DETECT_INTERVAL)
+        self.scheduler = DetectionScheduler()
+        # Faces are encoded from fixed-size full-resolution chips, not the whole frame
+        self.chips = ChipExtractor(capacity=MAX_ENCODES_PER_FRAME)
+
+    def set_matcher(self, matcher, changed=()):
+        """Swap in a reloaded gallery; unknown tracks and tracks of changed identities are re-checked"""
+        self.matcher = matcher
+        with self.tracker.lock:
+            for track in self.tracker.tracks:
+                if track.name is None or track.name in changed:
+                    track.verified_at = None
+
+    def detect(self, img):
+        """Face boxes in full-frame (top, right, bottom, left) coordinates"""
+        # Process image with GPU acceleration if available
+        if self.face_detector is not None:
+            # Upload image to GPU memory
+            gpu_frame = cv2.cuda_GpuMat()
+            gpu_frame.upload(img)
+
+            # Detect faces using GPU-accelerated detector; boxes are already full-frame
+            faces = self.face_detector.detect(gpu_frame)
+            if faces[1] is not None:
+                return [(int(face[1]), int(face[0] + face[2]),
+                         int(face[1] + face[3]), int(face[0]))
+                        for face in faces[1]]
+            return []
+        # CPU: HOG detection in the dlib worker process, on track ROIs or a coarse full scan
+        return self.scheduler.detect(img, [t.box for t in self.tracker.tracks],
+                                     lambda rgb: self.engine.detect(rgb, "hog"))
+
+    def __call__(self, img):
+        # Skip detection entirely on an idle scene with nobody being tracked
+        if not self.motion_gate.should_detect(img, self.tracker.active):
+            return {"message": ("No face detected", (0, 255, 255)), "faces": []}
+
+        with self.tracker.lock:
+            with detect_time.time():
+                facesCurFrame = self.detect(img)
+            tracks = self.tracker.update(facesCurFrame)
+            if len(tracks) == 0:
+                return {"message": ("No face detected", (0, 255, 255)), "faces": []}
+
+            # Bound per-frame work in a crowd: closest faces first, a few encodes per frame
+            tracks = sorted(tracks, key=lambda t: t.size, reverse=True)[:MAX_FACES_PER_FRAME]
+            pending = [t for t in tracks if self.tracker.needs_recognition(t)]
+            # Never-seen faces before re-verifications
+            pending.sort(key=lambda t: t.verified_at is not None)
+            pending = pending[:MAX_ENCODES_PER_FRAME]
+            self.tracker.cached += len(tracks) - len(pending)
+            faces_cached.inc(len(tracks) - len(pending))
+
+            if pending:
+                self.tracker.encodes += len(pending)
+                faces_encoded.inc(len(pending))
+                # One batched descriptor call and one matrix match for every pending face
+                with encode_time.time():
+                    chips, chip_box = self.chips.extract(img, [t.box for t in pending])
+                    encodings = self.engine.encode_chips(chips, chip_box, LANDMARK_MODEL)
+                # Strict 0.4 threshold for better accuracy
+                with match_time.time():
+                    matches = self.matcher.identify_batch(np.asarray(encodings))
+                for track, match in zip(pending, matches):
+                    if match is not None:
+                        self.tracker.mark_verified(track, match.name, match.distance,
+                                                   attendance_status(match.name, max(0.0, 1.0 - match.distance)))
+                    else:
+                        self.tracker.mark_verified(track, None)
+
+            faces = [{"box": t.box, "name": t.name, "status": t.status}
+                     for t in tracks if t.name is not None]
+        return {"message": None, "faces": faces}
+
+def draw_results(img, result):
+    '''Draw the latest recognition result onto the display frame'''
+    if result is None:
+        return
+    if result["message"] is not None:
+        text, color = result["message"]
+        cv2.putText(img, text, (10, 30), cv2.FONT_HERSHEY_COMPLEX, 0.7, color, 2)
+    for face in result["faces"]:
+        top, right, bottom, left = face["box"]
+        # Draw boxes and base name
+        cv2.rectangle(img, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.rectangle(img, (left, bottom - 35), (right, bottom), (0, 255, 0), cv2.FILLED)
+        # Display name on top line
+        cv2.putText(img, face["name"], (left + 6, bottom - 25),
+                cv2.FONT_HERSHEY_COMPLEX, 1, (255, 255, 255), 2)
+        # Display shift status on bottom line
+        cv2.putText(img, face["status"], (left + 6, bottom - 6),
+                cv2.FONT_HERSHEY_COMPLEX, 0.6, (255, 255, 255), 1)
+
+def draw_stats(img, stages):
+    '''Per-stage throughput and queue depth in the top right corner'''
+    lines = [f"{s.name} {s.rate:.1f}/s q={s.depth}" for s in stages]
+    for i, line in enumerate(lines):
+        (text_width, _), _ = cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.putText(img, line, (img.shape[1] - text_width - 10, 20 + 20 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
 # Function to check if mouse click is within button bounds
 def is_mouse_click_in_button(x, y, button_pos):
     bx, by, bw, bh = button_pos
     return bx <= x <= bx + bw and by <= y <= by + bh
 
+# Set from the mouse callback; the render loop releases the camera while registering
+registration_requested = threading.Event()
+
 # Mouse callback function
 def mouse_callback(event, x, y, flags, param):
     if event == cv2.EVENT_LBUTTONDOWN:
         button_pos = param
         if is_mouse_click_in_button(x, y, button_pos):
-            print("\nStarting registration process...")
-            cap.release()
-            cv2.destroyAllWindows()
-            # Use subprocess.run to wait for the process to complete
-            import subprocess
-            import sys
-            try:
-                subprocess.run([sys.executable, "initial_data_capture.py"], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error running registration: {e}")
-            global running
-            running = False
-
-# Camera capture 
-cap = cv2.VideoCapture(0)
-
-# Create window first
-cv2.namedWindow('Attendance System', cv2.WINDOW_NORMAL)
-
-# Create a temporary window to get screen dimensions
-temp_window = cv2.namedWindow('temp', cv2.WINDOW_NORMAL)
-cv2.setWindowProperty('temp', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-screen_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-screen_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-cv2.destroyWindow('temp')
-
-# If we couldn't get proper dimensions, use default resolution
-if screen_width <= 0 or screen_height <= 0:
-    screen_width = 1920
-    screen_height = 1080
-    print("Warning: Could not detect screen size, using default 1920x1080")
-
-# Set window to fullscreen
-cv2.namedWindow('Attendance System', cv2.WINDOW_NORMAL)
-cv2.setWindowProperty('Attendance System', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-# Calculate button position based on screen dimensions
-window_width = screen_width
-window_height = screen_height
-
-# Detect platform and set button size accordingly
-import platform
-if platform.system() == 'Linux':  # Jetson Nano
-    button_width = 160  # Smaller width for Jetson
-    button_height = 50  # Smaller height for Jetson
-    padding = 20  # Less padding for Jetson
-    font_scale = 0.8  # Smaller text for Jetson
-else:  # Windows or other platforms
-    button_width = 300  # Larger for desktop
-    button_height = 80  # Larger for desktop
-    padding = 50  # More padding for desktop
-    font_scale = 1.5  # Larger text for desktop
-
-# Position the button in the bottom left corner
-button_pos = (padding, window_height - button_height - padding, button_width, button_height)
-# Store font_scale for later use
-button_font_scale = font_scale
-
-# Set mouse callback
-cv2.setMouseCallback('Attendance System', mouse_callback, button_pos)
-
-last_detected_name = None
-last_detect_time = 0
-CACHE_TIME = 2.0  # detik, cache nama wajah biar gak dihitung ulang tiap frame
-running = True
-
-while running:
-    success, img = cap.read()
-    if not success:
-        break
-        
-    # Draw registration button
-    x, y, w, h = button_pos
-    cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), cv2.FILLED)
-    cv2.putText(img, "Register New", (x + 5, y + 20),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-    # Process image with GPU acceleration if available
-    if cv2.cuda.getCudaEnabledDeviceCount() > 0:
-        # Upload image to GPU memory
-        gpu_frame = cv2.cuda_GpuMat()
-        gpu_frame.upload(img)
-        
-        # Resize on GPU
-        gpu_small = cv2.cuda.resize(gpu_frame, (0, 0), fx=0.25, fy=0.25)
-        
-        # Convert color on GPU
-        gpu_rgb = cv2.cuda.cvtColor(gpu_small, cv2.COLOR_BGR2RGB)
-        
-        # Download for face_recognition (since it doesn't support direct GPU tensors)
-        rgb_small = gpu_rgb.download()
-        
-        # Detect faces using GPU-accelerated detector if available
-        if face_detector is not None:
-            faces = face_detector.detect(gpu_frame)
-            if faces[1] is not None:
-                facesCurFrame = [(int(face[1]), int(face[0] + face[2]), 
-                                int(face[1] + face[3]), int(face[0])) 
-                               for face in faces[1]]
-            else:
-                facesCurFrame = []
-        else:
-            facesCurFrame = face_recognition.face_locations(rgb_small, model="cnn")
-    else:
-        # CPU fallback
-        small_frame = cv2.resize(img, (0, 0), fx=0.25, fy=0.25)
-        rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-        facesCurFrame = face_recognition.face_locations(rgb_small, model="hog")
-    
-    # Check number of faces and show appropriate status message
-    if len(facesCurFrame) > 1:
-        cv2.putText(img, "Multiple faces detected!", 
-                (10, 30), cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 0, 255), 2)
-    elif len(facesCurFrame) == 0:
-        cv2.putText(img, "No face detected", (10, 30),
-                cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 255), 2)
-    # Only process and show frame when exactly one face is detected
-    elif len(facesCurFrame) == 1:
-        encodesCurFrame = face_recognition.face_encodings(rgb_small, facesCurFrame)
-        
-        # Process the single detected face
-        if len(encodesCurFrame) > 0:
-            encodeFace = encodesCurFrame[0]
-            faceLoc = facesCurFrame[0]
-            name = "Unknown"
-            
-            # Check for face match
-            if len(encodeListKnown) > 0:
-                faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-                matchIndex = np.argmin(faceDis)
-                if faceDis[matchIndex] < 0.4:  # strict threshold for better accuracy
-                    name = classNames[matchIndex]
-                    
-                    # Draw boxes and base name
-                    top, right, bottom, left = [coord * 4 for coord in faceLoc]
-                    cv2.rectangle(img, (left, top), (right, bottom), (0, 255, 0), 2)
-                    cv2.rectangle(img, (left, bottom - 35), (right, bottom), (0, 255, 0), cv2.FILLED)
-                    
-                    # Try to mark attendance and get status
-                    current_shift = attendance_tracker._get_current_shift()
-                    if current_shift:
-                        if attendance_tracker.can_mark_attendance(name):
-                            marked = markAttendance(name)
-                            if marked:
-                                status = f"✓ {current_shift.upper()} Shift"
-                            else:
-                                status = f"{current_shift.upper()} Shift - Already Marked"
-                        else:
-                            if name in attendance_tracker.marked_shifts and \
-                               current_shift in attendance_tracker.marked_shifts[name]:
-                                status = f"{current_shift.upper()} Shift - Already Marked"
-                            else:
-                                status = f"{current_shift.upper()} Shift"
-                    else:
-                        status = "Outside shift hours"
-                    
-                    # Display name on top line
-                    cv2.putText(img, name, (left + 6, bottom - 25),
-                            cv2.FONT_HERSHEY_COMPLEX, 1, (255, 255, 255), 2)
-                    # Display shift status on bottom line
-                    cv2.putText(img, status, (left + 6, bottom - 6),
-                            cv2.FONT_HERSHEY_COMPLEX, 0.6, (255, 255, 255), 1)
-
-    # Resize image to fit the screen while maintaining aspect ratio
-    h, w = img.shape[:2]
-    scale = min(window_width/w, window_height/h)
-    
-    # Resize image
-    img = cv2.resize(img, (int(w*scale), int(h*scale)))
-    
-    # Create a black canvas of screen size
-    canvas = np.zeros((window_height, window_width, 3), dtype=np.uint8)
-    
-    # Calculate position to center the image
-    y_offset = (window_height - int(h*scale)) // 2
-    x_offset = (window_width - int(w*scale)) // 2
-    
-    # Place the resized image in the center of the canvas
-    canvas[y_offset:y_offset+int(h*scale), x_offset:x_offset+int(w*scale)] = img
-    
-    # Draw registration button on the canvas
-    x, y, w, h = button_pos
-    cv2.rectangle(canvas, (x, y), (x + w, y + h), (0, 255, 0), cv2.FILLED)
-    # Calculate text size and position to center it in the button
-    thickness = 2 if platform.system() == 'Linux' else 3  # Thinner text on Jetson
-    text = "Register New"
-    (text_width, text_height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, button_font_scale, thickness)
-    text_x = x + (w - text_width) // 2
-    text_y = y + (h + text_height) // 2
-    cv2.putText(canvas, text, (text_x, text_y),
-                cv2.FONT_HERSHEY_SIMPLEX, button_font_scale, (255, 255, 255), thickness)
-    
-    # Display the result
-    cv2.imshow('Attendance System', canvas)
-    if cv2.waitKey(1) & 0xFF == 27:  # ESC to exit fullscreen
-        break
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+            registration_requested.set()
+
+def run_registration():
+    print("\nStarting registration process...")
+    # Use subprocess.run to wait for the process to complete; this process resumes afterwards
+    import subprocess
+    import sys
+    try:
+        subprocess.run([sys.executable, "initial_data_capture.py", "--no-run-main"], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error running registration: {e}")
+
+def open_display(cap):
+    """Set up the fullscreen window; returns (window_width, window_height, button_pos, button_font_scale)"""
+    # Create window first
+    cv2.namedWindow('Attendance System', cv2.WINDOW_NORMAL)
+
+    # Create a temporary window to get screen dimensions
+    cv2.namedWindow('temp', cv2.WINDOW_NORMAL)
+    cv2.setWindowProperty('temp', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+    screen_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    screen_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cv2.destroyWindow('temp')
+
+    # If we couldn't get proper dimensions, use default resolution
+    if screen_width <= 0 or screen_height <= 0:
+        screen_width = 1920
+        screen_height = 1080
+        print("Warning: Could not detect screen size, using default 1920x1080")
+
+    # Set window to fullscreen
+    cv2.namedWindow('Attendance System', cv2.WINDOW_NORMAL)
+    cv2.setWindowProperty('Attendance System', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+    # Calculate button position based on screen dimensions
+    window_width = screen_width
+    window_height = screen_height
+
+    # Detect platform and set button size accordingly
+    if platform.system() == 'Linux':  # Jetson Nano
+        button_width = 160  # Smaller width for Jetson
+        button_height = 50  # Smaller height for Jetson
+        padding = 20  # Less padding for Jetson
+        font_scale = 0.8  # Smaller text for Jetson
+    else:  # Windows or other platforms
+        button_width = 300  # Larger for desktop
+        button_height = 80  # Larger for desktop
+        padding = 50  # More padding for desktop
+        font_scale = 1.5  # Larger text for desktop
+
+    # Position the button in the bottom left corner
+    button_pos = (padding, window_height - button_height - padding, button_width, button_height)
+
+    # Set mouse callback
+    cv2.setMouseCallback('Attendance System', mouse_callback, button_pos)
+    return window_width, window_height, button_pos, font_scale
+
+def main():
+    prepare_attendance_file()
+    gallery = load_gallery('Attendance_data')
+    face_detector = create_gpu_detector()
+    # Start dlib worker processes before any camera or UI threads exist
+    engine = FaceEngine(processes=ENGINE_PROCESSES if face_detector is None else 0)
+
+    recognizer = FrameRecognizer(gallery.matcher, engine, face_detector)
+    # New or removed identities are swapped into the running recognizer
+    gallery.on_change(recognizer.set_matcher)
+    gallery.start()
+    workers = RecognitionWorkers(recognizer, workers=RECOGNITION_WORKERS)
+    # Heartbeats to the API's fleet registry from now on, not only after the first recognised face
+    attendance_tracker.sink.start()
+    render_stats = StageStats("render")
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+
+    while True:
+        # Camera capture
+        cap = cv2.VideoCapture(0)
+        window_width, window_height, button_pos, button_font_scale = open_display(cap)
+
+        # Capture thread -> recognition workers (bounded, newest frame wins) -> render (this thread)
+        grabber = FrameGrabber(cap)
+        grabber.start()
+        stages = [grabber.stats, workers.stats, render_stats]
+        last_report = time.monotonic()
+        exit_requested = False
+
+        frame_id = 0
+        while grabber.running and not registration_requested.is_set():
+            frame_id, frame = grabber.read(frame_id)
+            if frame is None:
+                continue
+
+            render_started = time.perf_counter()
+            # Hand the frame to recognition without waiting for it
+            workers.offer(frame_id, frame)
+
+            img = frame.copy()
+
+            # Draw registration button
+            x, y, w, h = button_pos
+            cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), cv2.FILLED)
+            cv2.putText(img, "Register New", (x + 5, y + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+            # Overlay the most recent recognition result
+            draw_results(img, workers.latest())
+            draw_stats(img, stages)
+
+            # Resize image to fit the screen while maintaining aspect ratio
+            h, w = img.shape[:2]
+            scale = min(window_width/w, window_height/h)
+
+            # Resize image
+            img = cv2.resize(img, (int(w*scale), int(h*scale)))
+
+            # Create a black canvas of screen size
+            canvas = np.zeros((window_height, window_width, 3), dtype=np.uint8)
+
+            # Calculate position to center the image
+            y_offset = (window_height - int(h*scale)) // 2
+            x_offset = (window_width - int(w*scale)) // 2
+
+            # Place the resized image in the center of the canvas
+            canvas[y_offset:y_offset+int(h*scale), x_offset:x_offset+int(w*scale)] = img
+
+            # Draw registration button on the canvas
+            x, y, w, h = button_pos
+            cv2.rectangle(canvas, (x, y), (x + w, y + h), (0, 255, 0), cv2.FILLED)
+            # Calculate text size and position to center it in the button
+            thickness = 2 if platform.system() == 'Linux' else 3  # Thinner text on Jetson
+            text = "Register New"
+            (text_width, text_height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, button_font_scale, thickness)
+            text_x = x + (w - text_width) // 2
+            text_y = y + (h + text_height) // 2
+            cv2.putText(canvas, text, (text_x, text_y),
+                        cv2.FONT_HERSHEY_SIMPLEX, button_font_scale, (255, 255, 255), thickness)
+
+            # Display the result
+            cv2.imshow('Attendance System', canvas)
+            render_time.observe(time.perf_counter() - render_started)
+            render_stats.tick()
+            if cv2.waitKey(1) & 0xFF == 27:  # ESC to exit fullscreen
+                exit_requested = True
+                break
+
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                print("Pipeline | " + " | ".join(s.summary() for s in stages) + " | " + recognizer.tracker.summary()
+                      + " | " + recognizer.motion_gate.summary()
+                      + " | " + recognizer.scheduler.summary())
+                last_report = time.monotonic()
+
+        # Release the camera; recognition workers, dlib processes and the gallery watcher keep running
+        grabber.stop()
+        cap.release()
+        cv2.destroyAllWindows()
+
+        if exit_requested or not registration_requested.is_set():
+            break
+        # The registration script needs the camera; its new identity is hot-loaded by the gallery watcher
+        run_registration()
+        registration_requested.clear()
+
+    gallery.stop()
+    workers.stop()
+    engine.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from .encoding_cache import CACHE_DIR, ENCODING_SIZE
+from .matcher import MATCH_THRESHOLD, GalleryMatcher, Match
+
+INDEX_PATH = CACHE_DIR / "ann_index.npz"
+
+# Below this many identities exact search is both faster and simpler
+ANN_MIN_IDENTITIES = 5000
+
+
+def _sq_distances(queries, vectors) -> np.ndarray:
+    """Squared euclidean distances between two row sets, shape (Q, N)"""
+    sq = (np.einsum("ij,ij->i", queries, queries)[:, None]
+          + np.einsum("ij,ij->i", vectors, vectors)[None, :]
+          - 2.0 * (queries @ vectors.T))
+    return np.maximum(sq, 0.0, out=sq)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd k-means with k-means++ seeding; returns (k, dim) float32 centroids"""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    k = min(k, n)
+
+    # k-means++ seeding on a subsample keeps initialisation cheap
+    seed_pool = vectors[rng.choice(n, size=min(n, 20 * k), replace=False)]
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = seed_pool[rng.integers(len(seed_pool))]
+    closest = _sq_distances(seed_pool, centroids[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centroids[i:] = seed_pool[rng.choice(len(seed_pool), size=k - i)]
+            break
+        centroids[i] = seed_pool[rng.choice(len(seed_pool), p=closest / total)]
+        np.minimum(closest, _sq_distances(seed_pool, centroids[i:i + 1])[:, 0], out=closest)
+
+    for _ in range(iterations):
+        assign = _sq_distances(vectors, centroids).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points so no list stays unused
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(n, size=len(empty), replace=False)]
+    return centroids
+
+
+def _digest(vectors: np.ndarray) -> str:
+    """Checksum of one identity's encodings, independent of their order"""
+    rows = np.ascontiguousarray(vectors, dtype=np.float32)
+    return hashlib.sha1(b"".join(sorted(row.tobytes() for row in rows))).hexdigest()
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over 128-d face encodings, labelled by identity.
+
+    Vectors are bucketed by their nearest k-means centroid; a query only scans
+    the `nprobe` closest buckets. Identities can be added and removed without
+    retraining. It exposes the same match/identify API as GalleryMatcher so
+    callers can swap one for the other.
+    """
+
+    def __init__(self, nlist: int = 256, nprobe: int = 16):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self._list_vectors: List[np.ndarray] = []
+        self._list_labels: List[np.ndarray] = []
+        self._names: List[Optional[str]] = []
+        self._label_of: Dict[str, int] = {}
+        self._digest_of: Dict[str, str] = {}
+        self._lists_of: Dict[int, Set[int]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._label_of)
+
+    @property
+    def size(self) -> int:
+        return sum(len(v) for v in self._list_vectors)
+
+    @property
+    def identities(self) -> List[str]:
+        return sorted(self._label_of)
+
+    def train(self, vectors, iterations: int = 10, seed: int = 0):
+        """Fit the coarse quantizer and re-bucket any vectors already stored"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = max(1, min(self.nlist, len(vectors)))
+        # k-means on a sample; ~32 points per centroid is plenty for a coarse quantizer
+        rng = np.random.default_rng(seed)
+        if len(vectors) > 32 * nlist:
+            vectors = vectors[rng.choice(len(vectors), size=32 * nlist, replace=False)]
+        with self._lock:
+            existing = self._all_entries()
+            self.centroids = kmeans(vectors, nlist, iterations, seed)
+            self.nlist = len(self.centroids)
+            self._list_vectors = [np.zeros((0, ENCODING_SIZE), dtype=np.float32) for _ in range(self.nlist)]
+            self._list_labels = [np.zeros(0, dtype=np.int32) for _ in range(self.nlist)]
+            self._lists_of = {}
+            if existing is not None:
+                self._insert(*existing)
+
+    def _all_entries(self):
+        if not self._list_vectors:
+            return None
+        vectors = np.concatenate(self._list_vectors)
+        labels = np.concatenate(self._list_labels)
+        return (vectors, labels) if len(labels) else None
+
+    def _insert(self, vectors: np.ndarray, labels: np.ndarray):
+        assign = _sq_distances(vectors, self.centroids).argmin(axis=1)
+        for list_id in np.unique(assign):
+            rows = assign == list_id
+            self._list_vectors[list_id] = np.concatenate((self._list_vectors[list_id], vectors[rows]))
+            self._list_labels[list_id] = np.concatenate((self._list_labels[list_id], labels[rows]))
+            for label in np.unique(labels[rows]):
+                self._lists_of.setdefault(int(label), set()).add(int(list_id))
+
+    def add(self, name: str, encodings: Sequence[np.ndarray]):
+        """Add (or replace) all pose encodings of one identity"""
+        if self.centroids is None:
+            raise RuntimeError("IVFIndex must be trained before adding vectors")
+        vectors = np.atleast_2d(np.asarray(encodings, dtype=np.float32))
+        with self._lock:
+            label = self._label_of.get(name)
+            self.remove(name)
+            if len(vectors) == 0:
+                return
+            if label is None:
+                label = len(self._names)
+                self._names.append(name)
+            else:
+                # Re-registration: reuse the identity's label instead of growing the name table
+                self._names[label] = name
+            self._label_of[name] = label
+            self._digest_of[name] = _digest(vectors)
+            self._insert(vectors, np.full(len(vectors), label, dtype=np.int32))
+
+    def remove(self, name: str) -> bool:
+        """Drop every vector of an identity; returns False if it was not indexed"""
+        with self._lock:
+            label = self._label_of.pop(name, None)
+            if label is None:
+                return False
+            self._digest_of.pop(name, None)
+            for list_id in self._lists_of.pop(label, ()):
+                keep = self._list_labels[list_id] != label
+                self._list_vectors[list_id] = self._list_vectors[list_id][keep]
+                self._list_labels[list_id] = self._list_labels[list_id][keep]
+            self._names[label] = None
+            return True
+
+    def sync(self, encodings: Sequence[np.ndarray], names: Sequence[str]) -> bool:
+        """
+        Bring the index in line with a freshly loaded gallery by adding and
+        removing whole identities. An identity is re-indexed when its
+        encodings differ from the indexed ones (compared by checksum, so a
+        re-registration with the same number of poses is caught too).
+        Returns True if anything changed.
+        """
+        grouped: Dict[str, List[np.ndarray]] = {}
+        for encoding, name in zip(encodings, names):
+            grouped.setdefault(name, []).append(encoding)
+        changed = False
+        with self._lock:
+            for name in set(self._label_of) - set(grouped):
+                changed |= self.remove(name)
+            for name, rows in grouped.items():
+                if self._digest_of.get(name) != _digest(np.asarray(rows, dtype=np.float32)):
+                    self.add(name, rows)
+                    changed = True
+        return changed
+
+    def search_batch(self, queries, k: int = 1, nprobe: Optional[int] = None) -> List[List[Match]]:
+        """Approximate top-k identities (min over poses) for every query"""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        results = []
+        with self._lock:
+            if self.centroids is None or not self._label_of:
+                return [[] for _ in range(len(q))]
+            coarse = _sq_distances(q, self.centroids)
+            if nprobe < self.nlist:
+                probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+            else:
+                probes = np.tile(np.arange(self.nlist), (len(q), 1))
+
+            for query, probe in zip(q, probes):
+                vectors = np.concatenate([self._list_vectors[i] for i in probe])
+                labels = np.concatenate([self._list_labels[i] for i in probe])
+                if len(labels) == 0:
+                    results.append([])
+                    continue
+                dist = np.sqrt(_sq_distances(query[None, :], vectors)[0])
+                # Min distance per identity: sort by distance, keep first row of each label
+                order = np.argsort(dist, kind="stable")
+                _, first = np.unique(labels[order], return_index=True)
+                best_rows = order[first]
+                best_rows = best_rows[np.argsort(dist[best_rows])][:k + 1]
+                ranked = [(self._names[labels[r]], float(dist[r])) for r in best_rows]
+                runner_up = ranked[1][1] if len(ranked) > 1 else float("inf")
+                results.append([
+                    Match(name, d, (runner_up if rank == 0 else ranked[0][1]) - d)
+                    for rank, (name, d) in enumerate(ranked[:k])
+                ])
+        return results
+
+    # GalleryMatcher-compatible API
+    def match_batch(self, queries, k: int = 1, aggregate: Optional[str] = None) -> List[List[Match]]:
+        return self.search_batch(queries, k)
+
+    def match(self, query, k: int = 1, aggregate: Optional[str] = None) -> List[Match]:
+        return self.search_batch(query, k)[0]
+
+    def identify(self, query, threshold: float = MATCH_THRESHOLD) -> Optional[Match]:
+        matches = self.match(query)
+        if matches and matches[0].distance < threshold:
+            return matches[0]
+        return None
+
+    def identify_batch(self, queries, threshold: float = MATCH_THRESHOLD) -> List[Optional[Match]]:
+        return [m[0] if m and m[0].distance < threshold else None for m in self.search_batch(queries)]
+
+    def save(self, path=INDEX_PATH):
+        """Atomically persist centroids, vectors and identity labels"""
+        path = Path(path)
+        with self._lock:
+            if self.centroids is None:
+                raise RuntimeError("Cannot save an untrained IVFIndex")
+            labels = self._list_labels
+            list_ids = np.concatenate([np.full(len(l), i, dtype=np.int32) for i, l in enumerate(labels)])
+            names = np.array([self._names[l] for l in np.concatenate(labels)], dtype=str)
+            payload = dict(
+                centroids=self.centroids,
+                vectors=np.concatenate(self._list_vectors),
+                list_ids=list_ids,
+                names=names,
+                nprobe=np.int32(self.nprobe),
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, **payload)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH) -> "IVFIndex":
+        with np.load(Path(path)) as data:
+            centroids = data["centroids"].astype(np.float32)
+            vectors = data["vectors"].astype(np.float32)
+            list_ids = data["list_ids"]
+            names = [str(n) for n in data["names"]]
+            nprobe = int(data["nprobe"])
+        index = cls(nlist=len(centroids), nprobe=nprobe)
+        index.centroids = centroids
+        for name in dict.fromkeys(names):
+            index._label_of[name] = len(index._names)
+            index._names.append(name)
+        labels = np.array([index._label_of[n] for n in names], dtype=np.int32)
+
+        # Split rows into their lists with one sort instead of a mask per list
+        order = np.argsort(list_ids, kind="stable")
+        bounds = np.searchsorted(list_ids[order], np.arange(index.nlist + 1))
+        for i in range(index.nlist):
+            rows = order[bounds[i]:bounds[i + 1]]
+            index._list_vectors.append(vectors[rows])
+            index._list_labels.append(labels[rows])
+            for label in np.unique(labels[rows]):
+                index._lists_of.setdefault(int(label), set()).add(i)
+
+        # Checksums are not stored; recompute them from each identity's vectors
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(index._names) + 1))
+        for label, name in enumerate(index._names):
+            index._digest_of[name] = _digest(vectors[order[bounds[label]:bounds[label + 1]]])
+        return index
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Roughly 4 * sqrt(N) buckets, the usual IVF rule of thumb"""
+    return int(max(1, min(4096, 4 * np.sqrt(max(n_vectors, 1)))))
+
+
+def build_index(encodings: Sequence[np.ndarray], names: Sequence[str], nprobe: int = 16) -> IVFIndex:
+    vectors = np.asarray(encodings, dtype=np.float32)
+    index = IVFIndex(nlist=default_nlist(len(vectors)), nprobe=nprobe)
+    index.train(vectors)
+    index.sync(encodings, names)
+    return index
+
+
+def build_matcher(encodings: Sequence[np.ndarray], names: Sequence[str], index_path=INDEX_PATH):
+    """
+    Exact GalleryMatcher for normal galleries. Once the gallery reaches
+    ANN_MIN_IDENTITIES people, load (or build) the persisted IVF index instead
+    and sync it with the current gallery.
+    """
+    if len(set(names)) < ANN_MIN_IDENTITIES:
+        return GalleryMatcher(encodings, names)
+
+    index_path = Path(index_path)
+    index = None
+    if index_path.exists():
+        try:
+            index = IVFIndex.load(index_path)
+        except Exception as e:
+            print(f"Warning: rebuilding unreadable ANN index {index_path}: {e}")
+    if index is None:
+        index = build_index(encodings, names)
+        index.save(index_path)
+    elif index.sync(encodings, names):
+        index.save(index_path)
+    print(f"Using ANN index: {len(index)} identities in {index.nlist} lists")
+    return index
+
+
+def add_identity_to_index(name: str, encodings: Sequence[np.ndarray], index_path=INDEX_PATH) -> bool:
+    """Insert a newly registered identity into the persisted index, if one exists"""
+    index_path = Path(index_path)
+    if not index_path.exists() or len(encodings) == 0:
+        return False
+    index = IVFIndex.load(index_path)
+    index.add(name, encodings)
+    index.save(index_path)
+    return True
+
+
+def remove_identity_from_index(name: str, index_path=INDEX_PATH) -> bool:
+    """Remove a deleted identity from the persisted index, if one exists"""
+    index_path = Path(index_path)
+    if not index_path.exists():
+        return False
+    index = IVFIndex.load(index_path)
+    if not index.remove(name):
+        return False
+    index.save(index_path)
+    return True
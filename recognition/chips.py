@@ -0,0 +1,61 @@
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .tracker import Box
+
+# Every face is encoded from a CHIP_SIZE x CHIP_SIZE crop of the original frame,
+# with the detected box padded by CHIP_PADDING of its side on each edge so the
+# landmark model sees the chin and brows. dlib then aligns inside the chip.
+CHIP_SIZE = 200
+CHIP_PADDING = 0.3
+MAX_CHIPS = 8
+
+
+def chip_box(size: int = CHIP_SIZE, padding: float = CHIP_PADDING) -> Box:
+    """Where the face box lands inside every chip, as (top, right, bottom, left)"""
+    margin = int(round(size * padding / (1.0 + 2.0 * padding)))
+    return (margin, size - margin, size - margin, margin)
+
+
+class ChipExtractor:
+    """
+    Cuts square, scale-normalised face chips out of full-resolution BGR frames.
+
+    Chips are written with a single warpAffine per face into a preallocated
+    (capacity, size, size, 3) RGB buffer, so the cost per face is fixed no
+    matter what resolution the camera runs at, and nothing is allocated per frame.
+    Parts of the chip outside the frame are filled with black.
+    """
+
+    def __init__(self, size: int = CHIP_SIZE, padding: float = CHIP_PADDING, capacity: int = MAX_CHIPS):
+        self.size = size
+        self.padding = padding
+        self.capacity = capacity
+        self.box = chip_box(size, padding)
+        self._bgr = np.zeros((size, size, 3), dtype=np.uint8)
+        self._chips = np.zeros((capacity, size, size, 3), dtype=np.uint8)
+
+    def _transform(self, box: Box) -> np.ndarray:
+        top, right, bottom, left = box
+        side = max(bottom - top, right - left, 1) * (1.0 + 2.0 * self.padding)
+        scale = self.size / side
+        cx, cy = (left + right) / 2.0, (top + bottom) / 2.0
+        return np.array([[scale, 0.0, self.size / 2.0 - scale * cx],
+                         [0.0, scale, self.size / 2.0 - scale * cy]], dtype=np.float64)
+
+    def extract(self, img, boxes: Sequence[Box]) -> Tuple[np.ndarray, Box]:
+        """
+        Chips for up to `capacity` boxes of a BGR frame.
+        Returns (chips, chip_box): an (n, size, size, 3) RGB view into the
+        shared buffer - valid until the next call - and the face box inside each chip.
+        Not thread-safe: use one extractor per thread, or serialise the calls.
+        """
+        boxes = list(boxes)[:self.capacity]
+        for i, box in enumerate(boxes):
+            cv2.warpAffine(img, self._transform(box), (self.size, self.size), dst=self._bgr,
+                           flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+            cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB, dst=self._chips[i])
+        return self._chips[:len(boxes)], self.box
+
@@ -0,0 +1,136 @@
+"""
+Detection resolution policy shared by the kiosk, registration and dashboard.
+
+HOG with one upsample reliably finds faces down to roughly 40 px, so the
+downscale factor is derived from the frame width (coarse scans) or from the
+observed face size (track ROIs) instead of a fixed 0.25.
+"""
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+
+from .tracker import Box, box_iou
+
+# Width the full frame is scaled to for a coarse scan (0.25 at 1080p, 0.75 at 480p)
+SCAN_WIDTH = 480
+# Smallest face HOG (upsample=1) detects reliably, and the face size ROIs are scaled to
+MIN_FACE_PX = 40
+TARGET_FACE_PX = 80
+MIN_SCALE = 0.15
+MAX_SCALE = 1.0
+
+
+def detection_scale(frame_shape, scan_width: int = SCAN_WIDTH, min_face: Optional[int] = None) -> float:
+    """
+    Downscale factor for a full-frame detection pass. When the smallest
+    face seen so far is known (`min_face`, full-frame pixels) the scale is
+    raised so that face still comes out at MIN_FACE_PX.
+    """
+    width = frame_shape[1]
+    scale = scan_width / float(width)
+    if min_face:
+        scale = max(scale, MIN_FACE_PX / float(min_face))
+    return min(MAX_SCALE, max(MIN_SCALE, scale))
+
+
+def scale_box(box, scale: float, offset: Tuple[int, int] = (0, 0)) -> Box:
+    """Map a (top, right, bottom, left) box found at `scale` inside a crop at `offset` (x, y) to the full frame"""
+    top, right, bottom, left = box
+    x0, y0 = offset
+    return (int(round(top / scale)) + y0, int(round(right / scale)) + x0,
+            int(round(bottom / scale)) + y0, int(round(left / scale)) + x0)
+
+
+class Region(NamedTuple):
+    """A crop (x0, y0, x1, y1) of the full frame and the scale it is detected at"""
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    scale: float
+
+
+class DetectionScheduler:
+    """
+    Decides where and at what resolution to look for faces on each frame.
+
+    While faces are tracked, only a padded ROI around each track is searched,
+    scaled so the face lands near TARGET_FACE_PX. Every `full_scan_every`
+    detection frames (and whenever nothing is tracked) the whole frame is
+    scanned coarsely, at a scale that still resolves the smallest face seen.
+    """
+
+    def __init__(self, scan_width: int = SCAN_WIDTH, full_scan_every: int = 10,
+                 roi_padding: float = 0.6, dedupe_iou: float = 0.4):
+        self.scan_width = scan_width
+        self.full_scan_every = full_scan_every
+        self.roi_padding = roi_padding
+        self.dedupe_iou = dedupe_iou
+        self.min_face: Optional[float] = None
+        self._since_full = 0
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.pixels = 0
+
+    def plan(self, frame_shape, track_boxes: Sequence[Box]) -> List[Region]:
+        height, width = frame_shape[:2]
+        self._since_full += 1
+        if not track_boxes or self._since_full >= self.full_scan_every:
+            self._since_full = 0
+            scale = detection_scale(frame_shape, self.scan_width, self.min_face)
+            return [Region(0, 0, width, height, scale)]
+
+        rois = []
+        for top, right, bottom, left in track_boxes:
+            size = max(bottom - top, right - left, 1)
+            pad = int(size * self.roi_padding)
+            rois.append([max(0, left - pad), max(0, top - pad),
+                         min(width, right + pad), min(height, bottom + pad), size])
+
+        # Merge overlapping ROIs so no pixel is searched twice
+        merged = []
+        for roi in sorted(rois):
+            if merged and roi[0] < merged[-1][2] and roi[1] < merged[-1][3] and roi[3] > merged[-1][1]:
+                last = merged[-1]
+                merged[-1] = [min(last[0], roi[0]), min(last[1], roi[1]),
+                              max(last[2], roi[2]), max(last[3], roi[3]), min(last[4], roi[4])]
+            else:
+                merged.append(roi)
+
+        return [Region(x0, y0, x1, y1, min(MAX_SCALE, max(MIN_SCALE, TARGET_FACE_PX / float(size))))
+                for x0, y0, x1, y1, size in merged]
+
+    def detect(self, img, track_boxes: Sequence[Box],
+               detect_fn: Callable[..., Sequence[Box]]) -> List[Box]:
+        """
+        Run `detect_fn(rgb)` on every planned region of the BGR frame and
+        return face boxes in full-frame (top, right, bottom, left) coordinates.
+        """
+        boxes: List[Box] = []
+        for region in self.plan(img.shape, track_boxes):
+            if region.x1 - region.x0 == img.shape[1] and region.y1 - region.y0 == img.shape[0]:
+                self.full_scans += 1
+            else:
+                self.roi_scans += 1
+            crop = img[region.y0:region.y1, region.x0:region.x1]
+            if crop.size == 0:
+                continue
+            if region.scale != 1.0:
+                crop = cv2.resize(crop, (0, 0), fx=region.scale, fy=region.scale,
+                                  interpolation=cv2.INTER_AREA)
+            self.pixels += crop.shape[0] * crop.shape[1]
+            rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+            for box in detect_fn(rgb):
+                box = scale_box(box, region.scale, (region.x0, region.y0))
+                if all(box_iou(box, other) < self.dedupe_iou for other in boxes):
+                    boxes.append(box)
+
+        sizes = [max(b[2] - b[0], b[1] - b[3]) for b in boxes]
+        if sizes:
+            # Remember the smallest face seen (slowly forgetting) for the coarse scan scale
+            smallest = float(min(sizes))
+            self.min_face = smallest if self.min_face is None else min(smallest, 0.9 * self.min_face + 0.1 * smallest)
+        return boxes
+
+    def summary(self) -> str:
+        return f"detection: {self.full_scans} full scans, {self.roi_scans} ROI scans"
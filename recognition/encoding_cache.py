@@ -0,0 +1,226 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from .chips import CHIP_SIZE, ChipExtractor
+from .detection import detection_scale, scale_box
+
+# Project root (one level up from the recognition package)
+ROOT_DIR = Path(__file__).parent.parent
+DATA_DIR = ROOT_DIR / "Attendance_data"
+CACHE_DIR = ROOT_DIR / ".face_cache"
+
+POSES = ("center", "left", "right")
+ENCODING_SIZE = 128
+
+# Gallery images are encoded from a full-resolution face chip with the 68-point
+# landmark model, exactly like the kiosk probes. Both settings are part of the
+# cache key, so changing them re-encodes everything.
+LANDMARK_MODEL = "large"
+ENCODER_MODEL = f"dlib_resnet_v1-{LANDMARK_MODEL}-chip{CHIP_SIZE}"
+
+
+def encode_face_image(image):
+    """
+    Compute the 128-d encoding of the first face found in a BGR image.
+    Returns None when no face is detected.
+    """
+    import face_recognition
+
+    # Detect on a downscaled copy, encode from the full-resolution chip
+    scale = detection_scale(image.shape)
+    small_frame = cv2.resize(image, (0, 0), fx=scale, fy=scale)
+    rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    face_locations = face_recognition.face_locations(rgb_small)
+    if len(face_locations) == 0:
+        return None
+    chips, box = ChipExtractor(capacity=1).extract(image, [scale_box(face_locations[0], scale)])
+    return face_recognition.face_encodings(chips[0], [box], model=LANDMARK_MODEL)[0]
+
+
+def iter_gallery_images(data_dir=DATA_DIR, poses=POSES) -> Iterator[Tuple[str, str, Path]]:
+    """Yield (name, pose, path) for every pose image in the per-person folders"""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return
+    for person_dir in sorted(data_dir.iterdir()):
+        if not person_dir.is_dir() or person_dir.name.startswith(('.', '__')):
+            continue
+        for pose in poses:
+            pose_path = person_dir / f"{pose}.png"
+            if pose_path.exists():
+                yield person_dir.name, pose, pose_path
+
+
+class EncodingCache:
+    """
+    On-disk cache of face encodings keyed by (image hash, pose, encoder model).
+
+    Images whose bytes did not change are never decoded or re-encoded, so a
+    restart only pays dlib for new or modified pose images. Images without a
+    detectable face are cached as misses too.
+    """
+
+    def __init__(self, cache_path=None, model=ENCODER_MODEL):
+        self.cache_path = Path(cache_path) if cache_path else CACHE_DIR / "encodings.npz"
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Optional[np.ndarray]] = {}
+        self._dirty = False
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def make_key(self, digest: str, pose: str) -> str:
+        return f"{self.model}:{pose}:{digest}"
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            self._mtime_ns = self.cache_path.stat().st_mtime_ns
+            with np.load(self.cache_path) as data:
+                keys = data["keys"]
+                vectors = data["vectors"]
+                found = data["found"]
+            for key, vector, ok in zip(keys, vectors, found):
+                self._entries[str(key)] = vector.copy() if ok else None
+        except Exception as e:
+            print(f"Warning: ignoring unreadable encoding cache {self.cache_path}: {e}")
+            self._entries = {}
+
+    def refresh(self):
+        """Merge in entries another process saved since this cache was loaded"""
+        try:
+            mtime_ns = self.cache_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        try:
+            with np.load(self.cache_path) as data:
+                keys, vectors, found = data["keys"], data["vectors"], data["found"]
+        except Exception as e:
+            print(f"Warning: could not refresh encoding cache {self.cache_path}: {e}")
+            return
+        with self._lock:
+            for key, vector, ok in zip(keys, vectors, found):
+                self._entries.setdefault(str(key), vector.copy() if ok else None)
+            self._mtime_ns = mtime_ns
+
+    def get_or_encode(self, image_path, pose: str) -> Optional[np.ndarray]:
+        """Return the encoding for an image file, encoding it only on a cache miss"""
+        _, encoding = self.lookup_bytes(Path(image_path).read_bytes(), pose)
+        return encoding
+
+    def lookup_bytes(self, data: bytes, pose: str) -> Tuple[str, Optional[np.ndarray]]:
+        """Return (cache key, encoding) for raw image file bytes"""
+        key = self.make_key(hashlib.sha1(data).hexdigest(), pose)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return key, self._entries[key]
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            # Probably a half-written file; do not remember the failure
+            return key, None
+        encoding = encode_face_image(image)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = encoding
+            self._dirty = True
+        return key, encoding
+
+    def save(self, keep: Optional[Set[str]] = None):
+        """
+        Atomically write the cache to disk. When `keep` is given, entries for the
+        current model that are not in it are dropped so the file does not grow
+        with images that no longer exist.
+        """
+        with self._lock:
+            if keep is not None:
+                prefix = f"{self.model}:"
+                stale = [k for k in self._entries if k.startswith(prefix) and k not in keep]
+                for key in stale:
+                    del self._entries[key]
+                self._dirty = self._dirty or bool(stale)
+            if not self._dirty:
+                return
+            keys = list(self._entries)
+            vectors = np.zeros((len(keys), ENCODING_SIZE), dtype=np.float64)
+            found = np.zeros(len(keys), dtype=bool)
+            for i, key in enumerate(keys):
+                vector = self._entries[key]
+                if vector is not None:
+                    vectors[i] = vector
+                    found[i] = True
+            self._dirty = False
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.stem + ".tmp.npz")
+        try:
+            np.savez(tmp_path, keys=np.array(keys, dtype=str), vectors=vectors, found=found)
+            os.replace(tmp_path, self.cache_path)
+            self._mtime_ns = self.cache_path.stat().st_mtime_ns
+        except Exception as e:
+            print(f"Warning: could not write encoding cache {self.cache_path}: {e}")
+
+
+def load_known_faces(data_dir=DATA_DIR, cache: Optional[EncodingCache] = None,
+                     poses=POSES) -> Tuple[List[np.ndarray], List[str]]:
+    """
+    Load encodings for every pose image in the gallery.
+
+    Returns (encodings, names) where names[i] is the person for encodings[i].
+    Both lists are built together, so a pose without a detectable face just
+    drops that one row instead of shifting the remaining names.
+    """
+    if cache is None:
+        cache = EncodingCache()
+
+    encodings = []
+    names = []
+    used_keys = set()
+    for name, pose, pose_path in iter_gallery_images(data_dir, poses):
+        try:
+            data = pose_path.read_bytes()
+        except OSError as e:
+            print(f"Warning: could not read {pose_path}: {e}")
+            continue
+        key, encoding = cache.lookup_bytes(data, pose)
+        used_keys.add(key)
+        if encoding is None:
+            print(f"Warning: No face detected in {pose} image for {name}")
+            continue
+        encodings.append(encoding)
+        names.append(name)
+
+    cache.save(keep=used_keys)
+    print(f"Encoding cache: {cache.hits} reused, {cache.misses} newly encoded")
+    return encodings, names
+
+
+def encode_identity(name: str, data_dir=DATA_DIR, cache: Optional[EncodingCache] = None,
+                    poses=POSES) -> List[np.ndarray]:
+    """Encodings for one person's pose images (through the cache), e.g. right after registration"""
+    if cache is None:
+        cache = EncodingCache()
+    encodings = []
+    person_dir = Path(data_dir) / name
+    for pose in poses:
+        pose_path = person_dir / f"{pose}.png"
+        if not pose_path.exists():
+            continue
+        encoding = cache.get_or_encode(pose_path, pose)
+        if encoding is not None:
+            encodings.append(encoding)
+    cache.save()
+    return encodings
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .ann_index import IVFIndex, build_matcher
+from .encoding_cache import DATA_DIR, POSES, EncodingCache, load_known_faces
+from .matcher import GalleryMatcher
+
+# (pose, mtime_ns, size) for every pose image of one identity
+Signature = Tuple[Tuple[str, int, int], ...]
+
+POLL_INTERVAL = 0.5  # seconds between gallery folder scans
+SETTLE_TIME = 0.3  # seconds a folder must be unchanged before it is (re)encoded
+
+
+def scan_gallery(data_dir=DATA_DIR, poses=POSES) -> Dict[str, Tuple[Signature, float]]:
+    """{name: (signature, newest mtime)} from stat calls only - no image is read"""
+    result = {}
+    try:
+        entries = list(os.scandir(data_dir))
+    except FileNotFoundError:
+        return result
+    for entry in entries:
+        if not entry.is_dir() or entry.name.startswith(('.', '__')):
+            continue
+        signature = []
+        newest = 0.0
+        for pose in poses:
+            try:
+                stat = os.stat(os.path.join(entry.path, f"{pose}.png"))
+            except FileNotFoundError:
+                continue
+            signature.append((pose, stat.st_mtime_ns, stat.st_size))
+            newest = max(newest, stat.st_mtime)
+        if signature:
+            result[entry.name] = (tuple(signature), newest)
+    return result
+
+
+class LiveGallery:
+    """
+    The gallery as seen by a running recognizer, kept in sync with the
+    per-person folders without a restart.
+
+    A background thread stats the folders every `interval` seconds. Only an
+    identity whose pose files were added, changed or removed is re-encoded
+    (through the shared EncodingCache), and a new matcher is then swapped in
+    with a single attribute assignment, so recognition never stops. For an
+    IVF index the identity is added/removed in place instead.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, cache: Optional[EncodingCache] = None, poses=POSES,
+                 interval: float = POLL_INTERVAL, settle: float = SETTLE_TIME):
+        self.data_dir = Path(data_dir)
+        self.cache = cache if cache is not None else EncodingCache()
+        self.poses = poses
+        self.interval = interval
+        self.settle = settle
+        self.matcher = None
+        self._encodings: Dict[str, List[np.ndarray]] = {}
+        self._signatures: Dict[str, Signature] = {}
+        self._listeners: List[Callable[[object, Set[str]], None]] = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Full load at startup; returns the matcher"""
+        # Signatures first: anything modified while loading is picked up by the next poll
+        snapshot = scan_gallery(self.data_dir, self.poses)
+        encodings, names = load_known_faces(self.data_dir, self.cache, self.poses)
+        self._encodings = {}
+        for encoding, name in zip(encodings, names):
+            self._encodings.setdefault(name, []).append(encoding)
+        self._signatures = {name: signature for name, (signature, _) in snapshot.items()}
+        self.matcher = build_matcher(encodings, names)
+        return self.matcher
+
+    def on_change(self, listener: Callable[[object, Set[str]], None]):
+        """Call `listener(matcher, changed_names)` after every swap"""
+        self._listeners.append(listener)
+
+    def poll(self) -> Set[str]:
+        """Scan once and apply changes; returns the identities that changed"""
+        snapshot = scan_gallery(self.data_dir, self.poses)
+        now = time.time()
+        removed = set(self._signatures) - set(snapshot)
+        changed = {name for name, (signature, newest) in snapshot.items()
+                   if self._signatures.get(name) != signature and now - newest >= self.settle}
+        if not removed and not changed:
+            return set()
+
+        # Another process (e.g. the registration script) may have encoded them already
+        self.cache.refresh()
+        updates = {}
+        for name in changed:
+            encodings = []
+            for pose, _, _ in snapshot[name][0]:
+                encoding = self.cache.get_or_encode(self.data_dir / name / f"{pose}.png", pose)
+                if encoding is not None:
+                    encodings.append(encoding)
+            updates[name] = encodings
+            self._signatures[name] = snapshot[name][0]
+        for name in removed:
+            del self._signatures[name]
+        self.cache.save()
+
+        self._apply(updates, removed)
+        names = changed | removed
+        for name in sorted(changed):
+            print(f"Gallery: reloaded {name} ({len(updates[name])} poses with a face)")
+        for name in sorted(removed):
+            print(f"Gallery: removed {name}")
+        for listener in self._listeners:
+            listener(self.matcher, names)
+        return names
+
+    def _apply(self, updates: Dict[str, List[np.ndarray]], removed: Set[str]):
+        for name, encodings in updates.items():
+            if encodings:
+                self._encodings[name] = encodings
+            else:
+                self._encodings.pop(name, None)
+        for name in removed:
+            self._encodings.pop(name, None)
+
+        if isinstance(self.matcher, IVFIndex):
+            # The index is thread-safe and updated in place
+            for name in set(updates) | removed:
+                self.matcher.remove(name)
+                if self._encodings.get(name):
+                    self.matcher.add(name, self._encodings[name])
+            return
+
+        encodings, names = [], []
+        for name, person_encodings in self._encodings.items():
+            encodings.extend(person_encodings)
+            names.extend([name] * len(person_encodings))
+        # Readers keep using the old matcher until this assignment
+        self.matcher = GalleryMatcher(encodings, names)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="gallery-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Gallery reload error: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
@@ -0,0 +1,124 @@
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Same strict threshold main.py has always used for a positive identification
+MATCH_THRESHOLD = 0.4
+AGGREGATES = ("min", "mean")
+
+
+class Match(NamedTuple):
+    name: str
+    distance: float
+    # Distance to the closest *other* identity minus this distance.
+    # Positive only for the best match; larger means less ambiguous.
+    margin: float
+
+
+class GalleryMatcher:
+    """
+    Vectorized face matcher over a gallery with several pose encodings per person.
+
+    Encodings are kept in one contiguous float32 matrix, sorted so that every
+    identity's rows are adjacent. A query (or a batch of queries) costs one
+    matrix product plus a segmented min/mean over each identity's poses.
+    """
+
+    def __init__(self, encodings: Sequence[np.ndarray], names: Sequence[str], aggregate: str = "min"):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}, got {aggregate!r}")
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        self.aggregate = aggregate
+
+        self.identities: List[str] = sorted(set(names))
+        lookup = {name: i for i, name in enumerate(self.identities)}
+        identity_index = np.array([lookup[name] for name in names], dtype=np.int32)
+        order = np.argsort(identity_index, kind="stable")
+
+        if len(encodings) > 0:
+            matrix = np.asarray(encodings, dtype=np.float32)[order]
+        else:
+            matrix = np.zeros((0, 128), dtype=np.float32)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.identity_index = identity_index[order]
+        self._sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+        # Start row and pose count of each identity's contiguous block
+        if len(self.identity_index) > 0:
+            boundaries = np.flatnonzero(np.diff(self.identity_index)) + 1
+            self._starts = np.concatenate(([0], boundaries))
+        else:
+            self._starts = np.zeros(0, dtype=np.int64)
+        self._counts = np.diff(np.append(self._starts, len(self.identity_index)))
+
+    def __len__(self):
+        return len(self.identities)
+
+    @property
+    def size(self) -> int:
+        """Number of stored pose encodings"""
+        return self.matrix.shape[0]
+
+    def distances(self, queries) -> np.ndarray:
+        """Euclidean distance from each query to every stored encoding, shape (Q, N)"""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        sq = np.einsum("ij,ij->i", q, q)[:, None] + self._sq_norms[None, :] - 2.0 * (q @ self.matrix.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def identity_distances(self, queries, aggregate: Optional[str] = None) -> np.ndarray:
+        """Per-identity distance (min or mean over that person's poses), shape (Q, P)"""
+        aggregate = aggregate or self.aggregate
+        dist = self.distances(queries)
+        if aggregate == "min":
+            return np.minimum.reduceat(dist, self._starts, axis=1)
+        if aggregate == "mean":
+            return np.add.reduceat(dist, self._starts, axis=1) / self._counts
+        raise ValueError(f"aggregate must be one of {AGGREGATES}, got {aggregate!r}")
+
+    def match_batch(self, queries, k: int = 1, aggregate: Optional[str] = None) -> List[List[Match]]:
+        """Top-k identities for every query, best first"""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self.identities) == 0 or q.shape[0] == 0:
+            return [[] for _ in range(q.shape[0])]
+
+        per_identity = self.identity_distances(q, aggregate)
+        n_identities = per_identity.shape[1]
+        # One extra candidate is needed for the runner-up margin
+        take = min(k + 1, n_identities)
+        if take < n_identities:
+            top = np.argpartition(per_identity, take - 1, axis=1)[:, :take]
+        else:
+            top = np.tile(np.arange(n_identities), (q.shape[0], 1))
+        top_dist = np.take_along_axis(per_identity, top, axis=1)
+        order = np.argsort(top_dist, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_dist = np.take_along_axis(top_dist, order, axis=1)
+
+        results = []
+        for idx_row, dist_row in zip(top, top_dist):
+            best = float(dist_row[0])
+            runner_up = float(dist_row[1]) if len(dist_row) > 1 else float("inf")
+            matches = []
+            for rank in range(min(k, len(idx_row))):
+                distance = float(dist_row[rank])
+                closest_other = runner_up if rank == 0 else best
+                matches.append(Match(self.identities[idx_row[rank]], distance, closest_other - distance))
+            results.append(matches)
+        return results
+
+    def match(self, query, k: int = 1, aggregate: Optional[str] = None) -> List[Match]:
+        """Top-k identities for a single query encoding, best first"""
+        return self.match_batch(query, k, aggregate)[0]
+
+    def identify(self, query, threshold: float = MATCH_THRESHOLD) -> Optional[Match]:
+        """Best identity if it is closer than `threshold`, otherwise None"""
+        matches = self.match(query)
+        if matches and matches[0].distance < threshold:
+            return matches[0]
+        return None
+
+    def identify_batch(self, queries, threshold: float = MATCH_THRESHOLD) -> List[Optional[Match]]:
+        """`identify` for every row of `queries` using a single distance computation"""
+        return [m[0] if m and m[0].distance < threshold else None for m in self.match_batch(queries)]
@@ -0,0 +1,264 @@
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Seconds; spans a cache hit (~50 us) to a cold dlib encode or a stalled API POST
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram child"""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name + "_total", labels, self.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_fn", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._fn = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        """Read the value from `fn` at scrape time (queue depths, rates, pool sizes)"""
+        self._fn = fn
+
+    def samples(self, name, labels):
+        yield name, labels, self._fn() if self._fn is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot: +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip(self._bounds, counts):
+            cumulative += count
+            yield name + "_bucket", labels + (("le", _format(bound)),), cumulative
+        cumulative += counts[-1]
+        yield name + "_bucket", labels + (("le", "+Inf"),), cumulative
+        yield name + "_sum", labels, total
+        yield name + "_count", labels, cumulative
+
+
+class Metric:
+    """
+    One named metric family. Without label names it is used directly
+    (counter.inc()); with label names each combination is a child created
+    on first use (histogram.labels("detect").observe(dt)). Callers on hot
+    paths should keep the child instead of calling labels() every time.
+    """
+
+    kind = ""
+    _child_type = None
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), **options):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._options = options
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._default = self._new_child() if not self.labelnames else None
+
+    def _new_child(self):
+        return self._child_type(**self._options)
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def __getattr__(self, attr):
+        # inc/set/observe/time on an unlabelled metric go to its only child
+        default = self.__dict__.get("_default")
+        if default is None:
+            raise AttributeError(attr)
+        return getattr(default, attr)
+
+    def collect(self):
+        if self._default is not None:
+            children = [((), self._default)]
+        else:
+            with self._lock:
+                children = [(tuple(zip(self.labelnames, key)), child) for key, child in self._children.items()]
+        for labels, child in children:
+            yield from child.samples(self.name, labels)
+
+
+class Counter(Metric):
+    kind = "counter"
+    _child_type = _CounterChild
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    _child_type = _GaugeChild
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    _child_type = _HistogramChild
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames, bounds=tuple(sorted(buckets)))
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics rendered in the Prometheus text format.
+
+    Registration is idempotent: asking again for an existing name returns
+    the same metric, so modules can declare what they record at import time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.collect():
+                if labels:
+                    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_text}}} {_format(value)}")
+                else:
+                    lines.append(f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = MetricsRegistry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+
+def start_http_server(port: int, host: str = "0.0.0.0",
+                      registry: MetricsRegistry = REGISTRY) -> Optional[ThreadingHTTPServer]:
+    """Serve GET /metrics from a daemon thread (for processes without a web framework)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scraped every few seconds; keep the console for the pipeline report
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"Metrics exporter not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    print(f"Metrics exporter listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
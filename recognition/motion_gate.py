@@ -0,0 +1,60 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap scene-change gate in front of face detection.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with a
+    running-average background. Detection runs only when enough thumbnail
+    pixels changed, while a face track is active, or when `force_every`
+    seconds passed since the last detection (so a person who walked in during
+    a lighting change is never missed for long).
+    """
+
+    def __init__(self, thumb_size=(64, 48), alpha=0.05, pixel_threshold=15,
+                 motion_fraction=0.01, force_every=2.0):
+        self.thumb_size = thumb_size
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        self.motion_fraction = motion_fraction
+        self.force_every = force_every
+        self.frames = 0
+        self.gated = 0
+        self.last_score = 0.0
+        self._background = None
+        self._last_detect = 0.0
+        self._lock = threading.Lock()
+
+    def motion_score(self, frame) -> float:
+        """Fraction of thumbnail pixels that differ from the background; updates the background"""
+        thumb = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.GaussianBlur(thumb, (3, 3), 0).astype(np.float32)
+        if self._background is None or self._background.shape != thumb.shape:
+            self._background = thumb
+            return 1.0
+        diff = cv2.absdiff(thumb, self._background)
+        cv2.accumulateWeighted(thumb, self._background, self.alpha)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def should_detect(self, frame, tracks_active: bool = False) -> bool:
+        with self._lock:
+            self.frames += 1
+            self.last_score = self.motion_score(frame)
+            now = time.monotonic()
+            if (tracks_active or self.last_score >= self.motion_fraction
+                    or now - self._last_detect >= self.force_every):
+                self._last_detect = now
+                return True
+            self.gated += 1
+            return False
+
+    def summary(self) -> str:
+        pct = 100.0 * self.gated / self.frames if self.frames else 0.0
+        return f"motion gate: {self.gated}/{self.frames} frames skipped ({pct:.0f}%)"
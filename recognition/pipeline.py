@@ -0,0 +1,229 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from . import workers
+from . import metrics
+
+# Shared by every stage of the kiosk pipeline; main.py adds detect/encode/match/render
+STAGE_SECONDS = metrics.histogram("pipeline_stage_seconds", "Wall time of one call of a pipeline stage", ["stage"])
+STAGE_FRAMES = metrics.counter("pipeline_frames", "Frames handled by a pipeline stage", ["stage"])
+STAGE_DROPPED = metrics.counter("pipeline_dropped_frames", "Frames a pipeline stage dropped as stale", ["stage"])
+STAGE_RATE = metrics.gauge("pipeline_stage_rate", "Frames per second over the last few seconds", ["stage"])
+STAGE_DEPTH = metrics.gauge("pipeline_stage_queue_depth", "Frames waiting in front of a stage", ["stage"])
+
+
+class StageStats:
+    """Thread-safe throughput counter for one pipeline stage"""
+
+    def __init__(self, name: str, depth_fn: Optional[Callable[[], int]] = None, window: float = 2.0):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self._depth_fn = depth_fn
+        self._window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+        self._frames = STAGE_FRAMES.labels(name)
+        self._dropped = STAGE_DROPPED.labels(name)
+        STAGE_RATE.labels(name).set_function(lambda: self.rate)
+        STAGE_DEPTH.labels(name).set_function(lambda: self.depth)
+
+    def tick(self, n: int = 1):
+        now = time.monotonic()
+        self._frames.inc(n)
+        with self._lock:
+            self.count += n
+            for _ in range(n):
+                self._times.append(now)
+            self._trim(now)
+
+    def drop(self, n: int = 1):
+        self._dropped.inc(n)
+        with self._lock:
+            self.dropped += n
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self._window:
+            self._times.popleft()
+
+    @property
+    def rate(self) -> float:
+        """Events per second over the sliding window"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._times) < 2:
+                return 0.0
+            span = now - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._depth_fn() if self._depth_fn else 0
+
+    def summary(self) -> str:
+        return f"{self.name}: {self.rate:.1f}/s q={self.depth} dropped={self.dropped}"
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Reads the camera on its own thread and keeps only the newest frame, so
+    consumers never see stale frames that piled up in the driver buffer.
+    """
+
+    def __init__(self, cap):
+        super().__init__(name="frame-grabber", daemon=True)
+        self.cap = cap
+        self.failed = False
+        self._frame = None
+        self._frame_id = 0
+        self._consumed_id = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self.stats = StageStats("capture", depth_fn=lambda: int(self._frame_id > self._consumed_id))
+        self._read_time = STAGE_SECONDS.labels("capture")
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self._read_time.time():
+                success, frame = self.cap.read()
+            if not success:
+                self.failed = True
+                break
+            with self._cond:
+                if self._frame_id > self._consumed_id:
+                    self.stats.drop()
+                self._frame = frame
+                self._frame_id += 1
+                self._cond.notify_all()
+            self.stats.tick()
+        with self._cond:
+            self._cond.notify_all()
+
+    def read(self, last_id: int = 0, timeout: float = 1.0) -> Tuple[int, Any]:
+        """Wait for a frame newer than `last_id`; returns (frame_id, frame) or (last_id, None)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id > last_id or self.failed or self._stopped.is_set(),
+                                timeout=timeout)
+            if self._frame_id <= last_id:
+                return last_id, None
+            self._consumed_id = self._frame_id
+            return self._frame_id, self._frame
+
+    @property
+    def running(self) -> bool:
+        return not self.failed and not self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class RecognitionWorkers:
+    """
+    Worker threads fed through a small bounded queue. When the workers fall
+    behind, the oldest queued frame is dropped so they always pick up the most
+    recent one. Only the newest finished result is kept for the render stage.
+    """
+
+    def __init__(self, process_fn: Callable[[Any], Any], workers: int = 1, queue_size: int = 1):
+        self.process_fn = process_fn
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._result = None
+        self._result_id = -1
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = StageStats("recognition", depth_fn=self._queue.qsize)
+        self._process_time = STAGE_SECONDS.labels("recognition")
+        self._threads = [
+            threading.Thread(target=self._run, name=f"recognition-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def offer(self, frame_id: int, frame):
+        """Queue a frame without ever blocking the caller"""
+        while True:
+            try:
+                self._queue.put_nowait((frame_id, frame))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.stats.drop()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                frame_id, frame = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                with self._process_time.time():
+                    result = self.process_fn(frame)
+            except Exception as e:
+                print(f"Recognition error: {e}")
+                continue
+            with self._lock:
+                if frame_id > self._result_id:
+                    self._result_id = frame_id
+                    self._result = result
+            self.stats.tick()
+
+    def latest(self):
+        with self._lock:
+            return self._result
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+
+class FaceEngine:
+    """
+    Runs dlib detection/encoding in worker processes. The descriptor network
+    holds the GIL for the whole call, so running it in-thread would stall the
+    capture and render threads; with processes=0 everything runs inline.
+    """
+
+    def __init__(self, processes: int = 1):
+        self._executor = None
+        if processes > 0:
+            self._executor = ProcessPoolExecutor(max_workers=processes)
+            # Load models in every worker before the camera starts
+            for future in [self._executor.submit(workers.warm_up) for _ in range(processes)]:
+                future.result()
+
+    def _call(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        return self._executor.submit(fn, *args).result()
+
+    def submit(self, fn, *args) -> Future:
+        """Run a workers function without waiting; inline (already resolved) with processes=0"""
+        if self._executor is not None:
+            return self._executor.submit(fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def detect(self, rgb_image, model="hog", upsample=1):
+        return self._call(workers.detect_faces, rgb_image, model, upsample)
+
+    def encode_chips(self, chips, chip_box, model="large"):
+        # Only the fixed-size chips cross the process boundary, never the frame
+        return self._call(workers.encode_chips, chips, chip_box, model)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from recognition.ann_index import IVFIndex, build_index
+
+
+def gallery(people=60, poses=3, seed=0):
+    """(encodings, names, rng): well separated identities with a few poses each"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(people, 128)).astype(np.float32)
+    encodings, names = [], []
+    for i, centre in enumerate(centres):
+        for _ in range(poses):
+            encodings.append(centre + rng.normal(scale=0.01, size=128).astype(np.float32))
+            names.append(f"p{i}")
+    return encodings, names, rng
+
+
+def test_sync_unchanged_gallery_is_a_no_op():
+    encodings, names, _ = gallery()
+    index = build_index(encodings, names, nprobe=4)
+    assert not index.sync(encodings, names)
+
+
+def test_sync_reindexes_identity_with_same_pose_count(tmp_path):
+    encodings, names, rng = gallery()
+    index = build_index(encodings, names, nprobe=4)
+    index.save(tmp_path / "index.npz")
+
+    # p0 registers again with new photos: same number of poses, different vectors
+    new_face = rng.normal(size=128).astype(np.float32)
+    encodings[:3] = [new_face + rng.normal(scale=0.01, size=128).astype(np.float32) for _ in range(3)]
+
+    loaded = IVFIndex.load(tmp_path / "index.npz")
+    assert loaded.sync(encodings, names)
+    assert loaded.match(new_face)[0].name == "p0"
+    assert len(loaded) == 60
+    assert loaded.size == len(encodings)
+    assert not loaded.sync(encodings, names)
+
+
+def test_sync_adds_and_removes_identities():
+    encodings, names, rng = gallery()
+    index = build_index(encodings, names, nprobe=4)
+    keep = [i for i, name in enumerate(names) if name != "p1"]
+    encodings = [encodings[i] for i in keep] + [rng.normal(size=128).astype(np.float32)]
+    names = [names[i] for i in keep] + ["newcomer"]
+    assert index.sync(encodings, names)
+    assert "p1" not in index.identities
+    assert index.match(encodings[-1])[0].name == "newcomer"
+
+
+def test_re_adding_an_identity_reuses_its_label():
+    encodings, names, _ = gallery()
+    index = build_index(encodings, names, nprobe=4)
+    labels = len(index._names)
+    for _ in range(3):
+        index.add("p0", encodings[3:6])
+    assert len(index._names) == labels
+    assert index.size == len(encodings)
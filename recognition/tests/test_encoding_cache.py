@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from recognition import encoding_cache
+from recognition.encoding_cache import EncodingCache
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """Replace dlib with a deterministic encoder that records its calls"""
+    calls = []
+
+    def encode(image):
+        calls.append(image.shape)
+        if image.mean() < 1:
+            return None  # no face in a black image
+        return np.full(128, image.mean(), dtype=np.float64)
+
+    monkeypatch.setattr(encoding_cache, "encode_face_image", encode)
+    return calls
+
+
+def png(value):
+    return cv2.imencode(".png", np.full((8, 8, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+def test_unchanged_bytes_are_encoded_once(tmp_path, encoder):
+    cache = EncodingCache(tmp_path / "encodings.npz")
+    key, first = cache.lookup_bytes(png(100), "center")
+    again_key, again = cache.lookup_bytes(png(100), "center")
+    assert key == again_key and np.array_equal(first, again)
+    assert len(encoder) == 1 and (cache.hits, cache.misses) == (1, 1)
+
+    # The pose and the bytes are both part of the key
+    assert cache.lookup_bytes(png(100), "left")[0] != key
+    assert cache.lookup_bytes(png(101), "center")[0] != key
+    assert len(encoder) == 3
+
+
+def test_saved_cache_is_reused_by_a_new_process(tmp_path, encoder):
+    cache = EncodingCache(tmp_path / "encodings.npz")
+    cache.lookup_bytes(png(100), "center")
+    cache.lookup_bytes(png(0), "center")  # a miss is cached too
+    cache.save()
+
+    reloaded = EncodingCache(tmp_path / "encodings.npz")
+    assert reloaded.lookup_bytes(png(100), "center")[1][0] == pytest.approx(100)
+    assert reloaded.lookup_bytes(png(0), "center")[1] is None
+    assert len(encoder) == 2 and reloaded.misses == 0
+
+
+def test_model_change_invalidates_entries(tmp_path, encoder):
+    cache = EncodingCache(tmp_path / "encodings.npz")
+    cache.lookup_bytes(png(100), "center")
+    cache.save()
+    EncodingCache(tmp_path / "encodings.npz", model="other-model").lookup_bytes(png(100), "center")
+    assert len(encoder) == 2
+
+
+def test_save_drops_entries_not_kept(tmp_path, encoder):
+    cache = EncodingCache(tmp_path / "encodings.npz")
+    kept, _ = cache.lookup_bytes(png(100), "center")
+    cache.lookup_bytes(png(50), "center")
+    cache.save(keep={kept})
+    reloaded = EncodingCache(tmp_path / "encodings.npz")
+    reloaded.lookup_bytes(png(50), "center")
+    assert len(encoder) == 3
+
+
+def test_refresh_merges_entries_saved_elsewhere(tmp_path, encoder):
+    ours = EncodingCache(tmp_path / "encodings.npz")
+    theirs = EncodingCache(tmp_path / "encodings.npz")
+    theirs.lookup_bytes(png(100), "center")
+    theirs.save()
+    ours.refresh()
+    ours.lookup_bytes(png(100), "center")
+    assert len(encoder) == 1 and ours.hits == 1
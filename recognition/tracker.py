@@ -0,0 +1,153 @@
+import itertools
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]  # (top, right, bottom, left), face_recognition order
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def box_center(box: Box) -> Tuple[float, float]:
+    top, right, bottom, left = box
+    return (left + right) / 2.0, (top + bottom) / 2.0
+
+
+class Track:
+    """One face followed across detection frames, with its cached identity"""
+
+    def __init__(self, track_id: int, box: Box, frame_index: int):
+        self.id = track_id
+        self.box = box
+        self.first_seen = frame_index
+        self.last_seen = frame_index
+        self.misses = 0
+        # Identity cache, filled by FaceTracker.mark_verified()
+        self.name: Optional[str] = None
+        self.distance: Optional[float] = None
+        self.status: Optional[str] = None
+        self.verified_box: Optional[Box] = None
+        self.verified_at: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        top, right, bottom, left = self.box
+        return max(bottom - top, right - left)
+
+
+class FaceTracker:
+    """
+    Lightweight multi-face tracker: greedy IoU association with a centroid
+    fallback for fast movement. Each track remembers who it was recognised as,
+    so the encoder only runs when a track is new, stale, or moved a lot.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 5,
+                 reverify_every: int = 15, retry_unknown_every: int = 3, reverify_iou: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.reverify_every = reverify_every
+        self.retry_unknown_every = retry_unknown_every
+        self.reverify_iou = reverify_iou
+        self.frame_index = 0
+        self.tracks: List[Track] = []
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Encoder calls made vs. avoided thanks to the identity cache
+        self.encodes = 0
+        self.cached = 0
+
+    def update(self, boxes: Sequence[Box]) -> List[Track]:
+        """Associate this frame's detections with existing tracks; returns the matched/new tracks"""
+        self.frame_index += 1
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+
+        pairs = sorted(
+            ((box_iou(track.box, box), ti, bi)
+             for ti, track in enumerate(self.tracks) for bi, box in enumerate(boxes)),
+            reverse=True,
+        )
+        matched_tracks, matched_boxes = set(), set()
+        assignments = []
+        for overlap, ti, bi in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if ti in matched_tracks or bi in matched_boxes:
+                continue
+            matched_tracks.add(ti)
+            matched_boxes.add(bi)
+            assignments.append((ti, bi))
+
+        # Centroid fallback: a face that moved more than its own overlap still
+        # belongs to the nearest unmatched track within half its size
+        for bi, box in enumerate(boxes):
+            if bi in matched_boxes:
+                continue
+            cx, cy = box_center(box)
+            best, best_dist = None, None
+            for ti, track in enumerate(self.tracks):
+                if ti in matched_tracks:
+                    continue
+                tx, ty = box_center(track.box)
+                dist = ((cx - tx) ** 2 + (cy - ty) ** 2) ** 0.5
+                if dist <= 0.5 * max(track.size, 1) and (best_dist is None or dist < best_dist):
+                    best, best_dist = ti, dist
+            if best is not None:
+                matched_tracks.add(best)
+                matched_boxes.add(bi)
+                assignments.append((best, bi))
+
+        current = []
+        for ti, bi in assignments:
+            track = self.tracks[ti]
+            track.box = boxes[bi]
+            track.last_seen = self.frame_index
+            track.misses = 0
+            current.append(track)
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+        for bi, box in enumerate(boxes):
+            if bi not in matched_boxes:
+                track = Track(next(self._ids), box, self.frame_index)
+                self.tracks.append(track)
+                current.append(track)
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return sorted(current, key=lambda t: t.id)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.tracks)
+
+    def needs_recognition(self, track: Track) -> bool:
+        if track.verified_at is None:
+            return True
+        age = self.frame_index - track.verified_at
+        if track.name is None:
+            return age >= self.retry_unknown_every
+        if age >= self.reverify_every:
+            return True
+        return box_iou(track.box, track.verified_box) < self.reverify_iou
+
+    def mark_verified(self, track: Track, name: Optional[str], distance: Optional[float] = None,
+                      status: Optional[str] = None):
+        track.name = name
+        track.distance = distance
+        track.status = status
+        track.verified_box = track.box
+        track.verified_at = self.frame_index
+
+    def summary(self) -> str:
+        total = self.encodes + self.cached
+        saved = 100.0 * self.cached / total if total else 0.0
+        return f"tracker: {len(self.tracks)} tracks, {self.encodes} encodes, {saved:.0f}% served from cache"
@@ -0,0 +1,86 @@
+"""
+dlib entry points run inside FaceEngine worker processes.
+
+They are plain module-level functions so ProcessPoolExecutor can pickle them;
+face_recognition (and its models) is imported once per worker process.
+"""
+import warnings
+
+import numpy as np
+
+warnings.filterwarnings('ignore', category=UserWarning, module='pkg_resources')
+warnings.filterwarnings('ignore', message='pkg_resources is deprecated as an API')
+
+_face_recognition = None
+_extractor = None
+
+
+def _api():
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
+
+def warm_up():
+    """Load the dlib models up front so the first frame does not pay for it"""
+    _api()
+    return True
+
+
+def detect_faces(rgb_image, model="hog", upsample=1):
+    """Face boxes as (top, right, bottom, left) in rgb_image coordinates"""
+    return _api().face_locations(rgb_image, number_of_times_to_upsample=upsample, model=model)
+
+
+def encode_chips(chips, chip_box, model="large"):
+    """
+    128-d encodings for RGB face chips that share the same face box, in order.
+    Landmarks are found per chip, then all chips go through the descriptor
+    network in a single batched call.
+    """
+    import dlib
+
+    if len(chips) == 0:
+        return []
+    api = _api().api
+    predictor = api.pose_predictor_68_point if model == "large" else api.pose_predictor_5_point
+    top, right, bottom, left = chip_box
+    rect = dlib.rectangle(left, top, right, bottom)
+    images, shapes = [], []
+    for chip in chips:
+        chip = np.ascontiguousarray(chip)
+        detections = dlib.full_object_detections()
+        detections.append(predictor(chip, rect))
+        images.append(chip)
+        shapes.append(detections)
+    descriptors = api.face_encoder.compute_face_descriptor(images, shapes)
+    return [np.array(faces[0]) for faces in descriptors]
+
+
+def prepare_image(data, max_faces=8):
+    """
+    Decode an encoded image, detect faces at the shared detection scale and cut
+    their chips, all in the worker. Returns ((height, width), boxes, chips,
+    chip_box) with boxes largest first in full-resolution coordinates, so only
+    the compressed bytes go in and only the chips come back.
+    """
+    global _extractor
+    import cv2
+
+    from .chips import ChipExtractor
+    from .detection import detection_scale, scale_box
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image (expected JPEG or PNG)")
+    scale = detection_scale(image.shape)
+    small = cv2.resize(image, (0, 0), fx=scale, fy=scale) if scale != 1.0 else image
+    boxes = [scale_box(box, scale) for box in detect_faces(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))]
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True)
+    boxes = boxes[:max_faces]
+    if _extractor is None or _extractor.capacity < max_faces:
+        _extractor = ChipExtractor(capacity=max_faces)
+    chips, box = _extractor.extract(image, boxes)
+    return image.shape[:2], boxes, chips.copy(), box